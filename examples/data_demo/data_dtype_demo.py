@@ -0,0 +1,49 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License.
+"""
+The motivation of this demo
+- To show the memory cost of Alpha360 with different precisions of the processed data.
+  Users can store the processed features in float16 with the `dtype` parameter of the data handler.
+"""
+from pprint import pprint
+
+import numpy as np
+
+from qlib import init
+from qlib.contrib.data.handler import Alpha360
+from qlib.data.dataset.handler import DataHandlerLP
+from qlib.log import TimeInspector
+
+
+def get_mem(df) -> float:
+    """memory cost in MB"""
+    return df.memory_usage(deep=True).sum() / 1024**2
+
+
+if __name__ == "__main__":
+    init()
+
+    hd_kwargs = {
+        "instruments": "csi300",
+        "start_time": "2008-01-01",
+        "end_time": "2020-08-01",
+        "fit_start_time": "2008-01-01",
+        "fit_end_time": "2014-12-31",
+    }
+    res = {}
+    for dtype in None, "float32", {"feature": "float16", "label": "float32"}:
+        with TimeInspector.logt(f"Alpha360 with dtype={dtype}"):
+            hd = Alpha360(**hd_kwargs, dtype=dtype)
+        learn = hd.fetch(col_set=DataHandlerLP.CS_RAW, data_key=DataHandlerLP.DK_L)
+        res[str(dtype)] = {
+            "infer(MB)": get_mem(hd.fetch(col_set=DataHandlerLP.CS_RAW, data_key=DataHandlerLP.DK_I)),
+            "learn(MB)": get_mem(learn),
+            "dtypes": learn.dtypes.value_counts().to_dict(),
+        }
+        if dtype is None:
+            base = learn
+        else:
+            err = np.nanmax(np.abs(learn["feature"].values.astype(np.float64) - base["feature"].values))
+            res[str(dtype)]["max_abs_err"] = err
+        del hd, learn
+    pprint(res)
@@ -5,9 +5,10 @@ from __future__ import annotations
 
 import copy
 from pathlib import Path
-from typing import TYPE_CHECKING, Any, Generator, List, Optional, Tuple, Union
+from typing import TYPE_CHECKING, Any, Dict, Generator, List, Optional, Tuple, Union
 
 import pandas as pd
+from joblib import delayed
 
 from .account import Account
 
@@ -19,6 +20,7 @@ if TYPE_CHECKING:
 from ..config import C
 from ..log import get_module_logger
 from ..utils import init_instance_by_config
+from ..utils.paral import ParallelExt
 from .backtest import INDICATOR_METRIC, PORT_METRIC, backtest_loop, collect_data_loop
 from .decision import Order
 from .exchange import Exchange
@@ -253,6 +255,7 @@ def backtest(
         the kwargs for initializing Exchange
     pos_type : str
         the type of Position.
+        "ArrayPosition" stores the holdings in numpy arrays and keeps the history positions by copy-on-write.
 
     Returns
     -------
@@ -276,6 +279,142 @@ def backtest(
     return backtest_loop(start_time, end_time, trade_strategy, trade_executor)
 
 
+SWEEP_EXCHANGE_KWARGS = ("open_cost", "close_cost", "min_cost", "impact_cost", "trade_unit")
+
+
+def _sweep_backtest(
+    start_time: Union[pd.Timestamp, str],
+    end_time: Union[pd.Timestamp, str],
+    strategy: Union[str, dict, object, Path],
+    executor: Union[str, dict, object, Path],
+    benchmark: str,
+    account: Union[float, int, dict],
+    trade_exchange: Exchange,
+    exchange_kwargs: dict,
+    pos_type: str,
+    g_config: Any = None,
+) -> Tuple[PORT_METRIC, INDICATOR_METRIC]:
+    """run one backtest of `backtest_sweep` on the shared exchange"""
+    if g_config is not None:
+        # NOTE: This place is compatible with windows, windows multi-process is spawn
+        C.register_from_C(g_config)
+    if len(exchange_kwargs) > 0:
+        # the quote is shared and only the trading costs of the exchange are different
+        trade_exchange = copy.copy(trade_exchange)
+        trade_exchange.__dict__.pop("_order_helper", None)
+        for k, v in exchange_kwargs.items():
+            setattr(trade_exchange, k, v)
+    return backtest(
+        start_time,
+        end_time,
+        strategy,
+        executor,
+        benchmark=benchmark,
+        account=copy.copy(account),
+        exchange_kwargs={"exchange": trade_exchange},
+        pos_type=pos_type,
+    )
+
+
+def backtest_sweep(
+    start_time: Union[pd.Timestamp, str],
+    end_time: Union[pd.Timestamp, str],
+    configs: Union[List[dict], Dict[Any, dict]],
+    strategy: Union[str, dict, object, Path, None] = None,
+    executor: Union[str, dict, object, Path, None] = None,
+    benchmark: str = "SH000300",
+    account: Union[float, int, dict] = 1e9,
+    exchange_kwargs: dict = {},
+    pos_type: str = "Position",
+    n_jobs: Optional[int] = None,
+) -> Tuple[pd.DataFrame, Dict[Any, Tuple[PORT_METRIC, INDICATOR_METRIC]]]:
+    """backtest a batch of strategy/executor configurations (e.g. a grid of `topk`, `n_drop` and costs) in parallel.
+
+    Different from calling `backtest` for each configuration, the exchange (i.e. the quote data loaded by `D.features`)
+    is created only once. The arrays of the quote are shared with the worker processes by memory mapping (joblib
+    dumps the large arrays into shared memory and the workers load them without copying). The quote of the exchange
+    is created by `exchange_kwargs["quote_cls"]` (`NumpyQuote` by default). `{"quote_cls": "DenseQuote"}` can be
+    given to share a few large arrays instead, which costs a (time x instrument) float64 array per field.
+
+    Parameters
+    ----------
+    start_time : Union[pd.Timestamp, str]
+        closed start time for backtest
+    end_time : Union[pd.Timestamp, str]
+        closed end time for backtest
+    configs : Union[List[dict], Dict[Any, dict]]
+        the configurations to be backtested. The keys of the dict (or the indices of the list) are the names of runs.
+        Each configuration is a dict with the following optional keys
+        - "strategy": the config of the outermost strategy; `strategy` is used if it is not given
+        - "executor": the config of the outermost executor; `executor` is used if it is not given
+        - "exchange_kwargs": the trading costs of the exchange. Only the arguments which don't change the quote
+          (i.e. the ones in `SWEEP_EXCHANGE_KWARGS`) are supported.
+    strategy : Union[str, dict, object, Path, None]
+        the default strategy of the configurations
+    executor : Union[str, dict, object, Path, None]
+        the default executor of the configurations
+    n_jobs : Optional[int]
+        the number of processes. `C.kernels` is used by default. The runs are sequential in current process if it is 1.
+
+    please refer to the docs of the `backtest` for the explanation of other parameters
+
+    Returns
+    -------
+    Tuple[pd.DataFrame, Dict[Any, Tuple[PORT_METRIC, INDICATOR_METRIC]]]:
+        - the portfolio metrics of the outermost level of all the runs. The names of the runs are prepended to its
+          index (e.g. <(topk, n_drop), datetime>)
+        - the results of `backtest` of each run
+    """
+    if isinstance(configs, dict):
+        run_configs = dict(configs)
+    else:
+        run_configs = dict(enumerate(configs))
+    for name, config in run_configs.items():
+        unknown_kwargs = set(config.get("exchange_kwargs", {})) - set(SWEEP_EXCHANGE_KWARGS)
+        if len(unknown_kwargs) > 0:
+            raise ValueError(f"{unknown_kwargs} of run {name} can't be changed without reloading the quote")
+        if config.get("strategy", strategy) is None or config.get("executor", executor) is None:
+            raise ValueError(f"The strategy and executor of run {name} must be given")
+
+    exchange_kwargs = copy.copy(exchange_kwargs)
+    exchange_kwargs.setdefault("start_time", start_time)
+    exchange_kwargs.setdefault("end_time", end_time)
+    trade_exchange = get_exchange(**exchange_kwargs)
+
+    if n_jobs is None:
+        n_jobs = C.kernels
+    logger.info(f"Backtest {len(run_configs)} configurations with {n_jobs} processes")
+    task_l = [
+        (
+            start_time,
+            end_time,
+            config.get("strategy", strategy),
+            config.get("executor", executor),
+            benchmark,
+            account,
+            trade_exchange,
+            config.get("exchange_kwargs", {}),
+            pos_type,
+        )
+        for config in run_configs.values()
+    ]
+    if n_jobs == 1:
+        res_l = [_sweep_backtest(*task) for task in task_l]
+    else:
+        res_l = ParallelExt(n_jobs=n_jobs, backend=C.joblib_backend, maxtasksperchild=C.maxtasksperchild)(
+            delayed(_sweep_backtest)(*task, g_config=C) for task in task_l
+        )
+    results = dict(zip(run_configs.keys(), res_l))
+
+    report_dict = {}
+    for name, (portfolio_metric_dict, _) in results.items():
+        if len(portfolio_metric_dict) > 0:
+            # the first one is the report of the outermost level
+            report_dict[name] = next(iter(portfolio_metric_dict.values()))[0]
+    report_df = pd.concat(report_dict) if len(report_dict) > 0 else pd.DataFrame()
+    return report_df, results
+
+
 def collect_data(
     start_time: Union[pd.Timestamp, str],
     end_time: Union[pd.Timestamp, str],
@@ -346,4 +485,4 @@ def format_decisions(
     return res
 
 
-__all__ = ["Order", "backtest", "get_strategy_executor"]
+__all__ = ["Order", "backtest", "backtest_sweep", "get_strategy_executor"]
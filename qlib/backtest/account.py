@@ -2,7 +2,6 @@
 # Licensed under the MIT License.
 from __future__ import annotations
 
-import copy
 from typing import Dict, List, Optional, Tuple, cast
 
 import pandas as pd
@@ -174,6 +173,12 @@ class Account:
 
         self.reset_report(self.freq, self.benchmark_config)
 
+    def reserve(self, n_steps: int) -> None:
+        """reserve the buffers of the metrics for the next `n_steps` steps (e.g. the length of the trade calendar)"""
+        if self.portfolio_metrics is not None:
+            self.portfolio_metrics.reserve(n_steps)
+        self.indicator.reserve(n_steps)
+
     def get_hist_positions(self) -> Dict[pd.Timestamp, BasePosition]:
         return self.hist_positions
 
@@ -279,7 +284,7 @@ class Account:
             trade_start_time=trade_start_time,
             trade_end_time=trade_end_time,
             account_value=now_account_value,
-            cash=self.current_position.position["cash"],
+            cash=self.current_position.get_cash(),
             return_rate=(now_earning + now_cost) / last_account_value,
             # here use earning to calculate return, position's view, earning consider cost, true return
             # in order to make same definition with original backtest in evaluate.py
@@ -294,11 +299,11 @@ class Account:
         """update history position"""
         now_account_value = self.current_position.calculate_value()
         # set now_account_value to position
-        self.current_position.position["now_account_value"] = now_account_value
+        self.current_position.update_account_value(now_account_value)
         self.current_position.update_weight_all()
         # update hist_positions
-        # note use deepcopy
-        self.hist_positions[trade_start_time] = copy.deepcopy(self.current_position)
+        # NOTE: the snapshot must not be changed by the later updates(e.g. it is a deepcopy for `Position`)
+        self.hist_positions[trade_start_time] = self.current_position.snapshot()
 
     def update_indicator(
         self,
@@ -412,6 +417,17 @@ class Account:
         else:
             raise ValueError("generate_portfolio_metrics should be True if you want to generate portfolio_metrics")
 
+    def get_risk_analysis(self, N: int | None = None, freq: str | None = None, mode: str = "sum") -> pd.DataFrame:
+        """get the risk analysis of the excess returns, which is updated step by step during the backtest
+
+        Please refer to `PortfolioMetrics.get_risk_analysis` for the parameters.
+        """
+        if self.is_port_metr_enabled():
+            assert self.portfolio_metrics is not None
+            return self.portfolio_metrics.get_risk_analysis(N=N, freq=freq, mode=mode)
+        else:
+            raise ValueError("generate_portfolio_metrics should be True if you want to generate risk analysis")
+
     def get_trade_indicator(self) -> Indicator:
         """get the trade indicator instance, which has pa/pos/ffr info."""
         return self.indicator
@@ -0,0 +1,198 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License.
+"""
+Disk cache for the benchmark data of backtests.
+
+Motivation:
+
+- Every backtest loads the returns of the benchmark (`PortfolioMetrics`) and the profit attribution loads the weights
+  of the benchmark constituents. Sweeps of strategies and rolling evaluations repeat the same loads again and again.
+
+There are two kinds of entries
+
+- returns: keyed by the benchmark, the fields and the frequency. The entry remembers the time range it covers. When a
+  backtest requests a range out of it, only the missing head / tail is loaded and the entry is extended.
+- weights: keyed by the benchmark, the path of the weights file and its modification time. The pivoted weights of
+  all dates are cached, so the weights of any range can be sliced from the entry.
+
+The cache is disabled by default. It is enabled by `C.benchmark_disk_cache = True` (unless the disk caches are disabled
+by `C.default_disk_cache = 0`) and saved in `<data_uri>/<C.benchmark_cache_dir_name>`.
+
+NOTE: the extension of the returns is triggered by the new dates in the calendar. Please remove the cache directory if
+the history of the data is changed.
+"""
+from __future__ import annotations
+
+import os
+import pickle
+import tempfile
+from pathlib import Path
+from typing import Callable, Optional, Tuple, Union
+
+import pandas as pd
+
+from ..config import C
+from ..log import get_module_logger
+from ..utils import hash_args
+
+
+class BenchmarkCache:
+    """
+    Disk cache for the returns and the constituent weights of benchmarks.
+
+    .. code-block:: python
+
+        cache = BenchmarkCache.default("day")  # None if the benchmark cache is disabled
+    """
+
+    RET_DIR = "returns"
+    WEIGHT_DIR = "weights"
+
+    def __init__(self, cache_dir: Union[str, Path]):
+        """
+        Parameters
+        ----------
+        cache_dir : Union[str, Path]
+            the directory to save the cache.
+        """
+        self.cache_dir = Path(cache_dir).expanduser().resolve()
+        self.logger = get_module_logger(self.__class__.__name__)
+
+    @classmethod
+    def default(cls, freq: str) -> Optional[BenchmarkCache]:
+        """the cache in the data directory of `freq`. None will be returned if the cache is disabled or qlib is not initialized"""
+        if not C.registered or not C.benchmark_disk_cache or not C.default_disk_cache:
+            return None
+        try:
+            data_uri = C.dpm.get_data_uri(freq)
+        except KeyError:
+            # `provider_uri` is a dict without the default uri and `freq` is not in it
+            return None
+        return cls(data_uri.joinpath(C.benchmark_cache_dir_name))
+
+    def _path(self, sub_dir: str, key: str) -> Path:
+        return self.cache_dir.joinpath(sub_dir, f"{key}.pkl")
+
+    @staticmethod
+    def _read(path: Path) -> Optional[dict]:
+        if not path.exists():
+            return None
+        with path.open("rb") as f:
+            return pickle.load(f)
+
+    def _write(self, path: Path, entry: dict):
+        # write to a temporary file first. So the concurrent readers (e.g. parallel backtests) never get broken files
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+        except OSError as e:
+            # e.g. the data directory is read-only
+            self.logger.warning(f"Failed to save the benchmark cache {path}: {e}")
+            return
+        try:
+            with os.fdopen(fd, "wb") as f:
+                pickle.dump(entry, f, protocol=C.dump_protocol_version)
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    @staticmethod
+    def _resolve_range(calendar, start_time, end_time) -> Tuple[pd.Timestamp, pd.Timestamp]:
+        """clip the requested range to the calendar. So a range ending in the future is covered until the last date"""
+        start = calendar[0] if start_time is None else max(pd.Timestamp(start_time), calendar[0])
+        end = calendar[-1] if end_time is None else min(pd.Timestamp(end_time), calendar[-1])
+        return start, end
+
+    def get_returns(
+        self,
+        key: tuple,
+        start_time,
+        end_time,
+        load: Callable[[Optional[pd.Timestamp], Optional[pd.Timestamp]], Tuple[pd.Series, str]],
+        calendar: Callable[[str], list],
+    ) -> pd.Series:
+        """
+        Get the returns of the benchmark in [start_time, end_time].
+
+        Parameters
+        ----------
+        key : tuple
+            the arguments identifying the returns, e.g. (benchmark, fields, freq).
+        start_time, end_time :
+            the requested range. None indicates the beginning / end of the calendar.
+        load : Callable
+            `load(start_time, end_time) -> (returns, freq of data)` loads the returns in [start_time, end_time].
+            The returns of each date must not rely on the other loaded dates (e.g. expressions like `Ref` are extended
+            by the data provider automatically).
+        calendar : Callable
+            `calendar(freq)` returns the calendar of the data in `freq`.
+
+        Returns
+        -------
+        pd.Series
+            the returns indexed by datetime.
+        """
+        path = self._path(self.RET_DIR, hash_args(*key))
+        entry = self._read(path)
+        if entry is None:
+            ret, data_freq = load(start_time, end_time)
+            if len(ret) == 0:
+                return ret
+            start, end = self._resolve_range(calendar(data_freq), start_time, end_time)
+            self._write(path, {"start_time": start, "end_time": end, "freq": data_freq, "data": ret})
+            return ret
+
+        start, end = self._resolve_range(calendar(entry["freq"]), start_time, end_time)
+        ret = entry["data"]
+        if entry["start_time"] <= start and end <= entry["end_time"]:
+            self.logger.info(f"Benchmark cache hit: {path}")
+            return ret.loc[start:end]
+
+        # NOTE: the requested range may be disjoint with the cached one. Loading until the cached range keeps the
+        # entry contiguous.
+        parts = [ret]
+        if start < entry["start_time"]:
+            head, _ = load(start, entry["start_time"])
+            parts.insert(0, head[head.index < entry["start_time"]])
+        if end > entry["end_time"]:
+            self.logger.info(f"Benchmark cache hit: {path}; loading the tail from {entry['end_time']}")
+            tail, _ = load(entry["end_time"], end)
+            parts.append(tail[tail.index > entry["end_time"]])
+        ret = pd.concat(parts)
+        entry.update(
+            start_time=min(start, entry["start_time"]), end_time=max(end, entry["end_time"]), data=ret.sort_index()
+        )
+        self._write(path, entry)
+        return entry["data"].loc[start:end]
+
+    def get_weights(self, bench: str, path: Union[str, Path], load: Callable[[], pd.DataFrame]) -> pd.DataFrame:
+        """
+        Get the weights of the constituents of `bench` in all dates.
+
+        Parameters
+        ----------
+        bench : str
+            the benchmark.
+        path : Union[str, Path]
+            the file of the weights. The entry is refreshed when the file is modified.
+        load : Callable
+            `load()` loads the weights of all dates from `path`.
+
+        Returns
+        -------
+        pd.DataFrame
+            the weights. Every row corresponds to a trading day and every column corresponds to a stock.
+        """
+        stat = os.stat(path)
+        cache_path = self._path(
+            self.WEIGHT_DIR, hash_args(bench, str(Path(path).resolve()), stat.st_mtime_ns, stat.st_size)
+        )
+        entry = self._read(cache_path)
+        if entry is not None:
+            self.logger.info(f"Benchmark cache hit: {cache_path}")
+            return entry["data"]
+        weight = load()
+        self._write(cache_path, {"data": weight})
+        return weight
@@ -3,6 +3,7 @@
 
 from __future__ import annotations
 
+import copy
 from abc import abstractmethod
 from datetime import time
 from enum import IntEnum
@@ -151,6 +152,146 @@ class Order:
         return pd.Timestamp(self.start_time.replace(hour=0, minute=0, second=0))
 
 
+class OrderBatch:
+    """
+    A batch of orders in the struct-of-arrays format.
+
+    Creating a lot of `Order` (and the `pd.Timestamp` in them) is expensive when a lot of orders are generated in each
+    step (e.g. the nested high-frequency execution). `OrderBatch` keeps the orders in arrays and can be converted
+    from/to the `Order` objects for the code working on `Order`.
+
+    - stock_id : np.ndarray of str
+    - amount : np.ndarray of float
+    - direction : np.ndarray of int (the values of `OrderDir`)
+    - start_idx / end_idx : np.ndarray of int
+        The time ranges of the orders are the indexes of `calendar`, which contains the distinct time points of the
+        orders. NaT indicates that the time is not set and will be set by `TradeDecisionWO`.
+    - deal_amount : np.ndarray of float
+    - factor : np.ndarray of float, NaN indicates None
+    """
+
+    def __init__(
+        self,
+        stock_id: Union[List[str], np.ndarray],
+        amount: Union[List[float], np.ndarray],
+        direction: Union[OrderDir, List[OrderDir], np.ndarray],
+        start_time: Union[pd.Timestamp, list, np.ndarray, pd.Index, None] = None,
+        end_time: Union[pd.Timestamp, list, np.ndarray, pd.Index, None] = None,
+    ) -> None:
+        """
+        Parameters
+        ----------
+        stock_id, amount, direction :
+            the attributes of the orders. `direction` can be a scalar for all the orders.
+        start_time, end_time :
+            the time range of the orders. They can be scalars for all the orders. None is for "not set".
+        """
+        self.stock_id = np.asarray(stock_id, dtype=object)
+        n = len(self.stock_id)
+        self.amount = np.asarray(amount, dtype=np.float64)
+        self.direction = np.broadcast_to(np.asarray(direction, dtype=np.int8), (n,)).copy()
+        if not np.isin(self.direction, (OrderDir.SELL, OrderDir.BUY)).all():
+            raise NotImplementedError("direction not supported, `Order.SELL` for sell, `Order.BUY` for buy")
+        if len(self.amount) != n:
+            raise ValueError("The lengths of the attributes of the orders are not the same")
+
+        self._set_time(start_time, end_time)
+        self.deal_amount = np.zeros(n)
+        self.factor = np.full(n, np.nan)
+
+    def _set_time(self, start_time: Any, end_time: Any) -> None:
+        n = len(self.stock_id)
+
+        def _to_dt64(t: Any) -> np.ndarray:
+            return np.broadcast_to(np.asarray(pd.to_datetime(t), dtype="datetime64[ns]"), (n,))
+
+        self.calendar, idx = np.unique(np.concatenate([_to_dt64(start_time), _to_dt64(end_time)]), return_inverse=True)
+        self.start_idx, self.end_idx = idx[:n], idx[n:]
+
+    def __len__(self) -> int:
+        return len(self.stock_id)
+
+    @property
+    def start_time(self) -> pd.DatetimeIndex:
+        return pd.DatetimeIndex(self.calendar[self.start_idx])
+
+    @property
+    def end_time(self) -> pd.DatetimeIndex:
+        return pd.DatetimeIndex(self.calendar[self.end_idx])
+
+    @property
+    def sign(self) -> np.ndarray:
+        """`+1` indicates buying; `-1` indicates selling"""
+        return self.direction.astype(int) * 2 - 1
+
+    @property
+    def amount_delta(self) -> np.ndarray:
+        return self.amount * self.sign
+
+    @property
+    def deal_amount_delta(self) -> np.ndarray:
+        return self.deal_amount * self.sign
+
+    def fill_time(self, start_time: pd.Timestamp, end_time: pd.Timestamp) -> None:
+        """set the time range of the orders whose time is not set"""
+        cal = self.calendar
+        if len(cal) == 0 or not np.isnat(cal[-1]):
+            # NaT is always the last one after sorting
+            return
+        nat = len(cal) - 1
+        start, end = pd.to_datetime([start_time, end_time]).values
+        self._set_time(
+            np.where(self.start_idx == nat, start, cal[self.start_idx]),
+            np.where(self.end_idx == nat, end, cal[self.end_idx]),
+        )
+
+    @classmethod
+    def from_orders(cls, orders: List[Order]) -> OrderBatch:
+        """create a batch from the `Order` objects (the dealing results are also included)"""
+        batch = cls(
+            [o.stock_id for o in orders],
+            [o.amount for o in orders],
+            np.array([o.direction for o in orders], dtype=np.int8),
+            [o.start_time for o in orders],
+            [o.end_time for o in orders],
+        )
+        batch.deal_amount = np.array([o.deal_amount for o in orders], dtype=np.float64)
+        batch.factor = np.array([np.nan if o.factor is None else o.factor for o in orders], dtype=np.float64)
+        return batch
+
+    def to_orders(self) -> List[Order]:
+        """create the `Order` objects of the batch"""
+        times = [None if np.isnat(t) else pd.Timestamp(t) for t in self.calendar]
+        directions = [OrderDir.SELL, OrderDir.BUY]
+        orders = []
+        for i, (stock_id, amount, direction, s, e) in enumerate(
+            zip(self.stock_id, self.amount.tolist(), self.direction, self.start_idx, self.end_idx)
+        ):
+            order = Order(stock_id, amount, directions[direction], times[s], times[e])
+            if self.deal_amount[i] != 0 or not np.isnan(self.factor[i]):
+                order.deal_amount = float(self.deal_amount[i])
+                order.factor = None if np.isnan(self.factor[i]) else float(self.factor[i])
+            orders.append(order)
+        return orders
+
+    def update_results(self, orders: List[Order]) -> None:
+        """update the dealing results from the `Order` objects of the batch (e.g. created by `to_orders`)"""
+        self.deal_amount[:] = [o.deal_amount for o in orders]
+        self.factor[:] = [np.nan if o.factor is None else o.factor for o in orders]
+
+    def __getitem__(self, item: Union[int, slice, np.ndarray, list]) -> Union[Order, OrderBatch]:
+        """get an `Order` by an integer or a sub batch by a slice/mask/indices"""
+        if isinstance(item, (int, np.integer)):
+            return self[[item]].to_orders()[0]
+        sub = copy.copy(self)
+        for attr in "stock_id", "amount", "direction", "start_idx", "end_idx", "deal_amount", "factor":
+            setattr(sub, attr, getattr(self, attr)[item])
+        return sub
+
+    def __repr__(self) -> str:
+        return f"{self.__class__.__name__}[{len(self)}]"
+
+
 class OrderHelper:
     """
     Motivation
@@ -552,29 +693,64 @@ class TradeDecisionWO(BaseTradeDecision[Order]):
 
     def __init__(
         self,
-        order_list: List[Order],
+        order_list: Union[List[Order], OrderBatch],
         strategy: BaseStrategy,
         trade_range: Union[Tuple[int, int], TradeRange, None] = None,
     ) -> None:
+        """
+        Parameters
+        ----------
+        order_list : Union[List[Order], OrderBatch]
+            The orders of the decision. If an `OrderBatch` is given, the `Order` objects will be created only when
+            they are accessed (e.g. by `get_decision`).
+        """
         super().__init__(strategy, trade_range=trade_range)
-        self.order_list = cast(List[Order], order_list)
         start, end = strategy.trade_calendar.get_step_time()
-        for o in order_list:
-            assert isinstance(o, Order)
-            if o.start_time is None:
-                o.start_time = start
-            if o.end_time is None:
-                o.end_time = end
+        self.order_batch: Optional[OrderBatch] = None
+        self._order_list: Optional[List[Order]] = None
+        if isinstance(order_list, OrderBatch):
+            order_list.fill_time(start, end)
+            self.order_batch = order_list
+        else:
+            self._order_list = cast(List[Order], order_list)
+            for o in order_list:
+                assert isinstance(o, Order)
+                if o.start_time is None:
+                    o.start_time = start
+                if o.end_time is None:
+                    o.end_time = end
+
+    @property
+    def order_list(self) -> List[Order]:
+        if self._order_list is None:
+            self._order_list = cast(OrderBatch, self.order_batch).to_orders()
+        return self._order_list
 
     def get_decision(self) -> List[Order]:
         return self.order_list
 
+    def has_order_objects(self) -> bool:
+        """whether the `Order` objects of the decision are created. Otherwise the orders are only kept in the batch"""
+        return self._order_list is not None
+
+    def get_order_batch(self) -> OrderBatch:
+        """
+        Get the orders in the format of `OrderBatch`.
+        If the decision is created by a list of `Order`, a new batch is created from the orders.
+        """
+        if self.order_batch is None:
+            return OrderBatch.from_orders(self.order_list)
+        if self._order_list is not None:
+            # the dealing results may be updated in the `Order` objects
+            self.order_batch.update_results(self._order_list)
+        return self.order_batch
+
     def __repr__(self) -> str:
         return (
             f"class: {self.__class__.__name__}; "
             f"strategy: {self.strategy}; "
             f"trade_range: {self.trade_range}; "
-            f"order_list[{len(self.order_list)}]"
+            f"order_list[{len(self.order_list) if self.order_batch is None else len(self.order_batch)}]"
         )
 
 
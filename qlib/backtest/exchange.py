@@ -3,7 +3,7 @@
 from __future__ import annotations
 
 from collections import defaultdict
-from typing import TYPE_CHECKING, Any, Dict, List, Optional, Tuple, Type, Union, cast
+from typing import TYPE_CHECKING, Any, Dict, Iterable, List, Optional, Tuple, Type, Union, cast
 
 from ..utils.index_data import IndexData
 
@@ -21,7 +21,9 @@ from ..config import C
 from ..constant import REG_CN, REG_TW
 from ..data.data import D
 from ..log import get_module_logger
-from .decision import Order, OrderDir, OrderHelper
+from ..utils import get_callable_kwargs
+from .decision import Order, OrderBatch, OrderDir, OrderHelper
+from . import high_performance_ds
 from .high_performance_ds import BaseQuote, NumpyQuote
 
 
@@ -50,7 +52,7 @@ class Exchange:
         min_cost: float = 5.0,
         impact_cost: float = 0.0,
         extra_quote: pd.DataFrame = None,
-        quote_cls: Type[BaseQuote] = NumpyQuote,
+        quote_cls: Union[Type[BaseQuote], str, dict] = NumpyQuote,
         **kwargs: Any,
     ) -> None:
         """__init__
@@ -127,6 +129,13 @@ class Exchange:
                                                 limit_buy will be set to False by default (False indicates we can buy
                                                 this target on this day).
                                     index: MultipleIndex(instrument, pd.Datetime)
+        :param quote_cls:       Union[Type[BaseQuote], str, dict]
+                                the data structure to maintain the quote. The str or dict config is loaded from
+                                `qlib.backtest.high_performance_ds` by default. For example
+                                - "NumpyQuote": the default one
+                                - "DenseQuote": (time x instrument) arrays; it is faster when many stocks are traded
+                                  every step and the range aggregations (e.g. volume limitations) are common.
+                                - {"class": "DenseQuote", "kwargs": {"region": "cn"}}
         """
         self.freq = freq
         self.start_time = start_time
@@ -195,8 +204,11 @@ class Exchange:
         self.get_quote_from_qlib()
 
         # init quote by quote_df
+        quote_kwargs = {}
+        if isinstance(quote_cls, (str, dict)):
+            quote_cls, quote_kwargs = get_callable_kwargs(quote_cls, high_performance_ds)
         self.quote_cls = quote_cls
-        self.quote: BaseQuote = self.quote_cls(self.quote_df, freq)
+        self.quote: BaseQuote = self.quote_cls(self.quote_df, freq, **quote_kwargs)
 
     def get_quote_from_qlib(self) -> None:
         # get stock data from qlib
@@ -401,6 +413,35 @@ class Exchange:
             # if the stock is not in the stock list, then it is not tradable and regarded as suspended
             return True
 
+    def suspended_mask(
+        self,
+        stock_ids: Iterable[str],
+        start_time: pd.Timestamp,
+        end_time: pd.Timestamp,
+    ) -> np.ndarray:
+        """
+        The vectorized version of `check_stock_suspended` for a list of stocks.
+
+        Returns
+        -------
+        np.ndarray:
+            a boolean array with the same length as `stock_ids`. True indicates the stock is suspended.
+        """
+        stock_ids = list(stock_ids)
+        all_stock = self.quote.get_all_stock()
+        exists = np.array([stock_id in all_stock for stock_id in stock_ids], dtype=bool)
+        close = np.full(len(stock_ids), np.nan)
+        if exists.any():
+            # the last valid $close is NaN if all the $close in the range are NaN
+            close[exists] = self.quote.get_data_batch(
+                [stock_id for stock_id, e in zip(stock_ids, exists) if e],
+                start_time,
+                end_time,
+                field="$close",
+                method="ts_data_last",
+            )
+        return np.isnan(close)
+
     def is_stock_tradable(
         self,
         stock_id: str,
@@ -414,6 +455,43 @@ class Exchange:
             or self.check_stock_limit(stock_id, start_time, end_time, direction)
         )
 
+    def tradable_mask(
+        self,
+        stock_ids: Iterable[str],
+        start_time: pd.Timestamp,
+        end_time: pd.Timestamp,
+        direction: int | None = None,
+    ) -> np.ndarray:
+        """
+        The vectorized version of `is_stock_tradable` for a list of stocks.
+        It is much faster when the quote supports batch queries (e.g. `DenseQuote`).
+
+        Parameters
+        ----------
+        stock_ids : Iterable[str]
+        start_time: pd.Timestamp
+        end_time: pd.Timestamp
+        direction : int, optional
+            trade direction, please refer to `check_stock_limit`
+
+        Returns
+        -------
+        np.ndarray:
+            a boolean array with the same length as `stock_ids`. True indicates the stock is tradable.
+        """
+        if direction not in (None, Order.BUY, Order.SELL):
+            raise ValueError(f"direction {direction} is not supported!")
+        stock_ids = list(stock_ids)
+        mask = ~self.suspended_mask(stock_ids, start_time, end_time)
+        # NOTE: NaN is regarded as limited like `check_stock_limit` (bool(np.nan) is True)
+        if direction is None or direction == Order.BUY:
+            limit = self.quote.get_data_batch(stock_ids, start_time, end_time, field="limit_buy", method="all")
+            mask &= limit == 0
+        if direction is None or direction == Order.SELL:
+            limit = self.quote.get_data_batch(stock_ids, start_time, end_time, field="limit_sell", method="all")
+            mask &= limit == 0
+        return mask
+
     def check_order(self, order: Order) -> bool:
         # check limit and suspended
         return self.is_stock_tradable(order.stock_id, order.start_time, order.end_time, order.direction)
@@ -450,6 +528,18 @@ class Exchange:
             trade_account.current_position if trade_account else position,
             dealt_order_amount,
         )
+        self._update_by_deal(order, trade_account, position, trade_val, trade_cost, trade_price)
+        return trade_val, trade_cost, trade_price
+
+    @staticmethod
+    def _update_by_deal(
+        order: Order,
+        trade_account: Account | None,
+        position: BasePosition | None,
+        trade_val: float,
+        trade_cost: float,
+        trade_price: float,
+    ) -> None:
         if trade_val > 1e-5:
             # If the order can only be deal 0 value. Nothing to be updated
             # Otherwise, it will result in
@@ -460,7 +550,210 @@ class Exchange:
             elif position:
                 position.update_order(order=order, trade_val=trade_val, cost=trade_cost, trade_price=trade_price)
 
-        return trade_val, trade_cost, trade_price
+    def deal_orders(
+        self,
+        orders: Union[List[Order], OrderBatch],
+        trade_account: Account | None = None,
+        position: BasePosition | None = None,
+        dealt_order_amount: Optional[Dict[str, float]] = None,
+    ) -> List[Tuple[float, float, float]]:
+        """
+        Deal a list of orders in their order (e.g. put the sell orders before the buy orders to make the cash of
+        selling available for buying).
+
+        The results are the same as calling `deal_order` order by order and accumulating the deal amount into
+        `dealt_order_amount`. But the quote of all the orders (tradability, deal price, volume, factor and volume
+        limits) is queried by batch. Only the cash and position related parts are processed sequentially.
+
+        :param orders: the orders to be dealt. The results section in each `Order` (or the `OrderBatch`) will be
+                       changed. An `OrderBatch` is dealt on its arrays without creating the `Order` of each row.
+        :param trade_account: Trade account to be updated after dealing the orders.
+        :param position: position to be updated after dealing the orders.
+        :param dealt_order_amount: the dealt order amount dict with the format of {stock_id: float}.
+                                   It will be updated **inplace** after dealing each order.
+        :return: a list of (trade_val, trade_cost, trade_price) for each order
+        """
+        if trade_account is not None and position is not None:
+            raise ValueError("trade_account and position can only choose one")
+        if dealt_order_amount is None:
+            dealt_order_amount = defaultdict(float)
+        if isinstance(orders, OrderBatch):
+            return self._deal_order_batch(orders, trade_account, position, dealt_order_amount)
+        quote = self._get_order_quote_batch(orders)
+        cur_position = trade_account.current_position if trade_account else position
+
+        results = []
+        for i, order in enumerate(orders):
+            if not quote["tradable"][i]:
+                order.deal_amount = 0.0
+                self.logger.debug(f"Order failed due to trading limitation: {order}")
+                results.append((0.0, 0.0, np.nan))
+                continue
+
+            # NOTE: it is the same as `_calc_trade_info_by_order` with the quote given
+            trade_price = quote["price"][i]
+            total_trade_val = quote["volume"][i] * trade_price
+            order.factor = None if np.isnan(quote["factor"][i]) else quote["factor"][i]
+            order.deal_amount = order.amount
+            vol_limit = self.buy_vol_limit if order.direction == Order.BUY else self.sell_vol_limit
+            if vol_limit is not None:
+                vol_limit_num = [
+                    value if limit[0] == "current" else value - dealt_order_amount[order.stock_id]
+                    for limit, value in zip(vol_limit, quote["vol_limit"][i])
+                ]
+                self._clip_amount_by_vol_limit_num(order, vol_limit, vol_limit_num)
+            trade_price, trade_val, trade_cost = self._calc_trade_info_by_deal_amount(
+                order, cur_position, trade_price, total_trade_val
+            )
+
+            self._update_by_deal(order, trade_account, position, trade_val, trade_cost, trade_price)
+            results.append((trade_val, trade_cost, trade_price))
+            dealt_order_amount[order.stock_id] += order.deal_amount
+        return results
+
+    def _deal_order_batch(
+        self,
+        order_batch: OrderBatch,
+        trade_account: Account | None,
+        position: BasePosition | None,
+        dealt_order_amount: Dict[str, float],
+    ) -> List[Tuple[float, float, float]]:
+        """
+        `deal_orders` for an `OrderBatch`. The dealing results are written into `order_batch.deal_amount` and
+        `order_batch.factor`. `Order` objects are only created for the dealt orders to update the account.
+        """
+        quote = self._get_order_quote_batch(order_batch)
+        cur_position = trade_account.current_position if trade_account else position
+        times = [pd.Timestamp(t) for t in order_batch.calendar]
+        directions = [OrderDir.SELL, OrderDir.BUY]
+
+        results = []
+        for i, (stock_id, amount, direction) in enumerate(
+            zip(order_batch.stock_id, order_batch.amount.tolist(), order_batch.direction.tolist())
+        ):
+            if not quote["tradable"][i]:
+                order_batch.deal_amount[i] = 0.0
+                self.logger.debug(f"Order failed due to trading limitation: {stock_id}")
+                results.append((0.0, 0.0, np.nan))
+                continue
+
+            direction = directions[direction]
+            trade_price = quote["price"][i]
+            total_trade_val = quote["volume"][i] * trade_price
+            factor = None if np.isnan(quote["factor"][i]) else quote["factor"][i]
+            deal_amount = amount
+            vol_limit = self.buy_vol_limit if direction == Order.BUY else self.sell_vol_limit
+            if vol_limit is not None:
+                vol_limit_num = [
+                    value if limit[0] == "current" else value - dealt_order_amount[stock_id]
+                    for limit, value in zip(vol_limit, quote["vol_limit"][i])
+                ]
+                deal_amount = self._clip_deal_amount_by_vol_limit_num(deal_amount, vol_limit, vol_limit_num, stock_id)
+            deal_amount, trade_price, trade_val, trade_cost = self._calc_deal_info(
+                stock_id, direction, deal_amount, factor, cur_position, trade_price, total_trade_val, stock_id
+            )
+            order_batch.deal_amount[i] = deal_amount
+            order_batch.factor[i] = quote["factor"][i]
+
+            if trade_val > 1e-5 and (trade_account or position):
+                order = Order(
+                    stock_id, amount, direction, times[order_batch.start_idx[i]], times[order_batch.end_idx[i]]
+                )
+                order.deal_amount, order.factor = deal_amount, factor
+                self._update_by_deal(order, trade_account, position, trade_val, trade_cost, trade_price)
+            results.append((trade_val, trade_cost, trade_price))
+            dealt_order_amount[stock_id] += deal_amount
+        return results
+
+    def _get_order_quote_batch(self, orders: Union[List[Order], OrderBatch]) -> Dict[str, Any]:
+        """
+        Query the quote of the orders by batch. The orders are grouped by (start_time, end_time, direction).
+
+        Returns
+        -------
+        Dict[str, Any]:
+            - "tradable": bool array, same as `check_order`
+            - "price": the deal price, same as `get_deal_price`
+            - "volume": the total volume, same as `get_volume`
+            - "factor": the factor, same as `get_factor` (None is converted to np.nan)
+            - "vol_limit": the raw values of the volume limits of each order
+        """
+        n = len(orders)
+        quote: Dict[str, Any] = {
+            "tradable": np.zeros(n, dtype=bool),
+            "price": np.full(n, np.nan),
+            "volume": np.full(n, np.nan),
+            "factor": np.full(n, np.nan),
+            "vol_limit": [[] for _ in range(n)],
+        }
+        if isinstance(orders, OrderBatch):
+            all_stock_ids = orders.stock_id
+            # group by the indexes of the time points instead of hashing the timestamps of each order
+            keys, inverse = np.unique(
+                np.stack([orders.start_idx, orders.end_idx, orders.direction.astype(int)], axis=1),
+                axis=0,
+                return_inverse=True,
+            )
+            inverse = inverse.reshape(-1)
+            times = pd.DatetimeIndex(orders.calendar)
+            sorter = np.argsort(inverse, kind="stable")
+            splits = np.split(sorter, np.cumsum(np.bincount(inverse, minlength=len(keys)))[:-1])
+            groups = {
+                (times[start], times[end], OrderDir(direction)): idx
+                for (start, end, direction), idx in zip(keys.tolist(), splits)
+            }
+        else:
+            all_stock_ids = np.array([order.stock_id for order in orders], dtype=object)
+            groups = defaultdict(list)
+            for i, order in enumerate(orders):
+                groups[(order.start_time, order.end_time, order.direction)].append(i)
+
+        for (start_time, end_time, direction), idx in groups.items():
+            idx = np.asarray(idx, dtype=int)
+            stock_ids = all_stock_ids[idx].tolist()
+            tradable = self.tradable_mask(stock_ids, start_time, end_time, direction)
+            quote["tradable"][idx] = tradable
+            # the quote of the orders failed due to trading limitation is not used
+            idx = idx[tradable]
+            if len(idx) == 0:
+                continue
+            stock_ids = all_stock_ids[idx].tolist()
+
+            pstr = self.sell_price if direction == OrderDir.SELL else self.buy_price
+            price = self.quote.get_data_batch(stock_ids, start_time, end_time, field=pstr, method="ts_data_last")
+            invalid = np.isnan(price) | (price <= 1e-08)
+            if invalid.any():
+                for stock_id, deal_price in zip(np.array(stock_ids)[invalid], price[invalid]):
+                    deal_price = None if np.isnan(deal_price) else deal_price
+                    self.logger.warning(
+                        f"(stock_id:{stock_id}, trade_time:{(start_time, end_time)}, {pstr}): {deal_price}!!!"
+                    )
+                    self.logger.warning(f"setting deal_price to close price")
+                price[invalid] = self.quote.get_data_batch(
+                    list(np.array(stock_ids)[invalid]), start_time, end_time, field="$close", method="ts_data_last"
+                )
+            quote["price"][idx] = price
+            quote["volume"][idx] = self.quote.get_data_batch(
+                stock_ids, start_time, end_time, field="$volume", method="sum"
+            )
+            quote["factor"][idx] = self.quote.get_data_batch(
+                stock_ids, start_time, end_time, field="$factor", method="ts_data_last"
+            )
+
+            vol_limit = self.buy_vol_limit if direction == Order.BUY else self.sell_vol_limit
+            if vol_limit is not None:
+                values = []
+                for limit in vol_limit:
+                    if limit[0] == "current":
+                        method = "sum"
+                    elif limit[0] == "cum":
+                        method = "ts_data_last"
+                    else:
+                        raise ValueError(f"{limit[0]} is not supported")
+                    values.append(self.quote.get_data_batch(stock_ids, start_time, end_time, limit[1], method))
+                for j, i in enumerate(idx):
+                    quote["vol_limit"][i] = [v[j] for v in values]
+        return quote
 
     def get_quote_info(
         self,
@@ -823,14 +1116,24 @@ class Exchange:
                 vol_limit_num.append(limit_value - dealt_order_amount[order.stock_id])
             else:
                 raise ValueError(f"{limit[0]} is not supported")
-        vol_limit_min = min(vol_limit_num)
-        orig_deal_amount = order.deal_amount
-        order.deal_amount = max(min(vol_limit_min, orig_deal_amount), 0)
-        if vol_limit_min < orig_deal_amount:
-            self.logger.debug(f"Order clipped due to volume limitation: {order}, {list(zip(vol_limit_num, vol_limit))}")
-
+        self._clip_amount_by_vol_limit_num(order, vol_limit, vol_limit_num)
         return None
 
+    def _clip_amount_by_vol_limit_num(self, order: Order, vol_limit: list, vol_limit_num: List[float]) -> None:
+        """clip the deal amount of `order` **inplace** by the values of volume limits"""
+        order.deal_amount = self._clip_deal_amount_by_vol_limit_num(order.deal_amount, vol_limit, vol_limit_num, order)
+
+    def _clip_deal_amount_by_vol_limit_num(
+        self, deal_amount: float, vol_limit: list, vol_limit_num: List[float], order_desc: object
+    ) -> float:
+        """return the deal amount clipped by the values of volume limits. `order_desc` is only used in the logs"""
+        vol_limit_min = min(vol_limit_num)
+        if vol_limit_min < deal_amount:
+            self.logger.debug(
+                f"Order clipped due to volume limitation: {order_desc}, {list(zip(vol_limit_num, vol_limit))}"
+            )
+        return max(min(vol_limit_min, deal_amount), 0)
+
     def _get_buy_amount_by_cash_limit(self, trade_price: float, cash: float, cost_ratio: float) -> float:
         """return the real order amount after cash limit for buying.
         Parameters
@@ -882,74 +1185,114 @@ class Exchange:
         # Another choice is placing it after rounding the order
         # - It simulates that the large order is submitted, but partial is dealt regardless of rounding by trading unit.
         self._clip_amount_by_volume(order, dealt_order_amount)
+        return self._calc_trade_info_by_deal_amount(order, position, trade_price, total_trade_val)
+
+    def _calc_trade_info_by_deal_amount(
+        self,
+        order: Order,
+        position: Optional[BasePosition],
+        trade_price: float,
+        total_trade_val: float,
+    ) -> Tuple[float, float, float]:
+        """
+        The second part of `_calc_trade_info_by_order`: the quote of the order is ready and `order.deal_amount` has
+        been clipped by volume. It rounds the amount and checks the cash of `position`.
+        **NOTE**: Order will be changed in this function
+        :return: trade_price, trade_val, trade_cost
+        """
+        order.deal_amount, trade_price, trade_val, trade_cost = self._calc_deal_info(
+            order.stock_id,
+            order.direction,
+            order.deal_amount,
+            order.factor,
+            position,
+            trade_price,
+            total_trade_val,
+            order,
+        )
+        return trade_price, trade_val, trade_cost
 
+    def _calc_deal_info(
+        self,
+        stock_id: str,
+        direction: OrderDir,
+        deal_amount: float,
+        factor: Optional[float],
+        position: Optional[BasePosition],
+        trade_price: float,
+        total_trade_val: float,
+        order_desc: object,
+    ) -> Tuple[float, float, float, float]:
+        """
+        `_calc_trade_info_by_deal_amount` on the attributes of an order (e.g. a row of `OrderBatch`).
+        `order_desc` is only used in the logs.
+        :return: deal_amount, trade_price, trade_val, trade_cost
+        """
         # TODO: the adjusted cost ratio can be overestimated as deal_amount will be clipped in the next steps
-        trade_val = order.deal_amount * trade_price
+        trade_val = deal_amount * trade_price
         if not total_trade_val or np.isnan(total_trade_val):
-            # TODO: assert trade_val == 0, f"trade_val != 0, total_trade_val: {total_trade_val}; order info: {order}"
+            # TODO: assert trade_val == 0, f"trade_val != 0, total_trade_val: {total_trade_val}; order info: {order_desc}"
             adj_cost_ratio = self.impact_cost
         else:
             adj_cost_ratio = self.impact_cost * (trade_val / total_trade_val) ** 2
 
-        if order.direction == Order.SELL:
+        if direction == Order.SELL:
             cost_ratio = self.close_cost + adj_cost_ratio
             # sell
             # if we don't know current position, we choose to sell all
             # Otherwise, we clip the amount based on current position
             if position is not None:
                 # TODO: make the trading shortable
-                current_amount = (
-                    position.get_stock_amount(order.stock_id) if position.check_stock(order.stock_id) else 0
-                )
-                if not np.isclose(order.deal_amount, current_amount):
+                current_amount = position.get_stock_amount(stock_id) if position.check_stock(stock_id) else 0
+                if not np.isclose(deal_amount, current_amount):
                     # when not selling last stock. rounding is necessary
-                    order.deal_amount = self.round_amount_by_trade_unit(
-                        min(current_amount, order.deal_amount),
-                        order.factor,
+                    deal_amount = self.round_amount_by_trade_unit(
+                        min(current_amount, deal_amount),
+                        factor,
                     )
 
                 # in case of negative value of cash
-                if position.get_cash() + order.deal_amount * trade_price < max(
-                    order.deal_amount * trade_price * cost_ratio,
+                if position.get_cash() + deal_amount * trade_price < max(
+                    deal_amount * trade_price * cost_ratio,
                     self.min_cost,
                 ):
-                    order.deal_amount = 0
-                    self.logger.debug(f"Order clipped due to cash limitation: {order}")
+                    deal_amount = 0
+                    self.logger.debug(f"Order clipped due to cash limitation: {order_desc}")
 
-        elif order.direction == Order.BUY:
+        elif direction == Order.BUY:
             cost_ratio = self.open_cost + adj_cost_ratio
             # buy
             if position is not None:
                 cash = position.get_cash()
-                trade_val = order.deal_amount * trade_price
+                trade_val = deal_amount * trade_price
                 if cash < max(trade_val * cost_ratio, self.min_cost):
                     # cash cannot cover cost
-                    order.deal_amount = 0
-                    self.logger.debug(f"Order clipped due to cost higher than cash: {order}")
+                    deal_amount = 0
+                    self.logger.debug(f"Order clipped due to cost higher than cash: {order_desc}")
                 elif cash < trade_val + max(trade_val * cost_ratio, self.min_cost):
                     # The money is not enough
                     max_buy_amount = self._get_buy_amount_by_cash_limit(trade_price, cash, cost_ratio)
-                    order.deal_amount = self.round_amount_by_trade_unit(
-                        min(max_buy_amount, order.deal_amount),
-                        order.factor,
+                    deal_amount = self.round_amount_by_trade_unit(
+                        min(max_buy_amount, deal_amount),
+                        factor,
                     )
-                    self.logger.debug(f"Order clipped due to cash limitation: {order}")
+                    self.logger.debug(f"Order clipped due to cash limitation: {order_desc}")
                 else:
                     # The money is enough
-                    order.deal_amount = self.round_amount_by_trade_unit(order.deal_amount, order.factor)
+                    deal_amount = self.round_amount_by_trade_unit(deal_amount, factor)
             else:
                 # Unknown amount of money. Just round the amount
-                order.deal_amount = self.round_amount_by_trade_unit(order.deal_amount, order.factor)
+                deal_amount = self.round_amount_by_trade_unit(deal_amount, factor)
 
         else:
-            raise NotImplementedError("order direction {} error".format(order.direction))
+            raise NotImplementedError("order direction {} error".format(direction))
 
-        trade_val = order.deal_amount * trade_price
+        trade_val = deal_amount * trade_price
         trade_cost = max(trade_val * cost_ratio, self.min_cost)
         if trade_val <= 1e-5:
             # if dealing is not successful, the trade_cost should be zero.
             trade_cost = 0
-        return trade_price, trade_val, trade_cost
+        return deal_amount, trade_price, trade_val, trade_cost
 
     def get_order_helper(self) -> OrderHelper:
         if not hasattr(self, "_order_helper"):
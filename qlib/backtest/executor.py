@@ -6,6 +6,7 @@ from collections import defaultdict
 from types import GeneratorType
 from typing import Any, Dict, Generator, List, Tuple, Union, cast
 
+import numpy as np
 import pandas as pd
 
 from qlib.backtest.account import Account
@@ -14,7 +15,7 @@ from qlib.log import get_module_logger
 
 from ..strategy.base import BaseStrategy
 from ..utils import init_instance_by_config
-from .decision import BaseTradeDecision, Order
+from .decision import BaseTradeDecision, Order, TradeDecisionWO
 from .exchange import Exchange
 from .utils import CommonInfrastructure, LevelInfrastructure, TradeCalendarManager, get_start_end_idx
 
@@ -174,6 +175,14 @@ class BaseExecutor:
         if common_infra is not None:
             self.reset_common_infra(common_infra)
 
+        if (
+            kwargs.get("start_time") is not None
+            and kwargs.get("end_time") is not None
+            and hasattr(self, "trade_account")
+        ):
+            # the metrics of the account will be recorded in each step of the calendar
+            self.trade_account.reserve(self.trade_calendar.get_trade_len())
+
     def get_level_infra(self) -> LevelInfrastructure:
         return self.level_infra
 
@@ -183,7 +192,7 @@ class BaseExecutor:
     def execute(self, trade_decision: BaseTradeDecision, level: int = 0) -> List[object]:
         """execute the trade decision and return the executed result
 
-        NOTE: this function is never used directly in the framework. Should we delete it?
+        NOTE: it is used by the fused inner loop of `NestedExecutor`, which drives the executor without generators.
 
         Parameters
         ----------
@@ -327,6 +336,7 @@ class NestedExecutor(BaseExecutor):
         track_data: bool = False,
         skip_empty_decision: bool = True,
         align_range_limit: bool = True,
+        fuse_inner_loop: bool = False,
         common_infra: CommonInfrastructure | None = None,
         **kwargs: Any,
     ) -> None:
@@ -345,6 +355,12 @@ class NestedExecutor(BaseExecutor):
         align_range_limit: bool
             force to align the trade_range decision
             It is only for nested executor, because range_limit is given by outer strategy
+        fuse_inner_loop: bool
+            Will the executor run the inner loop in the fused mode when it is possible.
+            The fused mode drives simple inner strategies (e.g. TWAPStrategy) with `SimulatorExecutor` by their
+            vectorized implementation. The results are the same as the generic loop.
+            It is disabled by default and should be enabled explicitly (e.g. for the long nested backtests).
+            Please refer to `_can_fuse_inner_loop` for the conditions.
         """
         self.inner_executor: BaseExecutor = init_instance_by_config(
             inner_executor,
@@ -359,6 +375,7 @@ class NestedExecutor(BaseExecutor):
 
         self._skip_empty_decision = skip_empty_decision
         self._align_range_limit = align_range_limit
+        self._fuse_inner_loop = fuse_inner_loop
 
         super(NestedExecutor, self).__init__(
             time_per_step=time_per_step,
@@ -416,6 +433,10 @@ class NestedExecutor(BaseExecutor):
         # - more detailed information will be set into trade decision
         self._init_sub_trading(trade_decision)
 
+        if self._can_fuse_inner_loop(trade_decision):
+            # the inner executor will be finished by the fused loop. So the generic loop below will be skipped
+            self._fused_inner_loop(trade_decision, level, execute_result, inner_order_indicators, decision_list)
+
         _inner_execute_result = None
         while not self.inner_executor.finished():
             trade_decision = self._update_trade_decision(trade_decision)
@@ -482,6 +503,64 @@ class NestedExecutor(BaseExecutor):
 
         return execute_result, {"inner_order_indicators": inner_order_indicators, "decision_list": decision_list}
 
+    def _can_fuse_inner_loop(self, trade_decision: BaseTradeDecision) -> bool:
+        """
+        The inner loop can be fused when
+        - the inner executor is a `SimulatorExecutor` which doesn't track data (i.e. nothing will be yielded)
+        - the decision is a list of orders, and the outer strategy doesn't update it during the inner loop
+        - the inner strategy supports the fused loop for the decision
+        """
+        return (
+            self._fuse_inner_loop
+            and isinstance(self.inner_executor, SimulatorExecutor)
+            and type(self.inner_executor)._collect_data is SimulatorExecutor._collect_data
+            and not self.inner_executor.track_data
+            and isinstance(trade_decision, TradeDecisionWO)
+            and type(trade_decision.strategy).update_trade_decision is BaseStrategy.update_trade_decision
+            and self.inner_strategy.support_fused_loop()
+        )
+
+    def _fused_inner_loop(
+        self,
+        trade_decision: BaseTradeDecision,
+        level: int,
+        execute_result: list,
+        inner_order_indicators: list,
+        decision_list: list,
+    ) -> None:
+        """
+        The fused version of the inner loop in `_collect_data`.
+        The results are appended to `execute_result`, `inner_order_indicators` and `decision_list`.
+
+        The decision is not updated by the outer strategy (please refer to `_can_fuse_inner_loop`), so the range
+        limit is calculated only once. The inner strategy generates the decisions by its vectorized implementation
+        and the inner executor is called directly instead of being driven by generators.
+        """
+        sub_cal: TradeCalendarManager = self.inner_executor.trade_calendar
+        # keep the side effects of `_update_trade_decision` (e.g. setting `total_step` of the decision)
+        trade_decision.update(sub_cal)
+        if trade_decision.empty() and self._skip_empty_decision:
+            return
+
+        start_idx, end_idx = get_start_end_idx(sub_cal, trade_decision)
+        _inner_execute_result = None
+        while not self.inner_executor.finished():
+            if self._align_range_limit and not start_idx <= sub_cal.get_trade_step() <= end_idx:
+                sub_cal.step()
+                continue
+
+            _inner_trade_decision = self.inner_strategy.generate_fused_trade_decision(_inner_execute_result)
+            trade_decision.mod_inner_decision(_inner_trade_decision)
+            decision_list.append((_inner_trade_decision, *sub_cal.get_step_time()))
+
+            _inner_execute_result = self.inner_executor.execute(_inner_trade_decision, level=level + 1)
+            self.post_inner_exe_step(_inner_execute_result)
+            execute_result.extend(_inner_execute_result)
+
+            inner_order_indicators.append(
+                self.inner_executor.trade_account.get_trade_indicator().get_order_indicator(raw=True),
+            )
+
     def post_inner_exe_step(self, inner_exe_res: List[object]) -> None:
         """
         A hook for doing sth after each step of inner strategy
@@ -591,25 +670,28 @@ class SimulatorExecutor(BaseExecutor):
         trade_start_time, _ = self.trade_calendar.get_step_time()
         execute_result: list = []
 
-        for order in self._get_order_iterator(trade_decision):
-            # Each time we move into a new date, clear `self.dealt_order_amount` since it only maintains intraday
-            # information.
-            now_deal_day = self.trade_calendar.get_step_time()[0].floor(freq="D")
-            if self.deal_day is None or now_deal_day > self.deal_day:
-                self.dealt_order_amount = defaultdict(float)
-                self.deal_day = now_deal_day
-
-            # execute the order.
-            # NOTE: The trade_account will be changed in this function
-            trade_val, trade_cost, trade_price = self.trade_exchange.deal_order(
-                order,
+        # Each time we move into a new date, clear `self.dealt_order_amount` since it only maintains intraday
+        # information.
+        now_deal_day = self.trade_calendar.get_step_time()[0].floor(freq="D")
+        if self.deal_day is None or now_deal_day > self.deal_day:
+            self.dealt_order_amount = defaultdict(float)
+            self.deal_day = now_deal_day
+
+        # execute the orders by batch.
+        # NOTE: The trade_account and `self.dealt_order_amount` will be changed in this function
+        trade_info = None
+        if isinstance(trade_decision, TradeDecisionWO) and not trade_decision.has_order_objects():
+            orders, deal_results, trade_info = self._deal_order_batch(trade_decision)
+        else:
+            orders = list(self._get_order_iterator(trade_decision))
+            deal_results = self.trade_exchange.deal_orders(
+                orders,
                 trade_account=self.trade_account,
                 dealt_order_amount=self.dealt_order_amount,
             )
+        for order, (trade_val, trade_cost, trade_price) in zip(orders, deal_results):
             execute_result.append((order, trade_val, trade_cost, trade_price))
 
-            self.dealt_order_amount[order.stock_id] += order.deal_amount
-
             if self.verbose:
                 print(
                     "[I {:%Y-%m-%d %H:%M:%S}]: {} {}, price {:.2f}, amount {}, deal_amount {}, factor {}, "
@@ -625,4 +707,40 @@ class SimulatorExecutor(BaseExecutor):
                         self.trade_account.get_cash(),
                     ),
                 )
-        return execute_result, {"trade_info": execute_result}
+        return execute_result, {"trade_info": execute_result if trade_info is None else trade_info}
+
+    def _deal_order_batch(self, trade_decision: TradeDecisionWO) -> Tuple[List[Order], list, tuple]:
+        """
+        Deal the orders of a decision kept in an `OrderBatch` on the arrays of the batch.
+        The `Order` objects of the decision are created after dealing for the executed results.
+
+        Returns
+        -------
+        Tuple[List[Order], list, tuple]:
+            the orders in the dealing order, the dealing results of `Exchange.deal_orders`, and the trade info
+            (batch, trade_val, trade_cost, trade_price) for updating the indicators
+        """
+        order_batch = trade_decision.get_order_batch()
+        if self.trade_type == self.TT_SERIAL:
+            dealing_idx = None
+        elif self.trade_type == self.TT_PARAL:
+            # the same as `_get_order_iterator`: the buying orders go first
+            dealing_idx = np.argsort(-order_batch.direction.astype(int), kind="stable")
+            order_batch = order_batch[dealing_idx]
+        else:
+            raise NotImplementedError(f"This type of input is not supported")
+
+        deal_results = self.trade_exchange.deal_orders(
+            order_batch,
+            trade_account=self.trade_account,
+            dealt_order_amount=self.dealt_order_amount,
+        )
+        if dealing_idx is not None:
+            # write the results back to the batch of the decision before creating the `Order` objects
+            trade_decision.order_batch.deal_amount[dealing_idx] = order_batch.deal_amount
+            trade_decision.order_batch.factor[dealing_idx] = order_batch.factor
+        orders = trade_decision.get_decision()
+        if dealing_idx is not None:
+            orders = [orders[i] for i in dealing_idx]
+        trade_val, trade_cost, trade_price = np.array(deal_results, dtype=np.float64).reshape(-1, 3).T
+        return orders, deal_results, (order_batch, trade_val, trade_cost, trade_price)
@@ -99,6 +99,36 @@ class BaseQuote:
 
         raise NotImplementedError(f"Please implement the `get_data` method")
 
+    def get_data_batch(
+        self,
+        stock_ids: Iterable[str],
+        start_time: Union[pd.Timestamp, str],
+        end_time: Union[pd.Timestamp, str],
+        field: str,
+        method: str,
+    ) -> np.ndarray:
+        """get the aggregated data of a list of stocks.
+
+        The values are the same as calling `get_data` stock by stock, except that None is converted to np.nan.
+        The subclasses could override it with a vectorized implementation.
+
+        Parameters
+        ----------
+        stock_ids : Iterable[str]
+        start_time : Union[pd.Timestamp, str]
+        end_time : Union[pd.Timestamp, str]
+        field : str
+        method : str
+            the method to aggregate the data. It can't be None.
+
+        Return
+        ----------
+        np.ndarray
+            float array with the same length as `stock_ids`
+        """
+        res = [self.get_data(stock_id, start_time, end_time, field, method) for stock_id in stock_ids]
+        return np.array([np.nan if v is None else v for v in res], dtype=np.float64)
+
 
 class PandasQuote(BaseQuote):
     def __init__(self, quote_df: pd.DataFrame, freq: str) -> None:
@@ -204,6 +234,202 @@ class NumpyQuote(BaseQuote):
             raise ValueError(f"{method} is not supported")
 
 
+class DenseQuote(BaseQuote):
+    """
+    Quote backed by dense arrays.
+
+    Each field is stored as a contiguous (time x instrument) np.ndarray. The stocks and timestamps are mapped to
+    integer ids, so
+
+    - a single bar is located by two integer indexes;
+    - the range aggregations (e.g. "sum", "mean", "all", "ts_data_last") are answered by the precomputed prefix sums
+      or running indexes of the field, so the cost doesn't grow with the length of the range.
+
+    The aggregated arrays are built lazily for the queried (field, method) pairs.
+    The results are the same as `NumpyQuote` (e.g. the underlying data are float64 and the missing bars are skipped).
+    It costs more memory than `NumpyQuote` when the stocks are listed on very different periods.
+    """
+
+    def __init__(self, quote_df: pd.DataFrame, freq: str, region: str = "cn") -> None:
+        """
+        Parameters
+        ----------
+        quote_df : pd.DataFrame
+            the init dataframe from qlib. Its index is <instrument, datetime>
+        freq : str
+            the frequency of the data
+        region : str
+            the region of the market. It is used to decide if a query only hits one piece of data.
+        """
+        super().__init__(quote_df=quote_df, freq=freq)
+        inst_codes, stock_ids = pd.factorize(quote_df.index.get_level_values("instrument"))
+        dt_codes, time_index = pd.factorize(quote_df.index.get_level_values("datetime"), sort=True)
+        self._stock_idx = {stock_id: i for i, stock_id in enumerate(stock_ids)}
+        self._time_index = pd.DatetimeIndex(time_index)
+        shape = (len(self._time_index), len(self._stock_idx))
+
+        self.exists = np.zeros(shape, dtype=bool)
+        self.exists[dt_codes, inst_codes] = True
+        self.data: Dict[str, np.ndarray] = {}
+        for field in quote_df.columns:
+            arr = np.full(shape, np.nan)
+            # same as IndexData: all the data are converted to float64
+            arr[dt_codes, inst_codes] = quote_df[field].values.astype(np.float64)
+            self.data[field] = arr
+
+        n, unit = Freq.parse(freq)
+        if unit in Freq.SUPPORT_CAL_LIST:
+            self.freq = Freq.get_timedelta(1, unit)
+        else:
+            raise ValueError(f"{freq} is not supported in DenseQuote")
+        self.region = region
+
+        # lazily built arrays for range queries. The key is (field, kind)
+        self._agg_cache: Dict[tuple, np.ndarray] = {}
+        self._time_range_cache: Dict[tuple, tuple] = {}
+
+    def get_all_stock(self):
+        return self._stock_idx.keys()
+
+    def get_stock_idx(self, stock_id: str) -> Optional[int]:
+        """the integer id of the stock; None if the stock does not exist"""
+        return self._stock_idx.get(stock_id)
+
+    def get_time_range(self, start_time: pd.Timestamp, end_time: pd.Timestamp) -> tuple:
+        """
+        Returns
+        -------
+        tuple:
+            the [start, end) integer positions of the closed time range [start_time, end_time]
+        """
+        key = (start_time, end_time)
+        rng = self._time_range_cache.get(key)
+        if rng is None:
+            rng = (
+                int(self._time_index.searchsorted(start_time, side="left")),
+                int(self._time_index.searchsorted(end_time, side="right")),
+            )
+            if len(self._time_range_cache) > 4096:
+                # the backtest moves forward. So the old ranges are rarely used again
+                self._time_range_cache.clear()
+            self._time_range_cache[key] = rng
+        return rng
+
+    def _get_agg_arr(self, field: Optional[str], kind: str) -> np.ndarray:
+        """
+        Build the arrays for range queries.
+
+        - "cnt": prefix count of the existing bars
+        - "sum"/"valid": prefix sum/count of the non-NaN values
+        - "false": prefix count of the existing bars with false values
+        - "last": the position of the last existing bar up to each time
+        - "last_valid": the position of the last non-NaN value up to each time
+        """
+        key = (field, kind)
+        arr = self._agg_cache.get(key)
+        if arr is not None:
+            return arr
+        if kind in ("cnt", "last"):
+            mask = self.exists
+        else:
+            values = self.data[field]
+            mask = ~np.isnan(values)
+        if kind == "sum":
+            arr = np.cumsum(np.where(mask, values, 0.0), axis=0)
+        elif kind == "false":
+            arr = np.cumsum(self.exists & (values == 0), axis=0, dtype=np.int64)
+        elif kind in ("cnt", "valid"):
+            arr = np.cumsum(mask, axis=0, dtype=np.int64)
+        elif kind in ("last", "last_valid"):
+            pos = np.where(mask, np.arange(mask.shape[0], dtype=np.int64)[:, None], -1)
+            self._agg_cache[key] = arr = np.maximum.accumulate(pos, axis=0)
+            return arr
+        else:
+            raise ValueError(f"{kind} is not supported")
+        # prepend zeros. So the sum of [s, e) is arr[e] - arr[s]
+        arr = np.concatenate([np.zeros((1, arr.shape[1]), dtype=arr.dtype), arr], axis=0)
+        self._agg_cache[key] = arr
+        return arr
+
+    def _range_sum(self, field: Optional[str], kind: str, s: int, e: int, sid: int):
+        arr = self._get_agg_arr(field, kind)
+        return arr[e, sid] - arr[s, sid]
+
+    def get_data(self, stock_id, start_time, end_time, field, method=None):
+        sid = self._stock_idx.get(stock_id)
+        if sid is None:
+            return None
+
+        # single data. Please refer to NumpyQuote for the details
+        if is_single_value(start_time, end_time, self.freq, self.region):
+            s, e = self.get_time_range(start_time, start_time)
+            if s == e or not self.exists[s, sid]:
+                return None
+            return self.data[field][s, sid]
+
+        s, e = self.get_time_range(start_time, end_time)
+        if s >= e or self._range_sum(None, "cnt", s, e, sid) == 0:
+            return None
+        if method is None:
+            mask = self.exists[s:e, sid]
+            return idd.SingleData(self.data[field][s:e, sid][mask], self._time_index[s:e][mask])
+        return self._agg_data(field, method, s, e, sid)
+
+    def _agg_data(self, field: str, method: str, s: int, e: int, sid: int) -> Union[float, bool, None]:
+        """Agg the data in [s, e) by specific method. There is at least one existing bar in the range."""
+        if method == "sum":
+            return self._range_sum(field, "sum", s, e, sid)
+        elif method == "mean":
+            cnt = self._range_sum(field, "valid", s, e, sid)
+            return self._range_sum(field, "sum", s, e, sid) / cnt if cnt > 0 else np.nan
+        elif method == "last":
+            return self.data[field][self._get_agg_arr(None, "last")[e - 1, sid], sid]
+        elif method == "all":
+            return self._range_sum(field, "false", s, e, sid) == 0
+        elif method == "ts_data_last":
+            pos = self._get_agg_arr(field, "last_valid")[e - 1, sid]
+            if pos < s:
+                return None
+            return self.data[field][pos, sid]
+        else:
+            raise ValueError(f"{method} is not supported")
+
+    def get_data_batch(self, stock_ids, start_time, end_time, field, method):
+        sids = np.array([self._stock_idx.get(stock_id, -1) for stock_id in stock_ids], dtype=np.int64)
+        res = np.full(len(sids), np.nan)
+        found = sids >= 0
+        sids = sids[found]
+        if len(sids) == 0:
+            return res
+
+        if is_single_value(start_time, end_time, self.freq, self.region):
+            s, e = self.get_time_range(start_time, start_time)
+            if s < e:
+                res[found] = np.where(self.exists[s, sids], self.data[field][s, sids], np.nan)
+            return res
+
+        s, e = self.get_time_range(start_time, end_time)
+        if s >= e:
+            return res
+        if method == "sum":
+            values = self._range_sum(field, "sum", s, e, sids)
+        elif method == "mean":
+            with np.errstate(invalid="ignore", divide="ignore"):
+                values = self._range_sum(field, "sum", s, e, sids) / self._range_sum(field, "valid", s, e, sids)
+        elif method == "last":
+            values = self.data[field][self._get_agg_arr(None, "last")[e - 1, sids], sids]
+        elif method == "all":
+            values = (self._range_sum(field, "false", s, e, sids) == 0).astype(np.float64)
+        elif method == "ts_data_last":
+            pos = self._get_agg_arr(field, "last_valid")[e - 1, sids]
+            values = np.where(pos >= s, self.data[field][pos, sids], np.nan)
+        else:
+            raise ValueError(f"{method} is not supported")
+        # the stocks without any data in the range
+        res[found] = np.where(self._range_sum(None, "cnt", s, e, sids) > 0, values, np.nan)
+        return res
+
+
 class BaseSingleMetric:
     """
     The data structure of the single metric.
@@ -612,8 +838,8 @@ class NumpyOrderIndicator(BaseOrderIndicator):
         super(NumpyOrderIndicator, self).__init__()
         self.data: Dict[str, SingleData] = OrderedDict()
 
-    def assign(self, col: str, metric: dict) -> None:
-        self.data[col] = idd.SingleData(metric)
+    def assign(self, col: str, metric: Union[dict, SingleData]) -> None:
+        self.data[col] = metric if isinstance(metric, idd.SingleData) else idd.SingleData(metric)
 
     def get_index_data(self, metric: str) -> SingleData:
         if metric in self.data:
@@ -656,3 +882,110 @@ class NumpyOrderIndicator(BaseOrderIndicator):
 
     def __repr__(self):
         return repr(self.data)
+
+
+class RecordBuffer:
+    """
+    The scalar records of the steps (e.g. the portfolio metrics of each bar) kept in preallocated NumPy buffers.
+
+    - Recording a step is O(1). The buffer is preallocated for the expected number of steps (e.g. the length of the
+      trade calendar, please refer to `reserve`) and grows by doubling when it is full.
+    - The records of the same time overwrite the former ones like a dict.
+    - The DataFrame is built from the buffer at once. The dtypes are the same as building it from dicts (i.e. the
+      columns of integers are kept as integers and the columns of None are object).
+    """
+
+    MIN_CAPACITY = 16
+
+    def __init__(self, columns: Iterable[str] = (), capacity: int = 0) -> None:
+        self._capacity = max(capacity, self.MIN_CAPACITY)
+        self._data = np.full((self._capacity, 0), np.nan)
+        self._columns: Dict[str, int] = {}
+        # the flags for restoring the dtypes
+        self._all_int: List[bool] = []
+        self._all_none: List[bool] = []
+        self._times: list = []
+        self._time_pos: dict = {}
+        for col in columns:
+            self._add_column(col)
+
+    def __len__(self) -> int:
+        return len(self._times)
+
+    @property
+    def columns(self) -> List[str]:
+        return list(self._columns)
+
+    def _add_column(self, col: str) -> int:
+        i = self._columns[col] = len(self._columns)
+        self._data = np.concatenate([self._data, np.full((self._capacity, 1), np.nan)], axis=1)
+        # the existing steps miss the values of the new column
+        self._all_int.append(len(self._times) == 0)
+        self._all_none.append(True)
+        return i
+
+    def reserve(self, n_steps: int) -> None:
+        """make sure that the next `n_steps` steps can be recorded without growing the buffer"""
+        capacity = len(self._times) + n_steps
+        if capacity > self._capacity:
+            # grow geometrically. The inner executors of the nested backtests reserve the steps of every outer step
+            # on the same account, so growing to the exact size reallocates the buffer at each of them
+            capacity = max(capacity, 2 * self._capacity)
+            data = np.full((capacity, self._data.shape[1]), np.nan)
+            data[: len(self._times)] = self._data[: len(self._times)]
+            self._data, self._capacity = data, capacity
+
+    def record(self, time: Any, values: Dict[str, Any]) -> None:
+        """
+        Parameters
+        ----------
+        time :
+            the time of the step
+        values : Dict[str, Any]
+            the scalar values (or None) of the columns
+        """
+        for col in values:
+            if col not in self._columns:
+                self._add_column(col)
+        pos = self._time_pos.get(time)
+        if pos is None:
+            pos = len(self._times)
+            if pos == self._capacity:
+                self.reserve(1)
+            self._times.append(time)
+            self._time_pos[time] = pos
+        row = self._data[pos]
+        for col, value in values.items():
+            i = self._columns[col]
+            if value is None:
+                row[i] = np.nan
+                self._all_int[i] = False
+            else:
+                row[i] = value
+                self._all_none[i] = False
+                if self._all_int[i] and (not isinstance(value, (int, np.integer)) or isinstance(value, bool)):
+                    self._all_int[i] = False
+        if len(values) < len(self._columns):
+            for col, i in self._columns.items():
+                if col not in values:
+                    row[i] = np.nan
+                    self._all_int[i] = False
+
+    def get(self, col: str, time: Any = None) -> float:
+        """get the value of `col` at `time`. The latest step is used if `time` is None"""
+        pos = len(self._times) - 1 if time is None else self._time_pos[time]
+        if pos < 0:
+            raise KeyError("There is no record")
+        return self._data[pos, self._columns[col]].item()
+
+    def to_dataframe(self) -> pd.DataFrame:
+        n = len(self._times)
+        df = pd.DataFrame(self._data[:n].copy(), index=pd.Index(self._times), columns=list(self._columns))
+        for col, i in self._columns.items():
+            if n == 0:
+                continue
+            if self._all_none[i]:
+                df[col] = pd.Series([None] * n, index=df.index, dtype=object)
+            elif self._all_int[i]:
+                df[col] = df[col].astype(np.int64)
+        return df
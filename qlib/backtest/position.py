@@ -3,8 +3,9 @@
 
 from __future__ import annotations
 
+import copy
 from datetime import timedelta
-from typing import Any, Dict, List, Union
+from typing import Any, Dict, List, Optional, Union
 
 import numpy as np
 import pandas as pd
@@ -13,6 +14,30 @@ from ..data.data import D
 from .decision import Order
 
 
+def _get_latest_close(
+    stock_list: List[str], start_time: Union[str, pd.Timestamp], freq: str, last_days: int
+) -> Dict[str, float]:
+    """get the latest close price of the stocks in the `last_days` days before `start_time`"""
+    start_time = pd.Timestamp(start_time)
+    # note that start time is 2020-01-01 00:00:00 if raw start time is "2020-01-01"
+    price_end_time = start_time
+    price_start_time = start_time - timedelta(days=last_days)
+    price_df = D.features(
+        stock_list,
+        ["$close"],
+        price_start_time,
+        price_end_time,
+        freq=freq,
+        disk_cache=True,
+    ).dropna()
+    price_dict = price_df.groupby(["instrument"], group_keys=False).tail(1)["$close"].to_dict()
+
+    if len(price_dict) < len(stock_list):
+        lack_stock = set(stock_list) - set(price_dict)
+        raise ValueError(f"{lack_stock} doesn't have close price in qlib in the latest {last_days} days")
+    return price_dict
+
+
 class BasePosition:
     """
     The Position wants to maintain the position like a dictionary
@@ -195,6 +220,29 @@ class BasePosition:
         """
         raise NotImplementedError(f"Please implement the `add_count_all` method")
 
+    def update_account_value(self, value: float) -> None:
+        """
+        Record the value of the account (cash + stock value) at the end of each bar
+
+        Parameters
+        ----------
+        value : float
+            the account value
+        """
+        self.position["now_account_value"] = value
+
+    def snapshot(self) -> BasePosition:
+        """
+        Get a snapshot of current position. It is used to keep the history positions.
+        The snapshot will not be changed by the later updates of current position.
+
+        Returns
+        -------
+        BasePosition:
+            the snapshot of current position
+        """
+        return copy.deepcopy(self)
+
     ST_CASH = "cash"
     ST_NO = "None"  # String is more typehint friendly than None
 
@@ -299,24 +347,7 @@ class Position(BasePosition):
         if len(stock_list) == 0:
             return
 
-        start_time = pd.Timestamp(start_time)
-        # note that start time is 2020-01-01 00:00:00 if raw start time is "2020-01-01"
-        price_end_time = start_time
-        price_start_time = start_time - timedelta(days=last_days)
-        price_df = D.features(
-            stock_list,
-            ["$close"],
-            price_start_time,
-            price_end_time,
-            freq=freq,
-            disk_cache=True,
-        ).dropna()
-        price_dict = price_df.groupby(["instrument"], group_keys=False).tail(1)["$close"].to_dict()
-
-        if len(price_dict) < len(stock_list):
-            lack_stock = set(stock_list) - set(price_dict)
-            raise ValueError(f"{lack_stock} doesn't have close price in qlib in the latest {last_days} days")
-
+        price_dict = _get_latest_close(stock_list, start_time, freq, last_days)
         for stock in stock_list:
             self.position[stock]["price"] = price_dict[stock]
         self.position["now_account_value"] = self.calculate_value()
@@ -500,6 +531,348 @@ class Position(BasePosition):
             self._settle_type = self.ST_NO
 
 
+class ArrayPosition(BasePosition):
+    """ArrayPosition
+
+    It has the same interface and behaviours as `Position`. But the holdings are stored in parallel numpy arrays
+    (amount, price, weight and the holding count of each bar) instead of a dict of dicts.
+
+    - `snapshot` is O(1). The snapshot shares the arrays with current position, and the arrays are copied (and
+      compacted to the held stocks) lazily before the next modification (i.e. copy-on-write). So keeping the history
+      positions in `Account` doesn't deepcopy the dicts at each step.
+    - `position` is a dict created on demand for the code accessing the dict of `Position` directly.
+      Modifying it will not change the position.
+    """
+
+    def __init__(self, cash: float = 0, position_dict: Dict[str, Union[Dict[str, float], float]] = {}) -> None:
+        """Init position by cash and position_dict.
+
+        Parameters
+        ----------
+        cash : float, optional
+            initial cash in account, by default 0
+        position_dict : Dict[
+                            stock_id,
+                            Union[
+                                int,  # it is equal to {"amount": int}
+                                {"amount": int, "price"(optional): float},
+                            ]
+                        ]
+            initial stocks with parameters amount and price,
+            if there is no price key in the dict of stocks, it will be filled by _fill_stock_value.
+            by default {}.
+        """
+        self._settle_type = self.ST_NO
+        self.init_cash = cash
+        self._cash = cash
+        self._cash_delay: Optional[float] = None
+        self._now_account_value: Optional[float] = None
+
+        # slot i of the arrays is the stock `self._stock_ids[i]`; the slots of sold stocks are released by `_held`
+        self._stock_ids: List[str] = []
+        self._index: Dict[str, int] = {}
+        self._n = 0
+        self._held = np.zeros(0, dtype=bool)
+        self._amount = np.zeros(0)
+        self._price = np.zeros(0)
+        self._weight = np.zeros(0)
+        self._count: Dict[str, np.ndarray] = {}  # NaN means the count of the bar is not set
+        self._shared = False  # the arrays are shared with snapshots
+        self._compact(max(8, len(position_dict)))
+
+        for stock, value in position_dict.items():
+            if not isinstance(value, dict):
+                value = {"amount": value}
+            self._init_stock(stock, value["amount"], value.get("price", None))
+            for key, val in value.items():
+                if key == "weight":
+                    self.update_stock_weight(stock, val)
+                elif key.startswith("count_"):
+                    self.update_stock_count(stock, key[len("count_") :], val)
+
+        # If the stock price information is missing, the account value will not be calculated temporarily
+        if not np.isnan(self._price[self._held_slots()]).any():
+            self._now_account_value = self.calculate_value()
+
+    def _held_slots(self) -> np.ndarray:
+        return np.flatnonzero(self._held[: self._n])
+
+    def _compact(self, capacity: int) -> None:
+        """move the held stocks into new arrays with `capacity` slots"""
+        slots = self._held_slots()
+        n = len(slots)
+
+        def _new(arr: np.ndarray, fill: float) -> np.ndarray:
+            new_arr = np.full(capacity, fill, dtype=arr.dtype)
+            new_arr[:n] = arr[slots]
+            return new_arr
+
+        self._stock_ids = [self._stock_ids[i] for i in slots]
+        self._index = {stock_id: i for i, stock_id in enumerate(self._stock_ids)}
+        self._held = _new(self._held, False)
+        self._amount = _new(self._amount, 0.0)
+        self._price = _new(self._price, np.nan)
+        self._weight = _new(self._weight, 0.0)
+        self._count = {bar: _new(count, np.nan) for bar, count in self._count.items()}
+        self._n = n
+        self._shared = False
+
+    def _own(self) -> None:
+        """copy the arrays before modifying them if they are shared with snapshots"""
+        if self._shared:
+            self._compact(max(8, 2 * len(self._index)))
+
+    def _slot(self, stock_id: str) -> int:
+        """
+        get the slot of a held stock to be modified.
+        NOTE: the arrays may be replaced, so please call it before accessing the arrays
+        """
+        self._own()
+        return self._index[stock_id]
+
+    def snapshot(self) -> ArrayPosition:
+        snap = copy.copy(self)
+        snap._shared = self._shared = True
+        return snap
+
+    @property
+    def position(self) -> dict:  # type: ignore[override]
+        """The position in the format of `Position.position`"""
+        position: dict = {}
+        for stock_id, i in self._index.items():
+            value = {
+                "amount": float(self._amount[i]),
+                "price": None if np.isnan(self._price[i]) else float(self._price[i]),
+                "weight": float(self._weight[i]),
+            }
+            for bar, count in self._count.items():
+                if not np.isnan(count[i]):
+                    value[f"count_{bar}"] = float(count[i])
+            position[stock_id] = value
+        position["cash"] = self._cash
+        if self._now_account_value is not None:
+            position["now_account_value"] = self._now_account_value
+        if self._cash_delay is not None:
+            position["cash_delay"] = self._cash_delay
+        return position
+
+    def update_account_value(self, value: float) -> None:
+        self._now_account_value = value
+
+    def fill_stock_value(self, start_time: Union[str, pd.Timestamp], freq: str, last_days: int = 30) -> None:
+        """fill the stock value by the close price of latest last_days from qlib.
+
+        Parameters
+        ----------
+        start_time :
+            the start time of backtest.
+        freq : str
+            Frequency
+        last_days : int, optional
+            the days to get the latest close price, by default 30.
+        """
+        slots = self._held_slots()
+        stock_list = [self._stock_ids[i] for i in slots[np.isnan(self._price[slots])]]
+        if len(stock_list) == 0:
+            return
+
+        price_dict = _get_latest_close(stock_list, start_time, freq, last_days)
+        for stock in stock_list:
+            self.update_stock_price(stock, price_dict[stock])
+        self._now_account_value = self.calculate_value()
+
+    def _init_stock(self, stock_id: str, amount: float, price: float | None = None) -> None:
+        """
+        initialization the stock in current position
+
+        Parameters
+        ----------
+        stock_id :
+            the id of the stock
+        amount : float
+            the amount of the stock
+        price :
+             the price when buying the init stock
+        """
+        if self._shared or self._n == len(self._held):
+            self._compact(max(8, 2 * (len(self._index) + 1)))
+        i = self._n
+        self._n += 1
+        self._stock_ids.append(stock_id)
+        self._index[stock_id] = i
+        self._held[i] = True
+        self._amount[i] = amount
+        self._price[i] = np.nan if price is None else price
+        self._weight[i] = 0  # update the weight in the end of the trade date
+        for count in self._count.values():
+            count[i] = np.nan
+
+    def _buy_stock(self, stock_id: str, trade_val: float, cost: float, trade_price: float) -> None:
+        trade_amount = trade_val / trade_price
+        if stock_id not in self._index:
+            self._init_stock(stock_id=stock_id, amount=trade_amount, price=trade_price)
+        else:
+            # exist, add amount
+            i = self._slot(stock_id)
+            self._amount[i] += trade_amount
+
+        self._cash -= trade_val + cost
+
+    def _sell_stock(self, stock_id: str, trade_val: float, cost: float, trade_price: float) -> None:
+        trade_amount = trade_val / trade_price
+        if stock_id not in self._index:
+            raise KeyError("{} not in current position".format(stock_id))
+        else:
+            i = self._slot(stock_id)
+            if np.isclose(self._amount[i], trade_amount):
+                # Selling all the stocks. Please refer to `Position._sell_stock` for the usage of `np.isclose`
+                self._del_stock(stock_id)
+            else:
+                # decrease the amount of stock
+                self._amount[i] -= trade_amount
+                # check if to delete
+                if self._amount[i] < -1e-5:
+                    raise ValueError(
+                        "only have {} {}, require {}".format(
+                            self._amount[i] + trade_amount,
+                            stock_id,
+                            trade_amount,
+                        ),
+                    )
+
+        new_cash = trade_val - cost
+        if self._settle_type == self.ST_CASH:
+            self._cash_delay += new_cash
+        elif self._settle_type == self.ST_NO:
+            self._cash += new_cash
+        else:
+            raise NotImplementedError(f"This type of input is not supported")
+
+    def _del_stock(self, stock_id: str) -> None:
+        i = self._slot(stock_id)
+        self._held[i] = False
+        del self._index[stock_id]
+
+    def check_stock(self, stock_id: str) -> bool:
+        return stock_id in self._index
+
+    def update_order(self, order: Order, trade_val: float, cost: float, trade_price: float) -> None:
+        # handle order, order is a order class, defined in exchange.py
+        if order.direction == Order.BUY:
+            # BUY
+            self._buy_stock(order.stock_id, trade_val, cost, trade_price)
+        elif order.direction == Order.SELL:
+            # SELL
+            self._sell_stock(order.stock_id, trade_val, cost, trade_price)
+        else:
+            raise NotImplementedError("do not support order direction {}".format(order.direction))
+
+    def update_stock_price(self, stock_id: str, price: float) -> None:
+        i = self._slot(stock_id)
+        self._price[i] = price
+
+    def update_stock_count(self, stock_id: str, bar: str, count: float) -> None:
+        i = self._slot(stock_id)
+        if bar not in self._count:
+            self._count[bar] = np.full(len(self._held), np.nan)
+        self._count[bar][i] = count
+
+    def update_stock_weight(self, stock_id: str, weight: float) -> None:
+        i = self._slot(stock_id)
+        self._weight[i] = weight
+
+    def calculate_stock_value(self) -> float:
+        slots = self._held_slots()
+        return float(np.dot(self._amount[slots], self._price[slots]))
+
+    def calculate_value(self) -> float:
+        value = self.calculate_stock_value()
+        value += self._cash + (self._cash_delay or 0.0)
+        return value
+
+    def get_stock_list(self) -> List[str]:
+        return list(self._index)
+
+    def get_stock_price(self, code: str) -> float:
+        return float(self._price[self._index[code]])
+
+    def get_stock_amount(self, code: str) -> float:
+        return float(self._amount[self._index[code]]) if code in self._index else 0
+
+    def get_stock_count(self, code: str, bar: str) -> float:
+        """the days the account has been hold, it may be used in some special strategies"""
+        i = self._index[code]
+        if bar in self._count and not np.isnan(self._count[bar][i]):
+            return float(self._count[bar][i])
+        else:
+            return 0
+
+    def get_stock_weight(self, code: str) -> float:
+        return float(self._weight[self._index[code]])
+
+    def get_cash(self, include_settle: bool = False) -> float:
+        cash = self._cash
+        if include_settle:
+            cash += self._cash_delay or 0.0
+        return cash
+
+    def get_stock_amount_dict(self) -> dict:
+        """generate stock amount dict {stock_id : amount of stock}"""
+        slots = self._held_slots()
+        return dict(zip([self._stock_ids[i] for i in slots], self._amount[slots].tolist()))
+
+    def get_stock_weight_dict(self, only_stock: bool = False) -> dict:
+        """get_stock_weight_dict
+        generate stock weight dict {stock_id : value weight of stock in the position}
+        it is meaningful in the beginning or the end of each trade date
+
+        :param only_stock: If only_stock=True, the weight of each stock in total stock will be returned
+                           If only_stock=False, the weight of each stock in total assets(stock + cash) will be returned
+        """
+        if only_stock:
+            position_value = self.calculate_stock_value()
+        else:
+            position_value = self.calculate_value()
+        slots = self._held_slots()
+        weight = self._amount[slots] * self._price[slots] / position_value
+        return dict(zip([self._stock_ids[i] for i in slots], weight.tolist()))
+
+    def add_count_all(self, bar: str) -> None:
+        self._own()
+        if bar not in self._count:
+            self._count[bar] = np.full(len(self._held), np.nan)
+        slots = self._held_slots()
+        count = self._count[bar]
+        count[slots] = np.where(np.isnan(count[slots]), 1, count[slots] + 1)
+
+    def update_weight_all(self) -> None:
+        position_value = self.calculate_value()
+        self._own()
+        slots = self._held_slots()
+        self._weight[slots] = self._amount[slots] * self._price[slots] / position_value
+
+    def settle_start(self, settle_type: str) -> None:
+        assert self._settle_type == self.ST_NO, "Currently, settlement can't be nested!!!!!"
+        self._settle_type = settle_type
+        if settle_type == self.ST_CASH:
+            self._cash_delay = 0.0
+
+    def settle_commit(self) -> None:
+        if self._settle_type != self.ST_NO:
+            if self._settle_type == self.ST_CASH:
+                self._cash += self._cash_delay
+                self._cash_delay = None
+            else:
+                raise NotImplementedError(f"This type of input is not supported")
+            self._settle_type = self.ST_NO
+
+    def __str__(self) -> str:
+        return self.position.__str__()
+
+    def __repr__(self) -> str:
+        return self.position.__repr__()
+
+
 class InfPosition(BasePosition):
     """
     Position with infinite cash and amount.
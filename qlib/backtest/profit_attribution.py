@@ -5,6 +5,7 @@ This module is not well maintained.
 """
 
 import datetime
+import warnings
 from pathlib import Path
 
 import numpy as np
@@ -12,6 +13,7 @@ import pandas as pd
 
 from ..config import C
 from ..data import D
+from .benchmark_cache import BenchmarkCache
 from .position import Position
 
 
@@ -37,19 +39,32 @@ def get_benchmark_weight(
              Every column corresponds to a stock.
              Every cell represents the strategy.
 
+    The weights of all dates are cached on disk (see `qlib.backtest.benchmark_cache`) and sliced by the dates.
     """
     if not path:
         path = Path(C.dpm.get_data_uri(freq)).expanduser() / "raw" / "AIndexMembers" / "weights.csv"
-    # TODO: the storage of weights should be implemented in a more elegent way
-    # TODO: The benchmark is not consistent with the filename in instruments.
-    bench_weight_df = pd.read_csv(path, usecols=["code", "date", "index", "weight"])
-    bench_weight_df = bench_weight_df[bench_weight_df["index"] == bench]
-    bench_weight_df["date"] = pd.to_datetime(bench_weight_df["date"])
-    if start_date is not None:
-        bench_weight_df = bench_weight_df[bench_weight_df.date >= start_date]
-    if end_date is not None:
-        bench_weight_df = bench_weight_df[bench_weight_df.date <= end_date]
-    bench_stock_weight = bench_weight_df.pivot_table(index="date", columns="code", values="weight") / 100.0
+
+    def _load(start_date=None, end_date=None):
+        # TODO: the storage of weights should be implemented in a more elegent way
+        # TODO: The benchmark is not consistent with the filename in instruments.
+        bench_weight_df = pd.read_csv(path, usecols=["code", "date", "index", "weight"])
+        bench_weight_df = bench_weight_df[bench_weight_df["index"] == bench]
+        bench_weight_df["date"] = pd.to_datetime(bench_weight_df["date"])
+        if start_date is not None:
+            bench_weight_df = bench_weight_df[bench_weight_df.date >= start_date]
+        if end_date is not None:
+            bench_weight_df = bench_weight_df[bench_weight_df.date <= end_date]
+        return bench_weight_df.pivot_table(index="date", columns="code", values="weight") / 100.0
+
+    cache = BenchmarkCache.default(freq)
+    if cache is None:
+        # only the weights in the range are pivoted
+        return _load(start_date, end_date)
+    bench_stock_weight = cache.get_weights(bench, path, _load)
+    if start_date is not None or end_date is not None:
+        bench_stock_weight = bench_stock_weight.loc[start_date:end_date]
+        # only keep the stocks in the range like pivoting the weights in the range
+        bench_stock_weight = bench_stock_weight.dropna(axis=1, how="all")
     return bench_stock_weight
 
 
@@ -58,15 +73,48 @@ def get_stock_weight_df(positions):
     :param positions: Given a positions from backtest result.
     :return:          A weight distribution for the position
     """
-    stock_weight = []
-    index = []
-    for date in sorted(positions.keys()):
+    dates = sorted(positions.keys())
+    rows, codes, weights = [], [], []
+    for i, date in enumerate(dates):
         pos = positions[date]
         if isinstance(pos, dict):
             pos = Position(position_dict=pos)
-        index.append(date)
-        stock_weight.append(pos.get_stock_weight_dict(only_stock=True))
-    return pd.DataFrame(stock_weight, index=index)
+        stock_weight = pos.get_stock_weight_dict(only_stock=True)
+        rows.extend([i] * len(stock_weight))
+        codes.extend(stock_weight.keys())
+        weights.extend(stock_weight.values())
+    # the stocks are in the order of their first appearance
+    columns = pd.Index(pd.unique(np.array(codes, dtype=object)))
+    stock_weight = np.full((len(dates), len(columns)), np.nan)
+    stock_weight[rows, columns.get_indexer(codes)] = weights
+    return pd.DataFrame(stock_weight, index=dates, columns=columns)
+
+
+def _get_all_group(stock_group_df):
+    all_group = np.unique(stock_group_df.values.flatten())
+    return all_group[~np.isnan(all_group)]
+
+
+def _get_group_code(stock_group, all_group):
+    """the positions of the groups of the stocks in `all_group` (-1 for the stocks without group)"""
+    code = np.searchsorted(all_group, stock_group)
+    code[np.isnan(stock_group)] = -1
+    return code
+
+
+def _group_sum(values, group_code, n_group):
+    """the sum of the values of the stocks in each group on each day
+
+    :param values:     array of <date, stock>. NaN is skipped
+    :param group_code: array of <date, stock>, the positions of the groups (-1 for no group)
+    :param n_group:    the number of groups
+
+    :return:           array of <date, group>
+    """
+    mask = (group_code >= 0) & ~np.isnan(values)
+    n_date = values.shape[0]
+    bins = (np.arange(n_date)[:, None] * n_group + group_code)[mask]
+    return np.bincount(bins, weights=values[mask], minlength=n_date * n_group).reshape(n_date, n_group)
 
 
 def decompose_portofolio_weight(stock_weight_df, stock_group_df):
@@ -95,15 +143,20 @@ def decompose_portofolio_weight(stock_weight_df, stock_group_df):
     :return:        Two dict will be returned.  The group_weight and the stock_weight_in_group.
                     The key is the group. The value is a Series or Dataframe to describe the weight of group or weight of stock
     """
-    all_group = np.unique(stock_group_df.values.flatten())
-    all_group = all_group[~np.isnan(all_group)]
+    all_group = _get_all_group(stock_group_df)
+    stock_weight = stock_weight_df.values.astype(np.float64)
+    group_code = _get_group_code(stock_group_df.reindex_like(stock_weight_df).values, all_group)
+    group_weight_arr = _group_sum(stock_weight, group_code, len(all_group))
 
     group_weight = {}
     stock_weight_in_group = {}
-    for group_key in all_group:
-        group_mask = stock_group_df == group_key
-        group_weight[group_key] = stock_weight_df[group_mask].sum(axis=1)
-        stock_weight_in_group[group_key] = stock_weight_df[group_mask].divide(group_weight[group_key], axis=0)
+    for i, group_key in enumerate(all_group):
+        group_weight[group_key] = pd.Series(group_weight_arr[:, i], index=stock_weight_df.index)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            weight_in_group = np.where(group_code == i, stock_weight, np.nan) / group_weight_arr[:, [i]]
+        stock_weight_in_group[group_key] = pd.DataFrame(
+            weight_in_group, index=stock_weight_df.index, columns=stock_weight_df.columns
+        )
     return group_weight, stock_weight_in_group
 
 
@@ -152,28 +205,49 @@ def decompose_portofolio(stock_weight_df, stock_group_df, stock_ret_df):
 
     :return: It will decompose the portofolio to the group weight and group return.
     """
-    all_group = np.unique(stock_group_df.values.flatten())
-    all_group = all_group[~np.isnan(all_group)]
-
-    group_weight, stock_weight_in_group = decompose_portofolio_weight(stock_weight_df, stock_group_df)
+    all_group = _get_all_group(stock_group_df)
+    dates, stocks = stock_weight_df.index, stock_weight_df.columns
+
+    # the weights, groups and returns are aligned into arrays of <date, stock>
+    stock_weight = stock_weight_df.values.astype(np.float64)
+    group_code = _get_group_code(stock_group_df.reindex(index=dates, columns=stocks).values, all_group)
+    stock_ret = stock_ret_df.reindex(index=dates, columns=stocks).values
+
+    group_weight = _group_sum(stock_weight, group_code, len(all_group))
+    # the return of a group is the weighted average of the returns of the stocks in the group
+    with np.errstate(divide="ignore", invalid="ignore"):
+        group_ret = _group_sum(stock_weight * stock_ret, group_code, len(all_group)) / group_weight
+    # If no weight is assigned, then the return of group will be np.nan
+    group_ret[group_weight == 0.0] = np.nan
+
+    group_weight_df = pd.DataFrame(group_weight, index=dates, columns=all_group)
+    group_ret_df = pd.DataFrame(group_ret, index=dates.rename(stock_ret_df.index.name), columns=all_group)
+    return group_weight_df, group_ret_df
 
-    group_ret = {}
-    for group_key, val in stock_weight_in_group.items():
-        stock_weight_in_group_start_date = min(val.index)
-        stock_weight_in_group_end_date = max(val.index)
 
-        temp_stock_ret_df = stock_ret_df[
-            (stock_ret_df.index >= stock_weight_in_group_start_date)
-            & (stock_ret_df.index <= stock_weight_in_group_end_date)
-        ]
+def _get_bin_group(values, bench_values, group_n):
+    """the vectorized version of `get_daily_bin_group` for all the days
 
-        group_ret[group_key] = (temp_stock_ret_df * val).sum(axis=1)
-        # If no weight is assigned, then the return of group will be np.nan
-        group_ret[group_key][group_weight[group_key] == 0.0] = np.nan
+    :param values:       array of <date, stock>, the values of the stocks to be grouped
+    :param bench_values: array of <date, stock>, the values of the stocks in benchmark (NaN for the other stocks)
+    :param group_n:      Bins will be produced
 
-    group_weight_df = pd.DataFrame(group_weight)
-    group_ret_df = pd.DataFrame(group_ret)
-    return group_weight_df, group_ret_df
+    :return:             array of <date, stock>, the group id of the bins (NaN if the value is NaN)
+    """
+    bench_values = np.asarray(bench_values, dtype=np.float64)
+    values = np.asarray(values, dtype=np.float64)
+    # get the inner bin split points based on the daily proportion of benchmark
+    with warnings.catch_warnings():
+        # the days without benchmark values
+        warnings.simplefilter("ignore", category=RuntimeWarning)
+        split_points = np.nanpercentile(bench_values, np.linspace(0, 100, group_n + 1)[1:-1], axis=1)
+    # the value in the i-th bin is not less than i split points
+    bin_idx = np.zeros(values.shape, dtype=np.int64)
+    for split_point in split_points:
+        bin_idx += values >= split_point[:, None]
+    stock_group = (group_n - bin_idx).astype(np.float64)
+    stock_group[np.isnan(values) | np.isnan(bench_values).all(axis=1, keepdims=True)] = np.nan
+    return stock_group
 
 
 def get_daily_bin_group(bench_values, stock_values, group_n):
@@ -191,15 +265,8 @@ def get_daily_bin_group(bench_values, stock_values, group_n):
                          The value in the series is the group id of the bins.
                          The No.1 bin contains the biggest values.
     """
-    stock_group = stock_values.copy()
-
-    # get the bin split points based on the daily proportion of benchmark
-    split_points = np.percentile(bench_values[~bench_values.isna()], np.linspace(0, 100, group_n + 1))
-    # Modify the biggest uppper bound and smallest lowerbound
-    split_points[0], split_points[-1] = -np.inf, np.inf
-    for i, (lb, up) in enumerate(zip(split_points, split_points[1:])):
-        stock_group.loc[stock_values[(stock_values >= lb) & (stock_values < up)].index] = group_n - i
-    return stock_group
+    stock_group = _get_bin_group(stock_values.values[None, :], bench_values.values[None, :], group_n)
+    return pd.Series(stock_group[0], index=stock_values.index, name=stock_values.name)
 
 
 def get_stock_group(stock_group_field_df, bench_stock_weight_df, group_method, group_n=None):
@@ -213,13 +280,10 @@ def get_stock_group(stock_group_field_df, bench_stock_weight_df, group_method, g
         new_stock_group_df = stock_group_field_df.copy().loc[
             bench_stock_weight_df.index.min() : bench_stock_weight_df.index.max()
         ]
-        for idx, row in (~bench_stock_weight_df.isna()).iterrows():
-            bench_values = stock_group_field_df.loc[idx, row[row].index]
-            new_stock_group_df.loc[idx] = get_daily_bin_group(
-                bench_values,
-                stock_group_field_df.loc[idx],
-                group_n=group_n,
-            )
+        dates = new_stock_group_df.index.intersection(bench_stock_weight_df.index)
+        values = new_stock_group_df.loc[dates].values
+        in_bench = bench_stock_weight_df.reindex(index=dates, columns=new_stock_group_df.columns).notna().values
+        new_stock_group_df.loc[dates] = _get_bin_group(values, np.where(in_bench, values, np.nan), group_n)
         return new_stock_group_df
 
 
@@ -252,7 +316,7 @@ def brinson_pa(
 
     start_date, end_date = min(dates), max(dates)
 
-    bench_stock_weight = get_benchmark_weight(bench, start_date, end_date, freq)
+    bench_stock_weight = get_benchmark_weight(bench, start_date, end_date, freq=freq)
 
     # The attributes for allocation will not
     if not group_field.startswith("$"):
@@ -11,12 +11,101 @@ import numpy as np
 import pandas as pd
 
 import qlib.utils.index_data as idd
-from qlib.backtest.decision import BaseTradeDecision, Order, OrderDir
+from qlib.backtest.decision import BaseTradeDecision, Order, OrderBatch, OrderDir
 from qlib.backtest.exchange import Exchange
 
+from ..data import D
 from ..tests.config import CSI300_BENCH
 from ..utils.resam import get_higher_eq_freq_feature, resam_ts_data
-from .high_performance_ds import BaseOrderIndicator, BaseSingleMetric, NumpyOrderIndicator
+from ..utils.time import Freq
+from .benchmark_cache import BenchmarkCache
+from .high_performance_ds import BaseOrderIndicator, BaseSingleMetric, NumpyOrderIndicator, RecordBuffer
+
+
+def cal_risk_analysis_scaler(freq: str) -> float:
+    """the scaler for annualizing the risk analysis of the returns of `freq`"""
+    _count, _freq = Freq.parse(freq)
+    _freq_scaler = {
+        Freq.NORM_FREQ_MINUTE: 240 * 238,
+        Freq.NORM_FREQ_DAY: 238,
+        Freq.NORM_FREQ_WEEK: 50,
+        Freq.NORM_FREQ_MONTH: 12,
+    }
+    return _freq_scaler[_freq] / _count
+
+
+class RiskAccumulator:
+    """
+    Online accumulator of the risk analysis of a return series.
+
+    It is updated by the return of each step in O(1) time and memory, and produces the same statistics as
+    `qlib.contrib.evaluate.risk_analysis` on the whole series (for both accumulation modes) without materializing the
+    series. The running mean and variance are updated by Welford's algorithm. NaN returns are skipped.
+    """
+
+    def __init__(self) -> None:
+        self.reset()
+
+    def reset(self) -> None:
+        self.count = 0
+        # running mean and sum of squared deviations of the returns and the log returns
+        self._mean, self._m2 = 0.0, 0.0
+        self._log_mean, self._log_m2 = 0.0, 0.0
+        # the cumulative curves ("sum" and "product"), their peaks and the max drawdowns
+        self._cum_sum, self._peak_sum, self._mdd_sum = 0.0, -np.inf, 0.0
+        self._cum_prod, self._peak_prod, self._mdd_prod = 1.0, -np.inf, 0.0
+
+    def update(self, r: float) -> None:
+        if np.isnan(r):
+            return
+        self.count += 1
+
+        delta = r - self._mean
+        self._mean += delta / self.count
+        self._m2 += delta * (r - self._mean)
+        log_r = np.log(1 + r)
+        delta = log_r - self._log_mean
+        self._log_mean += delta / self.count
+        self._log_m2 += delta * (log_r - self._log_mean)
+
+        self._cum_sum += r
+        self._peak_sum = max(self._peak_sum, self._cum_sum)
+        self._mdd_sum = min(self._mdd_sum, self._cum_sum - self._peak_sum)
+        self._cum_prod *= 1 + r
+        self._peak_prod = max(self._peak_prod, self._cum_prod)
+        self._mdd_prod = min(self._mdd_prod, self._cum_prod / self._peak_prod - 1)
+
+    def get_risk_analysis(self, N: int | None = None, freq: str = "day", mode: str = "sum") -> pd.DataFrame:
+        """the risk analysis like `qlib.contrib.evaluate.risk_analysis`, please refer to it for the parameters"""
+        if N is None and freq is None:
+            raise ValueError("at least one of `N` and `freq` should exist")
+        if N is None:
+            N = cal_risk_analysis_scaler(freq)
+
+        n = self.count
+        if mode == "sum":
+            mean = self._mean if n > 0 else np.nan
+            std = np.sqrt(self._m2 / (n - 1)) if n > 1 else np.nan
+            annualized_return = mean * N
+            max_drawdown = self._mdd_sum if n > 0 else np.nan
+        elif mode == "product":
+            mean = self._cum_prod ** (1 / n) - 1 if n > 0 else np.nan
+            std = np.sqrt(self._log_m2 / (n - 1)) if n > 1 else np.nan
+            annualized_return = self._cum_prod ** (N / n) - 1 if n > 0 else np.nan
+            max_drawdown = self._mdd_prod if n > 0 else np.nan
+        else:
+            raise ValueError(f"risk_analysis accumulation mode {mode} is not supported. Expected `sum` or `product`.")
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            information_ratio = mean / std * np.sqrt(N)
+        data = {
+            "mean": mean,
+            "std": std,
+            "annualized_return": annualized_return,
+            "information_ratio": information_ratio,
+            "max_drawdown": max_drawdown,
+        }
+        return pd.Series(data).to_frame("risk")
 
 
 class PortfolioMetrics:
@@ -75,17 +164,28 @@ class PortfolioMetrics:
         self.init_vars()
         self.init_bench(freq=freq, benchmark_config=benchmark_config)
 
+    # the columns of the portfolio metrics
+    # - account: account position value for each trade time
+    # - return: daily return rate for each trade time
+    # - total_turnover: total turnover for each trade time
+    # - turnover: turnover for each trade time
+    # - total_cost: total trade cost for each trade time
+    # - cost: trade cost rate for each trade time
+    # - value: value for each trade time
+    METRICS = ["account", "return", "total_turnover", "turnover", "total_cost", "cost", "value", "cash", "bench"]
+
+    # the excess returns analyzed online, like the risk analysis of `PortAnaRecord`
+    RISK_ANALYSIS = ["excess_return_without_cost", "excess_return_with_cost"]
+
     def init_vars(self) -> None:
-        self.accounts: dict = OrderedDict()  # account position value for each trade time
-        self.returns: dict = OrderedDict()  # daily return rate for each trade time
-        self.total_turnovers: dict = OrderedDict()  # total turnover for each trade time
-        self.turnovers: dict = OrderedDict()  # turnover for each trade time
-        self.total_costs: dict = OrderedDict()  # total trade cost for each trade time
-        self.costs: dict = OrderedDict()  # trade cost rate for each trade time
-        self.values: dict = OrderedDict()  # value for each trade time
-        self.cashes: dict = OrderedDict()
-        self.benches: dict = OrderedDict()
+        # the metrics are recorded in preallocated buffers. Please refer to `reserve`
+        self.metrics = RecordBuffer(self.METRICS)
         self.latest_pm_time: Optional[pd.TimeStamp] = None
+        self.risk_accumulators = {name: RiskAccumulator() for name in self.RISK_ANALYSIS}
+
+    def reserve(self, n_steps: int) -> None:
+        """reserve the buffers for the next `n_steps` steps (e.g. the length of the trade calendar)"""
+        self.metrics.reserve(n_steps)
 
     def init_bench(self, freq: str | None = None, benchmark_config: dict | None = None) -> None:
         if freq is not None:
@@ -111,14 +211,25 @@ class PortfolioMetrics:
                 raise ValueError("benchmark freq can't be None!")
             _codes = benchmark if isinstance(benchmark, (list, dict)) else [benchmark]
             fields = ["$close/Ref($close,1)-1"]
-            _temp_result, _ = get_higher_eq_freq_feature(_codes, fields, start_time, end_time, freq=freq)
-            if len(_temp_result) == 0:
+
+            def _load(_start_time, _end_time):
+                _temp_result, _freq = get_higher_eq_freq_feature(_codes, fields, _start_time, _end_time, freq=freq)
+                if len(_temp_result) == 0:
+                    return pd.Series(dtype=float), _freq
+                _ret = _temp_result.groupby(level="datetime", group_keys=False)[_temp_result.columns.tolist()[0]]
+                return _ret.mean().fillna(0), _freq
+
+            cache = BenchmarkCache.default(freq)
+            if cache is None:
+                bench, _ = _load(start_time, end_time)
+            else:
+                # the returns are reused by the backtests with the same benchmark
+                bench = cache.get_returns(
+                    (_codes, fields, freq), start_time, end_time, _load, lambda _freq: D.calendar(freq=_freq)
+                )
+            if len(bench) == 0:
                 raise ValueError(f"The benchmark {_codes} does not exist. Please provide the right benchmark")
-            return (
-                _temp_result.groupby(level="datetime", group_keys=False)[_temp_result.columns.tolist()[0]]
-                .mean()
-                .fillna(0)
-            )
+            return bench
 
     def _sample_benchmark(
         self,
@@ -136,19 +247,19 @@ class PortfolioMetrics:
         return 0.0 if _ret is None else _ret - 1
 
     def is_empty(self) -> bool:
-        return len(self.accounts) == 0
+        return len(self.metrics) == 0
 
     def get_latest_date(self) -> pd.Timestamp:
         return self.latest_pm_time
 
     def get_latest_account_value(self) -> float:
-        return self.accounts[self.latest_pm_time]
+        return self.metrics.get("account", self.latest_pm_time)
 
     def get_latest_total_cost(self) -> Any:
-        return self.total_costs[self.latest_pm_time]
+        return self.metrics.get("total_cost", self.latest_pm_time)
 
     def get_latest_total_turnover(self) -> Any:
-        return self.total_turnovers[self.latest_pm_time]
+        return self.metrics.get("total_turnover", self.latest_pm_time)
 
     def update_portfolio_metrics_record(
         self,
@@ -187,30 +298,55 @@ class PortfolioMetrics:
             bench_value = self._sample_benchmark(self.bench, trade_start_time, trade_end_time)
 
         # update pm data
-        self.accounts[trade_start_time] = account_value
-        self.returns[trade_start_time] = return_rate
-        self.total_turnovers[trade_start_time] = total_turnover
-        self.turnovers[trade_start_time] = turnover_rate
-        self.total_costs[trade_start_time] = total_cost
-        self.costs[trade_start_time] = cost_rate
-        self.values[trade_start_time] = stock_value
-        self.cashes[trade_start_time] = cash
-        self.benches[trade_start_time] = bench_value
+        self.metrics.record(
+            trade_start_time,
+            {
+                "account": account_value,
+                "return": return_rate,
+                "total_turnover": total_turnover,
+                "turnover": turnover_rate,
+                "total_cost": total_cost,
+                "cost": cost_rate,
+                "value": stock_value,
+                "cash": cash,
+                "bench": bench_value,
+            },
+        )
         # update pm
         self.latest_pm_time = trade_start_time
+        # NOTE: the excess returns are not available without benchmark
+        excess_return = return_rate - (np.nan if bench_value is None else bench_value)
+        self.risk_accumulators["excess_return_without_cost"].update(excess_return)
+        self.risk_accumulators["excess_return_with_cost"].update(excess_return - cost_rate)
         # finish pm update in each step
 
+    def get_risk_analysis(self, N: int | None = None, freq: str | None = None, mode: str = "sum") -> pd.DataFrame:
+        """
+        get the risk analysis of the excess returns, which is accumulated step by step
+
+        Parameters
+        ----------
+        N, mode :
+            please refer to `qlib.contrib.evaluate.risk_analysis`
+        freq : str | None
+            the frequency for calculating the annualizing scaler, by default the frequency of the metrics
+
+        Returns
+        -------
+        pd.DataFrame
+            the same format as the analysis of `PortAnaRecord` (indexed by the excess return and the risk metric)
+        """
+        if N is None and freq is None:
+            freq = self.freq
+        return pd.concat(
+            {
+                name: accumulator.get_risk_analysis(N=N, freq=freq, mode=mode)
+                for name, accumulator in self.risk_accumulators.items()
+            }
+        )
+
     def generate_portfolio_metrics_dataframe(self) -> pd.DataFrame:
-        pm = pd.DataFrame()
-        pm["account"] = pd.Series(self.accounts)
-        pm["return"] = pd.Series(self.returns)
-        pm["total_turnover"] = pd.Series(self.total_turnovers)
-        pm["turnover"] = pd.Series(self.turnovers)
-        pm["total_cost"] = pd.Series(self.total_costs)
-        pm["cost"] = pd.Series(self.costs)
-        pm["value"] = pd.Series(self.values)
-        pm["cash"] = pd.Series(self.cashes)
-        pm["bench"] = pd.Series(self.benches)
+        pm = self.metrics.to_dataframe()
         pm.index.name = "datetime"
         return pm
 
@@ -283,7 +419,8 @@ class Indicator:
         self.order_indicator: BaseOrderIndicator = self.order_indicator_cls()
 
         # trade indicator is metrics for all orders for a specific step
-        self.trade_indicator_his: dict = OrderedDict()
+        # the history is recorded in preallocated buffers. Please refer to `reserve`
+        self.trade_indicator_his = RecordBuffer()
         self.trade_indicator: Dict[str, Optional[BaseSingleMetric]] = OrderedDict()
 
         self._trade_calendar = None
@@ -294,38 +431,65 @@ class Indicator:
         self.trade_indicator = OrderedDict()
         # self._trade_calendar = trade_calendar
 
+    def reserve(self, n_steps: int) -> None:
+        """reserve the buffers for the next `n_steps` steps (e.g. the length of the trade calendar)"""
+        self.trade_indicator_his.reserve(n_steps)
+
     def record(self, trade_start_time: Union[str, pd.Timestamp]) -> None:
         self.order_indicator_his[trade_start_time] = self.get_order_indicator()
-        self.trade_indicator_his[trade_start_time] = self.get_trade_indicator()
-
-    def _update_order_trade_info(self, trade_info: List[Tuple[Order, float, float, float]]) -> None:
-        amount = dict()
-        deal_amount = dict()
-        trade_price = dict()
-        trade_value = dict()
-        trade_cost = dict()
-        trade_dir = dict()
-        pa = dict()
-
-        for order, _trade_val, _trade_cost, _trade_price in trade_info:
-            amount[order.stock_id] = order.amount_delta
-            deal_amount[order.stock_id] = order.deal_amount_delta
-            trade_price[order.stock_id] = _trade_price
-            trade_value[order.stock_id] = _trade_val * order.sign
-            trade_cost[order.stock_id] = _trade_cost
-            trade_dir[order.stock_id] = order.direction
-            # The PA in the innermost layer is meanless
-            pa[order.stock_id] = 0
-
-        self.order_indicator.assign("amount", amount)
-        self.order_indicator.assign("inner_amount", amount)
-        self.order_indicator.assign("deal_amount", deal_amount)
+        self.trade_indicator_his.record(trade_start_time, self.get_trade_indicator())
+
+    def _update_order_trade_info(
+        self,
+        trade_info: Union[
+            List[Tuple[Order, float, float, float]], Tuple[OrderBatch, np.ndarray, np.ndarray, np.ndarray]
+        ],
+    ) -> None:
+        if len(trade_info) == 4 and isinstance(trade_info[0], OrderBatch):
+            order_batch, _trade_val, _trade_cost, _trade_price = cast(tuple, trade_info)
+            stock_id = order_batch.stock_id.tolist()
+            _amount = order_batch.amount_delta.tolist()
+            _deal_amount = order_batch.deal_amount_delta.tolist()
+            _trade_value = (np.asarray(_trade_val, dtype=np.float64) * order_batch.sign).tolist()
+            _trade_dir = order_batch.direction.tolist()
+            _trade_cost = np.asarray(_trade_cost, dtype=np.float64).tolist()
+            _trade_price = np.asarray(_trade_price, dtype=np.float64).tolist()
+        else:
+            orders = [order for order, _, _, _ in trade_info]
+            stock_id = [order.stock_id for order in orders]
+            _amount = [order.amount_delta for order in orders]
+            _deal_amount = [order.deal_amount_delta for order in orders]
+            _trade_value = [info[1] * order.sign for order, info in zip(orders, trade_info)]
+            _trade_dir = [order.direction for order in orders]
+            _trade_cost = [info[2] for info in trade_info]
+            _trade_price = [info[3] for info in trade_info]
+        # the later order overwrites the former one of the same stock
+        last_pos = dict(zip(stock_id, range(len(stock_id))))
+        index, pos = list(last_pos), np.fromiter(last_pos.values(), dtype=np.int64, count=len(last_pos))
+        if isinstance(self.order_indicator, NumpyOrderIndicator):
+            # all the metrics share the same index
+            index = idd.Index(index) if len(index) > 0 else []
+        amount = np.array(_amount, dtype=np.float64)[pos]
+
+        self._assign_aligned("amount", index, amount)
+        self._assign_aligned("inner_amount", index, amount)
+        self._assign_aligned("deal_amount", index, np.array(_deal_amount, dtype=np.float64)[pos])
         # NOTE: trade_price and baseline price will be same on the lowest-level
-        self.order_indicator.assign("trade_price", trade_price)
-        self.order_indicator.assign("trade_value", trade_value)
-        self.order_indicator.assign("trade_cost", trade_cost)
-        self.order_indicator.assign("trade_dir", trade_dir)
-        self.order_indicator.assign("pa", pa)
+        self._assign_aligned("trade_price", index, np.array(_trade_price, dtype=np.float64)[pos])
+        self._assign_aligned("trade_value", index, np.array(_trade_value, dtype=np.float64)[pos])
+        self._assign_aligned("trade_cost", index, np.array(_trade_cost, dtype=np.float64)[pos])
+        self._assign_aligned("trade_dir", index, np.array(_trade_dir, dtype=np.float64)[pos])
+        # The PA in the innermost layer is meanless
+        self._assign_aligned("pa", index, np.zeros(len(pos)))
+
+    def _assign_aligned(self, col: str, index: Union[list, idd.Index], values: np.ndarray) -> None:
+        """
+        assign the metric whose values are aligned with the stock ids in `index`
+        """
+        if isinstance(self.order_indicator, NumpyOrderIndicator):
+            self.order_indicator.assign(col, idd.SingleData(values, index))
+        else:
+            self.order_indicator.assign(col, dict(zip(index, values.tolist())))
 
     def _update_order_fulfill_rate(self) -> None:
         def func(deal_amount, amount):
@@ -336,7 +500,19 @@ class Indicator:
 
         self.order_indicator.transfer(func, "ffr")
 
-    def update_order_indicators(self, trade_info: List[Tuple[Order, float, float, float]]) -> None:
+    def update_order_indicators(
+        self,
+        trade_info: Union[
+            List[Tuple[Order, float, float, float]], Tuple[OrderBatch, np.ndarray, np.ndarray, np.ndarray]
+        ],
+    ) -> None:
+        """
+        Parameters
+        ----------
+        trade_info :
+            - a list of (order, trade_val, trade_cost, trade_price)
+            - or (order_batch, trade_val, trade_cost, trade_price), the last three are arrays aligned with the batch
+        """
         self._update_order_trade_info(trade_info=trade_info)
         self._update_order_fulfill_rate()
 
@@ -417,33 +593,38 @@ class Indicator:
             return None, None
 
         if isinstance(price_s, (int, float, np.number)):
-            price_s = idd.SingleData(price_s, [trade_start_time])
+            prices = np.array([price_s], dtype=np.float64)
         elif isinstance(price_s, idd.SingleData):
-            pass
+            prices = price_s.data
         else:
             raise NotImplementedError(f"This type of input is not supported")
 
         # NOTE: there are some zeros in the trading price. These cases are known meaningless
         # for aligning the previous logic, remove it.
         # remove zero and negative values.
-        assert isinstance(price_s, idd.SingleData)
-        price_s = price_s.loc[(price_s > 1e-08).data.astype(bool)]
+        valid = prices > 1e-08
         # NOTE ~(price_s < 1e-08) is different from price_s >= 1e-8
         #   ~(np.nan < 1e-8) -> ~(False)  -> True
 
         # if price_s is empty
-        if price_s.empty:
+        if not valid.any():
             return None, None
 
-        assert isinstance(price_s, idd.SingleData)
+        if agg == "twap":
+            # the average of the valid prices (i.e. all the volumes are 1), no index alignment is needed
+            base_volume = np.float64(np.count_nonzero(valid))
+            base_price = prices[valid].sum() / base_volume
+            return base_price, base_volume
+
+        if not isinstance(price_s, idd.SingleData):
+            price_s = idd.SingleData(price_s, [trade_start_time])
+        price_s = price_s.loc[valid]
         if agg == "vwap":
             volume_s = trade_exchange.get_volume(inst, trade_start_time, trade_end_time, method=None)
             if isinstance(volume_s, (int, float, np.number)):
                 volume_s = idd.SingleData(volume_s, [trade_start_time])
             assert isinstance(volume_s, idd.SingleData)
             volume_s = volume_s.reindex(price_s.index)
-        elif agg == "twap":
-            volume_s = idd.SingleData(1, price_s.index)
         else:
             raise NotImplementedError(f"This type of input is not supported")
 
@@ -481,45 +662,45 @@ class Indicator:
             }
         """
 
-        # TODO: I think there are potentials to be optimized
         trade_dir = self.order_indicator.get_index_data("trade_dir")
         if len(trade_dir) > 0:
-            bp_all, bv_all = [], []
-            # <step, inst, (base_volume | base_price)>
-            for oi, (dec, start, end) in zip(inner_order_indicators, decision_list):
-                bp_s = oi.get_index_data("base_price").reindex(trade_dir.index)
-                bv_s = oi.get_index_data("base_volume").reindex(trade_dir.index)
-
-                bp_new, bv_new = {}, {}
-                for pr, v, (inst, direction) in zip(bp_s.data, bv_s.data, zip(trade_dir.index, trade_dir.data)):
-                    if np.isnan(pr):
-                        bp_tmp, bv_tmp = self._get_base_vol_pri(
-                            inst,
-                            start,
-                            end,
-                            decision=dec,
-                            direction=direction,
-                            trade_exchange=trade_exchange,
-                            pa_config=pa_config,
-                        )
-                        if (bp_tmp is not None) and (bv_tmp is not None):
-                            bp_new[inst], bv_new[inst] = bp_tmp, bv_tmp
+            insts = trade_dir.index.idx_list
+            # <inst, step>
+            bp_all = np.full((len(trade_dir), len(decision_list)), np.nan)
+            bv_all = np.full((len(trade_dir), len(decision_list)), np.nan)
+            has_value = np.zeros((len(trade_dir), len(decision_list)), dtype=bool)
+            for step, (oi, (dec, start, end)) in enumerate(zip(inner_order_indicators, decision_list)):
+                bp_all[:, step] = oi.get_index_data("base_price").reindex(trade_dir.index).data
+                bv_all[:, step] = oi.get_index_data("base_volume").reindex(trade_dir.index).data
+                has_value[:, step] = ~np.isnan(bp_all[:, step])
+                # only the missing base prices are retrieved from the exchange
+                for i in np.flatnonzero(~has_value[:, step]):
+                    bp_tmp, bv_tmp = self._get_base_vol_pri(
+                        insts[i],
+                        start,
+                        end,
+                        decision=dec,
+                        direction=trade_dir.data[i],
+                        trade_exchange=trade_exchange,
+                        pa_config=pa_config,
+                    )
+                    if (bp_tmp is not None) and (bv_tmp is not None):
+                        bp_all[i, step], bv_all[i, step] = bp_tmp, bv_tmp
+                        has_value[i, step] = True
                     else:
-                        bp_new[inst], bv_new[inst] = pr, v
-
-                bp_new = idd.SingleData(bp_new)
-                bv_new = idd.SingleData(bv_new)
-                bp_all.append(bp_new)
-                bv_all.append(bv_new)
-            bp_all_multi_data = idd.concat(bp_all, axis=1)
-            bv_all_multi_data = idd.concat(bv_all, axis=1)
-
-            base_volume = bv_all_multi_data.sum(axis=1)
-            self.order_indicator.assign("base_volume", base_volume.to_dict())
-            self.order_indicator.assign(
-                "base_price",
-                ((bp_all_multi_data * bv_all_multi_data).sum(axis=1) / base_volume).to_dict(),
-            )
+                        bv_all[i, step] = np.nan
+
+            # the stocks without base price in any step are dropped
+            rows = np.flatnonzero(has_value.any(axis=1))
+            rows = rows[np.argsort(insts[rows], kind="stable")]
+            bp_all, bv_all = bp_all[rows], bv_all[rows]
+            index = insts[rows].tolist()
+            if isinstance(self.order_indicator, NumpyOrderIndicator):
+                index = idd.Index(index) if len(index) > 0 else []
+
+            base_volume = np.nansum(bv_all, axis=1)
+            self._assign_aligned("base_volume", index, base_volume)
+            self._assign_aligned("base_price", index, np.nansum(bp_all * bv_all, axis=1) / base_volume)
 
     def _agg_order_price_advantage(self) -> None:
         def if_empty_func(trade_price):
@@ -648,4 +829,4 @@ class Indicator:
         return self.trade_indicator
 
     def generate_trade_indicators_dataframe(self) -> pd.DataFrame:
-        return pd.DataFrame.from_dict(self.trade_indicator_his, orient="index")
+        return self.trade_indicator_his.to_dataframe()
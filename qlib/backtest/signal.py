@@ -3,9 +3,10 @@
 import abc
 from typing import Dict, List, Text, Tuple, Union
 
+import numpy as np
 import pandas as pd
 
-from qlib.utils import init_instance_by_config
+from qlib.utils import init_instance_by_config, lazy_sort_index
 
 from ..data.dataset import Dataset
 from ..data.dataset.utils import convert_index_format
@@ -56,13 +57,72 @@ class SignalWCache(Signal):
                            2008-01-08  0.395004
         """
         self.signal_cache = convert_index_format(signal, level="datetime")
+        self._build_blocks()
+
+    def _build_blocks(self) -> None:
+        """
+        Partition the signal into the blocks of each datetime. So `get_signal` doesn't have to slice the MultiIndex.
+        - The rows are sorted by <datetime, instrument>, so the rows of a datetime range are contiguous.
+        - The signal is resampled by pandas if it is not supported (e.g. duplicated index or non-float values).
+        """
+        self._dates = None
+        sc = self.signal_cache
+        if not (isinstance(sc.index, pd.MultiIndex) and sc.index.nlevels == 2 and sc.index.is_unique):
+            return
+        sc = lazy_sort_index(sc)
+        values = sc.values
+        dates, date_codes = np.unique(sc.index.get_level_values(0), return_inverse=True)
+        if values.dtype.kind != "f" or dates.dtype.kind != "M":
+            return
+        self.signal_cache = sc
+        self._values = values
+        # the dtypes of the columns are kept if they are different
+        self._dtypes = None
+        if isinstance(sc, pd.DataFrame) and (sc.dtypes != values.dtype).any():
+            self._dtypes = sc.dtypes.to_dict()
+        self._dates = pd.DatetimeIndex(dates)
+        self._offsets = np.searchsorted(date_codes, np.arange(len(dates) + 1))
+        # the codes of the instruments are in the same order as the instruments
+        self._inst_codes, self._instruments = pd.factorize(sc.index.get_level_values(1), sort=True)
+        self._instruments.name = sc.index.names[1]
+
+    def _get_block(self, start: int, end: int) -> Union[pd.Series, pd.DataFrame]:
+        """get the last valid values of each instrument in the rows of the blocks [start, end)"""
+        rows = slice(self._offsets[start], self._offsets[end])
+        codes = self._inst_codes[rows]
+        values = self._values[rows]
+        if end - start == 1:
+            # only one value for each instrument
+            index = self._instruments[codes]
+            values = values.copy()
+        else:
+            uni_codes, inverse = np.unique(codes, return_inverse=True)
+            index = self._instruments[uni_codes]
+            values = values.reshape(len(codes), -1)
+            res = np.full((len(uni_codes), values.shape[1]), np.nan, dtype=values.dtype)
+            for col in range(values.shape[1]):
+                # the rows are sorted by datetime, so the last valid value of each instrument is its first valid value
+                # in the reversed rows
+                valid_rows = np.flatnonzero(~np.isnan(values[:, col]))[::-1]
+                uni, first = np.unique(inverse[valid_rows], return_index=True)
+                res[uni, col] = values[valid_rows[first], col]
+            values = res.reshape((len(uni_codes),) + self._values.shape[1:])
+        if isinstance(self.signal_cache, pd.Series):
+            return pd.Series(values, index=index, name=self.signal_cache.name)
+        df = pd.DataFrame(values, index=index, columns=self.signal_cache.columns)
+        return df if self._dtypes is None else df.astype(self._dtypes)
 
     def get_signal(self, start_time: pd.Timestamp, end_time: pd.Timestamp) -> Union[pd.Series, pd.DataFrame]:
         # the frequency of the signal may not align with the decision frequency of strategy
         # so resampling from the data is necessary
         # the latest signal leverage more recent data and therefore is used in trading.
-        signal = resam_ts_data(self.signal_cache, start_time=start_time, end_time=end_time, method="last")
-        return signal
+        if self._dates is None:
+            return resam_ts_data(self.signal_cache, start_time=start_time, end_time=end_time, method="last")
+        start = 0 if start_time is None else self._dates.searchsorted(pd.Timestamp(start_time), side="left")
+        end = len(self._dates) if end_time is None else self._dates.searchsorted(pd.Timestamp(end_time), side="right")
+        if start >= end:
+            return None
+        return self._get_block(start, end)
 
 
 class ModelSignal(SignalWCache):
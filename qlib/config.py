@@ -161,11 +161,16 @@ _default_config = {
     "kernels": NUM_USABLE_CPU,
     # pickle.dump protocol version
     "dump_protocol_version": PROTOCOL_VERSION,
+    # the dtype of the data calculated by expressions. e.g. "float32", "float64"
+    # The data handlers can store the processed data with lower precision via their `dtype` parameter
+    "expression_dtype": "float32",
     # How many tasks belong to one process. Recommend 1 for high-frequency data and None for daily data.
     "maxtasksperchild": None,
     # If joblib_backend is None, use loky
     "joblib_backend": "multiprocessing",
     "default_disk_cache": 1,  # 0:skip/1:use
+    # cache the benchmark data of backtests in the data directory. Please refer to `qlib.backtest.benchmark_cache`
+    "benchmark_disk_cache": False,
     "mem_cache_size_limit": 500,
     "mem_cache_limit_type": "length",
     # memory cache expire second, only in used 'DatasetURICache' and 'client D.calendar'
@@ -174,6 +179,7 @@ _default_config = {
     # cache dir name
     "dataset_cache_dir_name": "dataset_cache",
     "features_cache_dir_name": "features_cache",
+    "benchmark_cache_dir_name": "benchmark_cache",
     # redis
     # in order to use cache
     "redis_host": "127.0.0.1",
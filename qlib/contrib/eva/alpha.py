@@ -4,10 +4,11 @@ Here is a batch of evaluation functions.
 The interface should be redesigned carefully in the future.
 """
 
+import numpy as np
 import pandas as pd
-from typing import Tuple
+from typing import Dict, Optional, Tuple, Union
 from qlib import get_module_logger
-from qlib.utils.paral import complex_parallel, DelayedDict
+from qlib.utils.paral import complex_parallel
 from joblib import Parallel, delayed
 
 
@@ -38,34 +39,12 @@ def calc_long_short_prec(
     (pd.Series, pd.Series)
         long precision and short precision in time level
     """
-    if is_alpha:
-        label = label - label.groupby(level=date_col, group_keys=False).mean()
     if int(1 / quantile) >= len(label.index.get_level_values(1).unique()):
         raise ValueError("Need more instruments to calculate precision")
 
-    df = pd.DataFrame({"pred": pred, "label": label})
-    if dropna:
-        df.dropna(inplace=True)
-
-    group = df.groupby(level=date_col, group_keys=False)
-
-    def N(x):
-        return int(len(x) * quantile)
-
     # find the top/low quantile of prediction and treat them as long and short target
-    long = group.apply(lambda x: x.nlargest(N(x), columns="pred").label)
-    short = group.apply(lambda x: x.nsmallest(N(x), columns="pred").label)
-
-    groupll = long.groupby(date_col, group_keys=False)
-    l_dom = groupll.apply(lambda x: x > 0)
-    l_c = groupll.count()
-
-    groups = short.groupby(date_col, group_keys=False)
-    s_dom = groups.apply(lambda x: x < 0)
-    s_c = groups.count()
-    return (l_dom.groupby(date_col, group_keys=False).sum() / l_c), (
-        s_dom.groupby(date_col, group_keys=False).sum() / s_c
-    )
+    res = calc_quantile_analysis(pred, label, date_col=date_col, quantile=quantile, dropna=dropna, is_alpha=is_alpha)
+    return res["long_pre"], res["short_pre"]
 
 
 def calc_long_short_return(
@@ -99,18 +78,8 @@ def calc_long_short_return(
     long_avg_r : pd.Series
         daily long-average returns
     """
-    df = pd.DataFrame({"pred": pred, "label": label})
-    if dropna:
-        df.dropna(inplace=True)
-    group = df.groupby(level=date_col, group_keys=False)
-
-    def N(x):
-        return int(len(x) * quantile)
-
-    r_long = group.apply(lambda x: x.nlargest(N(x), columns="pred").label.mean())
-    r_short = group.apply(lambda x: x.nsmallest(N(x), columns="pred").label.mean())
-    r_avg = group.label.mean()
-    return (r_long - r_short) / 2, r_avg
+    res = calc_quantile_analysis(pred, label, date_col=date_col, quantile=quantile, dropna=dropna)
+    return res["long_short_r"], res["avg_r"]
 
 
 def pred_autocorr(pred: pd.Series, lag=1, inst_col="instrument", date_col="datetime"):
@@ -157,13 +126,212 @@ def pred_autocorr_all(pred_dict, n_jobs=-1, **kwargs):
     return complex_parallel(Parallel(n_jobs=n_jobs, verbose=10), ac_dict)
 
 
-def calc_ic(pred: pd.Series, label: pd.Series, date_col="datetime", dropna=False) -> (pd.Series, pd.Series):
+def _sort_by_date(
+    pred: Union[pd.Series, pd.DataFrame], label: pd.Series, date_col: str
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray, pd.Index, pd.Index]:
+    """align `pred` with `label` and sort them by the dates (the order on each date is kept)
+
+    Returns
+    -------
+    tuple
+        <N, M> predictions, <N> labels, <N> date codes, the dates and the names of the predictions
+    """
+    pred_df = pred.to_frame() if isinstance(pred, pd.Series) else pred
+    if not pred_df.index.equals(label.index):
+        index = pred_df.index.union(label.index)
+        pred_df, label = pred_df.reindex(index), label.reindex(index)
+
+    codes, dates = pd.factorize(pred_df.index.get_level_values(date_col), sort=True)
+    order = np.argsort(codes, kind="stable")
+    x = pred_df.values.astype(np.float64)[order]
+    y = label.values.astype(np.float64)[order]
+    return x, y, codes[order], pd.Index(dates, name=date_col), pred_df.columns
+
+
+def _segment_mean(values: np.ndarray, codes: np.ndarray, n: int) -> np.ndarray:
+    """mean of the non-NaN `values` of each segment in `codes` (NaN for the segments without values)"""
+    valid = ~np.isnan(values)
+    count = np.bincount(codes[valid], minlength=n)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.bincount(codes[valid], weights=values[valid], minlength=n) / count
+
+
+def _segment_position(codes: np.ndarray) -> np.ndarray:
+    """the position of each element within its segment (`codes` is sorted)"""
+    new_seg = np.r_[True, codes[1:] != codes[:-1]]
+    return np.arange(len(codes)) - np.flatnonzero(new_seg)[np.cumsum(new_seg) - 1]
+
+
+def calc_quantile_analysis(
+    pred: Union[pd.Series, pd.DataFrame],
+    label: pd.Series,
+    date_col: str = "datetime",
+    quantile: float = 0.2,
+    n_groups: Optional[int] = None,
+    dropna: bool = False,
+    is_alpha: bool = False,
+) -> Dict[str, Union[pd.Series, pd.DataFrame]]:
+    """
+    analyze the returns of the stocks bucketed by the predictions on each date in one pass
+
+    The predictions of each date are ranked by one segmented argsort over the date-sorted data instead of
+    sorting each date group in pandas. The top/bottom buckets contain ``int(n * quantile)`` stocks of each date like
+    `nlargest`/`nsmallest` (the stocks with the same predictions are selected by their order), while the `n_groups`
+    groups evenly divide the stocks with predictions and leave the remainder out.
+
+    Parameters
+    ----------
+    pred : Union[pd.Series, pd.DataFrame]
+        stock predictions, multiple signals can be analyzed at once by the columns of a pd.DataFrame
+    label : pd.Series
+        stock returns
+    date_col : str
+        datetime index name
+    quantile : float
+        the quantile of the top/bottom buckets
+    n_groups : Optional[int]
+        the number of the groups divided by the predictions, the groups are not analyzed if it is None
+    dropna : bool
+        drop the stocks without predictions or labels
+    is_alpha : bool
+        calculate the precision with the excess returns over the average return of each date
+
+    Returns
+    -------
+    Dict[str, Union[pd.Series, pd.DataFrame]]
+        - long_pre / short_pre: the precision of the top/bottom bucket on each date
+        - long_short_r: (the average return of the top bucket - the one of the bottom bucket) / 2 on each date
+        - avg_r: the average return on each date
+        - group_r: the average returns of "Group1" (the highest predictions) ~ "Group<n_groups>" on each date
+
+        They are pd.DataFrame with a column for each signal (the first column level for `group_r`) if `pred` is a
+        pd.DataFrame. The dates without any stock selected are excluded from the precision and the groups.
+    """
+    x, y, codes, dates, columns = _sort_by_date(pred, label, date_col)
+    if is_alpha:
+        y_pre = y - _segment_mean(y, codes, len(dates))[codes]
+    else:
+        y_pre = y
+
+    res = {"long_pre": {}, "short_pre": {}, "long_short_r": {}, "avg_r": {}, "group_r": {}}
+    for i, col in enumerate(columns):
+        if dropna:
+            keep = ~(np.isnan(x[:, i]) | np.isnan(y))
+            xi, yi, yi_pre, ci = x[keep, i], y[keep], y_pre[keep], codes[keep]
+        else:
+            xi, yi, yi_pre, ci = x[:, i], y, y_pre, codes
+        # the dates left after dropping
+        di, ci = np.unique(ci, return_inverse=True)
+        n_dates = len(di)
+        n_stocks = np.bincount(ci, minlength=n_dates)
+        n_pred = np.bincount(ci, weights=~np.isnan(xi), minlength=n_dates).astype(int)
+        bucket_size = (n_stocks * quantile).astype(int)
+        index = dates[di]
+
+        avg_r = _segment_mean(yi, ci, n_dates)
+        long_short = []
+        for sign, name in [(-1, "long_pre"), (1, "short_pre")]:
+            # NOTE: the NaN predictions are sorted to the end and the ties are kept in the order by the stable sort,
+            # so the NaN predictions are only selected to fill the buckets like `nlargest`/`nsmallest`
+            order = np.lexsort((sign * xi, ci))
+            pos = np.empty(len(order), dtype=int)
+            pos[order] = _segment_position(ci[order])
+            selected = pos < bucket_size[ci]
+            has_stock = np.bincount(ci[selected], minlength=n_dates) > 0
+
+            long_short.append(_segment_mean(np.where(selected, yi, np.nan), ci, n_dates))
+            # the stocks without labels are not counted
+            win = np.where(selected & ~np.isnan(yi_pre), sign * yi_pre < 0, np.nan)
+            pre = _segment_mean(win, ci, n_dates)
+            res[name][col] = pd.Series(pre[has_stock], index=index[has_stock])
+
+            if n_groups is not None and sign == -1:
+                # the stocks with predictions are sorted descending at the beginning of each date
+                group_size = (n_pred // n_groups)[ci]
+                group = np.where(pos < group_size * n_groups, pos // np.maximum(group_size, 1), -1)
+                group_r = {
+                    f"Group{g + 1}": _segment_mean(np.where(group == g, yi, np.nan), ci, n_dates)
+                    for g in range(n_groups)
+                }
+                res["group_r"][col] = pd.DataFrame(group_r, index=index)[n_pred > 0]
+        res["long_short_r"][col] = pd.Series((long_short[0] - long_short[1]) / 2, index=index)
+        res["avg_r"][col] = pd.Series(avg_r, index=index)
+
+    if n_groups is None:
+        del res["group_r"]
+    for k, v in res.items():
+        if isinstance(pred, pd.Series):
+            res[k] = v[columns[0]]
+            if isinstance(res[k], pd.Series):
+                res[k].name = None
+        elif k == "group_r":
+            res[k] = pd.concat(v, axis=1)
+        else:
+            res[k] = pd.DataFrame(v)
+    return res
+
+
+def _segment_rank(values: np.ndarray, codes: np.ndarray) -> np.ndarray:
+    """rank `values` within each segment of `codes` (the average rank is assigned to ties like `pd.Series.rank`)"""
+    order = np.lexsort((values, codes))
+    v, c = values[order], codes[order]
+    n = len(v)
+    new_seg = np.r_[True, c[1:] != c[:-1]]
+    new_tie = new_seg | np.r_[True, v[1:] != v[:-1]]
+    tie_start = np.flatnonzero(new_tie)
+    tie_end = np.r_[tie_start[1:], n]
+    seg_start = np.flatnonzero(new_seg)[np.cumsum(new_seg) - 1]
+    ranks = np.empty(n)
+    ranks[order] = ((tie_start + tie_end + 1) / 2)[np.cumsum(new_tie) - 1] - seg_start
+    return ranks
+
+
+def _segment_corr(x: np.ndarray, y: np.ndarray, mask: np.ndarray, starts: np.ndarray) -> np.ndarray:
+    """pearson correlation between each column of `x` and `y` within each segment
+
+    Parameters
+    ----------
+    x : np.ndarray
+        <N, M> values sorted by the segments
+    y : np.ndarray
+        <N, M> values sorted by the segments
+    mask : np.ndarray
+        <N, M> whether the pair is valid
+    starts : np.ndarray
+        the start of each segment
+
+    Returns
+    -------
+    np.ndarray
+        <segment, M> correlations, which are NaN for the segments with less than 2 valid pairs or no variance
+    """
+    count = np.add.reduceat(mask, starts, axis=0).astype(np.float64)
+    seg_len = np.diff(np.r_[starts, len(x)])
+    with np.errstate(divide="ignore", invalid="ignore"):
+        # demean within the segments before the dot products for the numerical stability
+        x_mean = np.add.reduceat(np.where(mask, x, 0), starts, axis=0) / count
+        y_mean = np.add.reduceat(np.where(mask, y, 0), starts, axis=0) / count
+        xc = np.where(mask, x - np.repeat(x_mean, seg_len, axis=0), 0)
+        yc = np.where(mask, y - np.repeat(y_mean, seg_len, axis=0), 0)
+        cov = np.add.reduceat(xc * yc, starts, axis=0)
+        var = np.add.reduceat(xc**2, starts, axis=0) * np.add.reduceat(yc**2, starts, axis=0)
+        corr = cov / np.sqrt(var)
+    corr[count < 2] = np.nan
+    return corr
+
+
+def calc_ic(
+    pred: Union[pd.Series, pd.DataFrame], label: pd.Series, date_col="datetime", dropna=False
+) -> Tuple[Union[pd.Series, pd.DataFrame], Union[pd.Series, pd.DataFrame]]:
     """calc_ic.
 
+    The daily IC and Rank IC are calculated with segmented array operations over the date-sorted data instead of
+    grouping by the dates. Like `pd.Series.corr`, the pairs with NaN are excluded on each date.
+
     Parameters
     ----------
     pred :
-        pred
+        pred, multiple predictions can be calculated at once by the columns of a pd.DataFrame
     label :
         label
     date_col :
@@ -172,13 +340,32 @@ def calc_ic(pred: pd.Series, label: pd.Series, date_col="datetime", dropna=False
     Returns
     -------
     (pd.Series, pd.Series)
-        ic and rank ic
+        ic and rank ic (pd.DataFrame with the same columns for the pd.DataFrame `pred`)
     """
-    df = pd.DataFrame({"pred": pred, "label": label})
-    ic = df.groupby(date_col, group_keys=False).apply(lambda df: df["pred"].corr(df["label"]))
-    ric = df.groupby(date_col, group_keys=False).apply(lambda df: df["pred"].corr(df["label"], method="spearman"))
+    x, y, codes, dates, columns = _sort_by_date(pred, label, date_col)
+    if len(codes) == 0:
+        # `np.add.reduceat` can't be applied to the empty segments
+        ic = ric = np.zeros((0, x.shape[1]))
+    else:
+        starts = np.flatnonzero(np.r_[True, codes[1:] != codes[:-1]])
+        y = np.repeat(y[:, None], x.shape[1], axis=1)
+        mask = ~(np.isnan(x) | np.isnan(y))
+
+        ic = _segment_corr(x, y, mask, starts)
+        x_rank, y_rank = np.zeros_like(x), np.zeros_like(y)
+        for i in range(x.shape[1]):
+            valid = mask[:, i]
+            # NOTE: the label is ranked with each prediction because the valid pairs may be different
+            x_rank[valid, i] = _segment_rank(x[valid, i], codes[valid])
+            y_rank[valid, i] = _segment_rank(y[valid, i], codes[valid])
+        ric = _segment_corr(x_rank, y_rank, mask, starts)
+
+    ic = pd.DataFrame(ic, index=dates, columns=columns)
+    ric = pd.DataFrame(ric, index=dates, columns=columns)
+    if isinstance(pred, pd.Series):
+        ic, ric = ic.iloc[:, 0].rename(None), ric.iloc[:, 0].rename(None)
     if dropna:
-        return ic.dropna(), ric.dropna()
+        return ic.dropna(how="all"), ric.dropna(how="all")
     else:
         return ic, ric
 
@@ -192,6 +379,8 @@ def calc_all_ic(pred_dict_all, label, date_col="datetime", dropna=False, n_jobs=
         A dict like {<method_name>:  <prediction>}
     label:
         A pd.Series of label values
+    n_jobs :
+        it is kept for compatibility, all the predictions are calculated at once by `calc_ic`
 
     Returns
     -------
@@ -208,8 +397,20 @@ def calc_all_ic(pred_dict_all, label, date_col="datetime", dropna=False, n_jobs=
                   }
     ...}
     """
+    if len(pred_dict_all) == 0:
+        return {}
+    keys = list(pred_dict_all)
+    pred_df = pd.concat([pred_dict_all[k] for k in keys], axis=1, keys=range(len(keys)))
+    ic_df, ric_df = calc_ic(pred_df, label, date_col=date_col)
+
     pred_all_ics = {}
-    for k, pred in pred_dict_all.items():
-        pred_all_ics[k] = DelayedDict(["ic", "ric"], delayed(calc_ic)(pred, label, date_col=date_col, dropna=dropna))
-    pred_all_ics = complex_parallel(Parallel(n_jobs=n_jobs, verbose=10), pred_all_ics)
+    for i, k in enumerate(keys):
+        ic, ric = ic_df[i].rename(None), ric_df[i].rename(None)
+        # the dates come from the prediction and the label only (like calculating them separately)
+        dates = pred_dict_all[k].index.get_level_values(date_col).union(label.index.get_level_values(date_col))
+        if not ic.index.isin(dates).all():
+            ic, ric = ic[ic.index.isin(dates)], ric[ric.index.isin(dates)]
+        if dropna:
+            ic, ric = ic.dropna(), ric.dropna()
+        pred_all_ics[k] = {"ic": ic, "ric": ric}
     return pred_all_ics
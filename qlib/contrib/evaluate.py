@@ -14,6 +14,7 @@ from ..utils import get_date_range
 from ..utils.resam import Freq
 from ..strategy.base import BaseStrategy
 from ..backtest import get_exchange, position, backtest as backtest_func, executor as _executor
+from ..backtest.report import cal_risk_analysis_scaler
 
 
 from ..data import D
@@ -46,16 +47,6 @@ def risk_analysis(r, N: int = None, freq: str = "day", mode: Literal["sum", "pro
         - "product": Geometric accumulation (compounded returns).
     """
 
-    def cal_risk_analysis_scaler(freq):
-        _count, _freq = Freq.parse(freq)
-        _freq_scaler = {
-            Freq.NORM_FREQ_MINUTE: 240 * 238,
-            Freq.NORM_FREQ_DAY: 238,
-            Freq.NORM_FREQ_WEEK: 50,
-            Freq.NORM_FREQ_MONTH: 12,
-        }
-        return _freq_scaler[_freq] / _count
-
     if N is None and freq is None:
         raise ValueError("at least one of `N` and `freq` should exist")
     if N is not None and freq is not None:
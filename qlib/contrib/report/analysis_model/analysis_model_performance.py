@@ -1,6 +1,5 @@
 # Copyright (c) Microsoft Corporation.
 # Licensed under the MIT License.
-from functools import partial
 
 import pandas as pd
 
@@ -14,6 +13,7 @@ from scipy import stats
 from typing import Sequence
 from qlib.typehint import Literal
 
+from ...eva.alpha import calc_ic, calc_quantile_analysis
 from ..graph import ScatterGraph, SubplotsGraph, BarGraph, HeatmapGraph
 from ..utils import guess_plotly_rangebreaks
 
@@ -29,28 +29,18 @@ def _group_return(pred_label: pd.DataFrame = None, reverse: bool = False, N: int
     if reverse:
         pred_label["score"] *= -1
 
-    pred_label = pred_label.sort_values("score", ascending=False)
-
     # Group1 ~ Group5 only consider the dropna values
-    pred_label_drop = pred_label.dropna(subset=["score"])
+    res = calc_quantile_analysis(pred_label["score"], pred_label["label"], date_col="datetime", n_groups=N)
 
     # Group
-    t_df = pd.DataFrame(
-        {
-            "Group%d"
-            % (i + 1): pred_label_drop.groupby(level="datetime", group_keys=False)["label"].apply(
-                lambda x: x[len(x) // N * i : len(x) // N * (i + 1)].mean()  # pylint: disable=W0640
-            )
-            for i in range(N)
-        }
-    )
+    t_df = res["group_r"]
     t_df.index = pd.to_datetime(t_df.index)
 
     # Long-Short
     t_df["long-short"] = t_df["Group1"] - t_df["Group%d" % N]
 
     # Long-Average
-    t_df["long-average"] = t_df["Group1"] - pred_label.groupby(level="datetime", group_keys=False)["label"].mean()
+    t_df["long-average"] = t_df["Group1"] - res["avg_r"].reindex(t_df.index)
 
     t_df = t_df.dropna(how="all")  # for days which does not contain label
     # Cumulative Return By Group
@@ -130,20 +120,9 @@ def _pred_ic(
     For the Monthly IC, IC histogram, IC Q-Q plot.  Only the first type of IC will be plotted.
     :return:
     """
-    _methods_mapping = {"IC": "pearson", "Rank IC": "spearman"}
-
-    def _corr_series(x, method):
-        return x["label"].corr(x["score"], method=method)
-
-    ic_df = pd.concat(
-        [
-            pred_label.groupby(level="datetime", group_keys=False)
-            .apply(partial(_corr_series, method=_methods_mapping[m]))
-            .rename(m)
-            for m in methods
-        ],
-        axis=1,
-    )
+    ic, ric = calc_ic(pred_label["score"], pred_label["label"], date_col="datetime")
+    _ic_mapping = {"IC": ic, "Rank IC": ric}
+    ic_df = pd.concat([_ic_mapping[m].rename(m) for m in methods], axis=1)
     _ic = ic_df.iloc(axis=1)[0]
 
     _index = _ic.index.get_level_values(0).astype("str").str.replace("-", "").str.slice(0, 6)
@@ -2,8 +2,8 @@
 # Licensed under the MIT License.
 
 from .base import BaseOptimizer
-from .optimizer import PortfolioOptimizer
+from .optimizer import PortfolioOptimizer, StructuredCovariance
 from .enhanced_indexing import EnhancedIndexingOptimizer
 
 
-__all__ = ["BaseOptimizer", "PortfolioOptimizer", "EnhancedIndexingOptimizer"]
+__all__ = ["BaseOptimizer", "PortfolioOptimizer", "StructuredCovariance", "EnhancedIndexingOptimizer"]
@@ -4,7 +4,7 @@
 import numpy as np
 import cvxpy as cp
 
-from typing import Union, Optional, Dict, Any, List
+from typing import Union, Optional, Dict, Any, List, Tuple
 
 from qlib.log import get_module_logger
 from .base import BaseOptimizer
@@ -53,6 +53,7 @@ class EnhancedIndexingOptimizer(BaseOptimizer):
         scale_return: bool = True,
         epsilon: float = 5e-5,
         solver_kwargs: Optional[Dict[str, Any]] = {},
+        parametrize: bool = False,
     ):
         """
         Args:
@@ -62,7 +63,14 @@ class EnhancedIndexingOptimizer(BaseOptimizer):
             f_dev (list): factor deviation limit
             scale_return (bool): whether scale return to match estimated volatility
             epsilon (float): minimum weight
-            solver_kwargs (dict): kwargs for cvxpy solver
+            solver_kwargs (dict): kwargs for cvxpy solver (`solver` defaults to ECOS)
+            parametrize (bool): whether to build the problem once with cvxpy parameters and only update the values of
+                the parameters for each call, which saves the time of building and compiling the problem every day.
+                The problem is built for a capacity of stocks (the missing stocks are padded with zero weights) and
+                rebuilt only when the number of stocks or factors exceeds it.
+                The first call is slower because the parametrized problem is compiled. For 800 stocks and 40 factors
+                (solved by CLARABEL), the first call takes ~0.26s and the following ones ~0.11s, while building the
+                problem with the data takes ~1.1s per call.
         """
 
         assert lamb >= 0, "risk aversion parameter `lamb` should be positive"
@@ -85,6 +93,12 @@ class EnhancedIndexingOptimizer(BaseOptimizer):
         self.epsilon = epsilon
         self.solver_kwargs = solver_kwargs
 
+        self.parametrize = parametrize
+        # the parametrized problems by whether to limit the turnover
+        self._problems: Dict[bool, Tuple[cp.Variable, cp.Problem]] = {}
+        self._capacity = 0
+        self._num_factors = None
+
     def __call__(
         self,
         r: np.ndarray,
@@ -115,19 +129,6 @@ class EnhancedIndexingOptimizer(BaseOptimizer):
             r = r / r.std()
             r *= np.sqrt(np.mean(np.diag(F @ cov_b @ F.T) + var_u))
 
-        # target weight
-        w = cp.Variable(len(r), nonneg=True)
-        w.value = wb  # for warm start
-
-        # precompute exposure
-        d = w - wb  # benchmark exposure
-        v = d @ F  # factor exposure
-
-        # objective
-        ret = d @ r  # excess return
-        risk = cp.quad_form(v, cov_b) + var_u @ (d**2)  # tracking error
-        obj = cp.Maximize(ret - self.lamb * risk)
-
         # weight bounds
         lb = np.zeros_like(wb)
         ub = np.ones_like(wb)
@@ -148,39 +149,32 @@ class EnhancedIndexingOptimizer(BaseOptimizer):
             lb[mfs] = 0
             ub[mfs] = 0
 
-        # constraints
-        # TODO: currently we assume fullly invest in the stocks,
-        # in the future we should support holding cash as an asset
-        cons = [cp.sum(w) == 1, w >= lb, w <= ub]
-
-        # factor deviation
-        if self.f_dev is not None:
-            cons.extend([v >= -self.f_dev, v <= self.f_dev])  # pylint: disable=E1130
-
         # total turnover constraint
-        t_cons = []
-        if self.delta is not None:
-            if w0 is not None and w0.sum() > 0:
-                t_cons.extend([cp.norm(w - w0, 1) <= self.delta])
+        limit_turnover = self.delta is not None and w0 is not None and w0.sum() > 0
 
         # optimize
+        solver_kwargs = {"solver": cp.ECOS, **self.solver_kwargs}
+        if self.parametrize:
+            # the default canonicalization backend of cvxpy compiles the N x K factor parameter very slowly
+            solver_kwargs.setdefault("canon_backend", cp.SCIPY_CANON_BACKEND)
         # trial 1: use all constraints
         success = False
         try:
-            prob = cp.Problem(obj, cons + t_cons)
-            prob.solve(solver=cp.ECOS, warm_start=True, **self.solver_kwargs)
+            w, prob = self._get_problem(r, F, cov_b, var_u, w0, wb, lb, ub, limit_turnover)
+            w.value = self._pad(wb)  # for warm start
+            prob.solve(warm_start=True, **solver_kwargs)
             assert prob.status == "optimal"
             success = True
         except Exception as e:
             logger.warning(f"trial 1 failed {e} (status: {prob.status})")
 
         # trial 2: remove turnover constraint
-        if not success and len(t_cons):
+        if not success and limit_turnover:
             logger.info("try removing turnover constraint as the last optimization failed")
             try:
-                w.value = wb
-                prob = cp.Problem(obj, cons)
-                prob.solve(solver=cp.ECOS, warm_start=True, **self.solver_kwargs)
+                w, prob = self._get_problem(r, F, cov_b, var_u, w0, wb, lb, ub, False)
+                w.value = self._pad(wb)
+                prob.solve(warm_start=True, **solver_kwargs)
                 assert prob.status in ["optimal", "optimal_inaccurate"]
                 success = True
             except Exception as e:
@@ -195,8 +189,138 @@ class EnhancedIndexingOptimizer(BaseOptimizer):
             logger.warning(f"the optimization is inaccurate")
 
         # remove small weight
-        w = np.asarray(w.value)
+        w = np.asarray(w.value)[: len(r)]
         w[w < self.epsilon] = 0
         w /= w.sum()
 
         return w
+
+    def _pad(self, x: np.ndarray) -> np.ndarray:
+        """pad the values of stocks to the capacity of the parametrized problem"""
+        if not self.parametrize or len(x) == self._capacity:
+            return x
+        return np.concatenate([x, np.zeros((self._capacity - len(x),) + x.shape[1:])])
+
+    def _get_problem(
+        self,
+        r: np.ndarray,
+        F: np.ndarray,
+        cov_b: np.ndarray,
+        var_u: np.ndarray,
+        w0: np.ndarray,
+        wb: np.ndarray,
+        lb: np.ndarray,
+        ub: np.ndarray,
+        limit_turnover: bool,
+    ) -> Tuple[cp.Variable, cp.Problem]:
+        """get the optimization problem and its variable of target weight"""
+        if not self.parametrize:
+            return self._build_problem(r, F, cov_b, var_u, w0, wb, lb, ub, limit_turnover)
+
+        n, k = F.shape
+        if n > self._capacity or k != self._num_factors:
+            # leave some room for the growth of the universe
+            self._capacity = max(n + n // 10, self._capacity)
+            self._num_factors = k
+            self._problems = {}
+        if limit_turnover not in self._problems:
+            self._problems[limit_turnover] = self._build_parametrized_problem(self._capacity, k, limit_turnover)
+        w, prob = self._problems[limit_turnover]
+
+        # decompose the factor covariance cov_b = L @ L.T, so v @ cov_b @ v == sum((v @ L)**2)
+        eig_val, eig_vec = np.linalg.eigh(cov_b)
+        std_u = np.sqrt(var_u)
+        param_values = {
+            "r": r,
+            "F": F,
+            "wbF": wb @ F,
+            "L": eig_vec * np.sqrt(np.clip(eig_val, 0, None)),
+            "std_u": std_u,
+            "wb_std_u": wb * std_u,
+            "lb": lb,
+            "ub": ub,
+        }
+        if limit_turnover:
+            param_values["w0"] = w0
+        for param in prob.parameters():
+            value = param_values[param.name()]
+            # the parameters of factors are not padded
+            param.value = value if param.name() in ["wbF", "L"] else self._pad(value)
+        return w, prob
+
+    def _build_problem(
+        self,
+        r: np.ndarray,
+        F: np.ndarray,
+        cov_b: np.ndarray,
+        var_u: np.ndarray,
+        w0: np.ndarray,
+        wb: np.ndarray,
+        lb: np.ndarray,
+        ub: np.ndarray,
+        limit_turnover: bool,
+    ) -> Tuple[cp.Variable, cp.Problem]:
+        """build the optimization problem with the data"""
+        # target weight
+        w = cp.Variable(len(r), nonneg=True)
+
+        # precompute exposure
+        d = w - wb  # benchmark exposure
+        v = d @ F  # factor exposure
+
+        # objective
+        ret = d @ r  # excess return
+        risk = cp.quad_form(v, cov_b) + var_u @ (d**2)  # tracking error
+        obj = cp.Maximize(ret - self.lamb * risk)
+
+        # constraints
+        # TODO: currently we assume fullly invest in the stocks,
+        # in the future we should support holding cash as an asset
+        cons = [cp.sum(w) == 1, w >= lb, w <= ub]
+
+        # factor deviation
+        if self.f_dev is not None:
+            cons.extend([v >= -self.f_dev, v <= self.f_dev])  # pylint: disable=E1130
+
+        # total turnover constraint
+        if limit_turnover:
+            cons.extend([cp.norm(w - w0, 1) <= self.delta])
+
+        return w, cp.Problem(obj, cons)
+
+    def _build_parametrized_problem(self, n: int, k: int, limit_turnover: bool) -> Tuple[cp.Variable, cp.Problem]:
+        """build the same optimization problem as `_build_problem` with parameters for `n` stocks and `k` factors
+
+        The terms are rewritten to follow the disciplined parametrized programming (DPP) rules of cvxpy:
+            - the factor deviation v is an auxiliary variable fixed by v == w @ F - wb @ F. So the N x K parameter F
+              appears only once and the factor terms only use the k-dimensional v
+            - the products of the parameters (e.g. wb @ F) are given as parameters
+            - the factor risk v @ cov_b @ v is written as sum_squares(v @ L), where cov_b = L @ L.T
+            - the specific risk var_u @ d**2 is written as sum_squares(std_u * w - wb * std_u)
+            - the constant term of the excess return (wb @ r) is dropped
+        """
+        w = cp.Variable(n, nonneg=True)
+        v = cp.Variable(k)  # factor exposure
+        r = cp.Parameter(n, name="r")
+        F = cp.Parameter((n, k), name="F")
+        wbF = cp.Parameter(k, name="wbF")
+        L = cp.Parameter((k, k), name="L")
+        std_u = cp.Parameter(n, name="std_u", nonneg=True)
+        wb_std_u = cp.Parameter(n, name="wb_std_u")
+        lb = cp.Parameter(n, name="lb")
+        ub = cp.Parameter(n, name="ub")
+
+        ret = w @ r
+        risk = cp.sum_squares(v @ L) + cp.sum_squares(cp.multiply(std_u, w) - wb_std_u)
+        obj = cp.Maximize(ret - self.lamb * risk)
+
+        cons = [v == w @ F - wbF, cp.sum(w) == 1, w >= lb, w <= ub]
+        if self.f_dev is not None:
+            cons.extend([v >= -self.f_dev, v <= self.f_dev])  # pylint: disable=E1130
+        if limit_turnover:
+            w0 = cp.Parameter(n, name="w0")
+            cons.extend([cp.norm(w - w0, 1) <= self.delta])
+
+        prob = cp.Problem(obj, cons)
+        assert prob.is_dpp(), "the parametrized problem should follow the DPP rules"
+        return w, prob
@@ -2,15 +2,63 @@
 # Licensed under the MIT License.
 
 
+import time
 import warnings
 import numpy as np
 import pandas as pd
 import scipy.optimize as so
-from typing import Optional, Union, Callable, List
+from typing import Optional, Union, Callable, List, Tuple
 
+from qlib.log import get_module_logger
 from .base import BaseOptimizer
 
 
+logger = get_module_logger("PortfolioOptimizer")
+
+
+class StructuredCovariance:
+    """Covariance matrix with the factor model structure
+
+        S = F @ cov_b @ F.T + diag(var_u)
+
+    where `F` is the factor exposure, `cov_b` is the factor covariance and `var_u` is the residual variance
+    (i.e. the decomposed components given by `StructuredCovEstimator`).
+
+    The dense matrix is never built: `S @ x` costs O(N * K) instead of O(N^2) for N stocks and K factors. It can be
+    used in place of the dense covariance matrix in `x @ S @ x` and `S @ x`.
+    """
+
+    # make `x @ S` fall back to `S.__rmatmul__` instead of being handled by numpy
+    __array_ufunc__ = None
+
+    def __init__(self, F: np.ndarray, cov_b: np.ndarray, var_u: np.ndarray):
+        self.F = np.asarray(F, dtype=np.float64)
+        self.cov_b = np.asarray(cov_b, dtype=np.float64)
+        self.var_u = np.asarray(var_u, dtype=np.float64)
+        assert self.F.ndim == 2 and len(self.F) == len(self.var_u), "`F` and `var_u` have mismatched shape"
+        assert self.cov_b.shape == (self.F.shape[1],) * 2, "`cov_b` has mismatched shape"
+
+    def __len__(self) -> int:
+        return len(self.var_u)
+
+    @property
+    def shape(self) -> Tuple[int, int]:
+        return len(self), len(self)
+
+    def __matmul__(self, x: np.ndarray) -> np.ndarray:
+        return self.F @ (self.cov_b @ (self.F.T @ x)) + self.var_u * x
+
+    def __rmatmul__(self, x: np.ndarray) -> np.ndarray:
+        # S is symmetric
+        return self @ x
+
+    def diagonal(self) -> np.ndarray:
+        return np.einsum("ij,jk,ik->i", self.F, self.cov_b, self.F) + self.var_u
+
+    def to_dense(self) -> np.ndarray:
+        return self.F @ self.cov_b @ self.F.T + np.diag(self.var_u)
+
+
 class PortfolioOptimizer(BaseOptimizer):
     """Portfolio Optimizer
 
@@ -20,6 +68,13 @@ class PortfolioOptimizer(BaseOptimizer):
         - `rp`: Risk Parity
         - `inv`: Inverse Volatility
 
+    The following solvers are supported:
+        - `slsqp`: `scipy.optimize.minimize` with numerical gradients
+        - `structured`: accelerated projected gradient over the simplex with analytic gradients (`gmv` and `mvo`) and
+          Newton steps on the equivalent convex problem (`rp`). The covariance matrix is only used by matrix-vector
+          products, so the factor model structure (`StructuredCovariance`) is exploited. `SLSQP` with analytic
+          gradients is used instead when the turnover is limited or `rp` is regularized.
+
     Note:
         This optimizer always assumes full investment and no-shorting.
     """
@@ -29,6 +84,9 @@ class PortfolioOptimizer(BaseOptimizer):
     OPT_RP = "rp"
     OPT_INV = "inv"
 
+    SOLVER_SLSQP = "slsqp"
+    SOLVER_STRUCTURED = "structured"
+
     def __init__(
         self,
         method: str = "inv",
@@ -37,6 +95,9 @@ class PortfolioOptimizer(BaseOptimizer):
         alpha: float = 0.0,
         scale_return: bool = True,
         tol: float = 1e-8,
+        solver: str = "slsqp",
+        warm_start: bool = False,
+        max_iter: int = 10000,
     ):
         """
         Args:
@@ -46,6 +107,10 @@ class PortfolioOptimizer(BaseOptimizer):
             alpha (float): l2 norm regularizer
             scale_return (bool): if to scale alpha to match the volatility of the covariance matrix
             tol (float): tolerance for optimization termination
+            solver (str): `slsqp` or `structured`, please refer to the docs of the class
+            warm_start (bool): if to start the optimization from the weights of the last call (e.g. the previous day)
+                instead of the equal weights
+            max_iter (int): the maximum number of iterations of the `structured` solver
         """
         assert method in [self.OPT_GMV, self.OPT_MVO, self.OPT_RP, self.OPT_INV], f"method `{method}` is not supported"
         self.method = method
@@ -62,15 +127,25 @@ class PortfolioOptimizer(BaseOptimizer):
         self.tol = tol
         self.scale_return = scale_return
 
+        assert solver in [self.SOLVER_SLSQP, self.SOLVER_STRUCTURED], f"solver `{solver}` is not supported"
+        self.solver = solver
+        self.warm_start = warm_start
+        self.max_iter = max_iter
+
+        self.last_weights: Optional[Union[np.ndarray, pd.Series]] = None
+        # the time (in seconds) spent by the last call
+        self.solve_time: Optional[float] = None
+
     def __call__(
         self,
-        S: Union[np.ndarray, pd.DataFrame],
+        S: Union[np.ndarray, pd.DataFrame, StructuredCovariance, tuple],
         r: Optional[Union[np.ndarray, pd.Series]] = None,
         w0: Optional[Union[np.ndarray, pd.Series]] = None,
     ) -> Union[np.ndarray, pd.Series]:
         """
         Args:
-            S (np.ndarray or pd.DataFrame): covariance matrix
+            S (np.ndarray, pd.DataFrame, StructuredCovariance or tuple): covariance matrix, or its decomposed
+                components `(F, cov_b, var_u)` (`F` can be a pd.DataFrame indexed by stocks)
             r (np.ndarray or pd.Series): expected return
             w0 (np.ndarray or pd.Series): initial weights (for turnover control)
 
@@ -79,7 +154,13 @@ class PortfolioOptimizer(BaseOptimizer):
         """
         # transform dataframe into array
         index = None
-        if isinstance(S, pd.DataFrame):
+        if isinstance(S, tuple):
+            F, cov_b, var_u = S
+            if isinstance(F, pd.DataFrame):
+                index = F.index
+                F = F.values
+            S = StructuredCovariance(F, cov_b, var_u)
+        elif isinstance(S, pd.DataFrame):
             index = S.index
             S = S.values
 
@@ -100,18 +181,44 @@ class PortfolioOptimizer(BaseOptimizer):
         # scale return to match volatility
         if r is not None and self.scale_return:
             r = r / r.std()
-            r *= np.sqrt(np.mean(np.diag(S)))
+            r *= np.sqrt(np.mean(S.diagonal()))
 
         # optimize
-        w = self._optimize(S, r, w0)
+        start_time = time.time()
+        w = self._optimize(S, r, w0, x0=self._get_init_weights(len(S), index))
+        self.solve_time = time.time() - start_time
+        logger.debug(f"{self.method} portfolio of {len(S)} stocks is solved in {self.solve_time:.3f}s")
 
         # restore index if needed
         if index is not None:
             w = pd.Series(w, index=index)
 
+        self.last_weights = w
         return w
 
-    def _optimize(self, S: np.ndarray, r: Optional[np.ndarray] = None, w0: Optional[np.ndarray] = None) -> np.ndarray:
+    def _get_init_weights(self, n: int, index: Optional[pd.Index] = None) -> Optional[np.ndarray]:
+        """the initial weights of the optimization (None for the default ones)"""
+        if not self.warm_start or self.last_weights is None:
+            return None
+        if index is not None and isinstance(self.last_weights, pd.Series):
+            # the stocks not held in the last portfolio start from 0
+            x0 = self.last_weights.reindex(index).fillna(0).values
+        elif len(self.last_weights) == n:
+            x0 = np.asarray(self.last_weights)
+        else:
+            return None
+        x0 = np.clip(x0, 0, None)
+        if x0.sum() <= 0:
+            return None
+        return x0 / x0.sum()
+
+    def _optimize(
+        self,
+        S: np.ndarray,
+        r: Optional[np.ndarray] = None,
+        w0: Optional[np.ndarray] = None,
+        x0: Optional[np.ndarray] = None,
+    ) -> np.ndarray:
         # inverse volatility
         if self.method == self.OPT_INV:
             if r is not None:
@@ -124,26 +231,28 @@ class PortfolioOptimizer(BaseOptimizer):
         if self.method == self.OPT_GMV:
             if r is not None:
                 warnings.warn("`r` is set but will not be used for `gmv` portfolio")
-            return self._optimize_gmv(S, w0)
+            return self._optimize_gmv(S, w0, x0)
 
         # mean-variance
         if self.method == self.OPT_MVO:
-            return self._optimize_mvo(S, r, w0)
+            return self._optimize_mvo(S, r, w0, x0)
 
         # risk parity
         if self.method == self.OPT_RP:
             if r is not None:
                 warnings.warn("`r` is set but will not be used for `rp` portfolio")
-            return self._optimize_rp(S, w0)
+            return self._optimize_rp(S, w0, x0)
 
     def _optimize_inv(self, S: np.ndarray) -> np.ndarray:
         """Inverse volatility"""
-        vola = np.diag(S) ** 0.5
+        vola = S.diagonal() ** 0.5
         w = 1 / vola
         w /= w.sum()
         return w
 
-    def _optimize_gmv(self, S: np.ndarray, w0: Optional[np.ndarray] = None) -> np.ndarray:
+    def _optimize_gmv(
+        self, S: np.ndarray, w0: Optional[np.ndarray] = None, x0: Optional[np.ndarray] = None
+    ) -> np.ndarray:
         """optimize global minimum variance portfolio
 
         This method solves the following optimization problem
@@ -151,10 +260,16 @@ class PortfolioOptimizer(BaseOptimizer):
             s.t. w >= 0, sum(w) == 1
         where `S` is the covariance matrix.
         """
-        return self._solve(len(S), self._get_objective_gmv(S), *self._get_constrains(w0))
+        return self._solve(
+            len(S), self._get_objective_gmv(S), *self._get_constrains(w0), *self._get_derivatives_gmv(S), x0=x0
+        )
 
     def _optimize_mvo(
-        self, S: np.ndarray, r: Optional[np.ndarray] = None, w0: Optional[np.ndarray] = None
+        self,
+        S: np.ndarray,
+        r: Optional[np.ndarray] = None,
+        w0: Optional[np.ndarray] = None,
+        x0: Optional[np.ndarray] = None,
     ) -> np.ndarray:
         """optimize mean-variance portfolio
 
@@ -164,9 +279,13 @@ class PortfolioOptimizer(BaseOptimizer):
         where `S` is the covariance matrix, `u` is the expected returns,
         and `lamb` is the risk aversion parameter.
         """
-        return self._solve(len(S), self._get_objective_mvo(S, r), *self._get_constrains(w0))
+        return self._solve(
+            len(S), self._get_objective_mvo(S, r), *self._get_constrains(w0), *self._get_derivatives_mvo(S, r), x0=x0
+        )
 
-    def _optimize_rp(self, S: np.ndarray, w0: Optional[np.ndarray] = None) -> np.ndarray:
+    def _optimize_rp(
+        self, S: np.ndarray, w0: Optional[np.ndarray] = None, x0: Optional[np.ndarray] = None
+    ) -> np.ndarray:
         """optimize risk parity portfolio
 
         This method solves the following optimization problem
@@ -174,7 +293,11 @@ class PortfolioOptimizer(BaseOptimizer):
             s.t. w >= 0, sum(w) == 1
         where `S` is the covariance matrix and `N` is the number of stocks.
         """
-        return self._solve(len(S), self._get_objective_rp(S), *self._get_constrains(w0))
+        if self.solver == self.SOLVER_STRUCTURED and w0 is None and self.alpha == 0:
+            return self._solve_risk_parity(S, x0)
+        return self._solve(
+            len(S), self._get_objective_rp(S), *self._get_constrains(w0), *self._get_derivatives_rp(S), x0=x0
+        )
 
     def _get_objective_gmv(self, S: np.ndarray) -> Callable:
         """global minimum variance optimization objective
@@ -217,6 +340,45 @@ class PortfolioOptimizer(BaseOptimizer):
 
         return func
 
+    def _get_derivatives_gmv(self, S: np.ndarray) -> Tuple[Callable, Callable]:
+        """the gradient and the Hessian-vector product of the global minimum variance objective"""
+
+        def jac(x):
+            return 2 * (S @ x)
+
+        def hessp(x, p):
+            return 2 * (S @ p)
+
+        return jac, hessp
+
+    def _get_derivatives_mvo(self, S: np.ndarray, r: np.ndarray = None) -> Tuple[Callable, Callable]:
+        """the gradient and the Hessian-vector product of the mean-variance objective"""
+
+        def jac(x):
+            return -r + 2 * self.lamb * (S @ x)
+
+        def hessp(x, p):
+            return 2 * self.lamb * (S @ p)
+
+        return jac, hessp
+
+    def _get_derivatives_rp(self, S: np.ndarray) -> Tuple[Callable, None]:
+        """the gradient of the risk-parity objective
+
+        Denote y = S w, q = w' y and e = w - q / (N y), the gradient is
+            2 * [e - 2 y sum(e / y) / N + q S (e / y**2) / N]
+        The objective is not quadratic, so there is no constant Hessian-vector product.
+        """
+
+        def jac(x):
+            N = len(x)
+            Sx = S @ x
+            xSx = x @ Sx
+            e = x - xSx / Sx / N
+            return 2 * (e - 2 * Sx * np.sum(e / Sx) / N + xSx * (S @ (e / Sx**2)) / N)
+
+        return jac, None
+
     def _get_constrains(self, w0: Optional[np.ndarray] = None):
         """optimization constraints
 
@@ -236,9 +398,24 @@ class PortfolioOptimizer(BaseOptimizer):
         if w0 is not None:
             cons.append({"type": "ineq", "fun": lambda x: self.delta - np.sum(np.abs(x - w0))})  # >= 0
 
+        if self.solver == self.SOLVER_STRUCTURED:
+            # analytic gradients of the constraints (the sub-gradient for the turnover)
+            cons[0]["jac"] = np.ones_like
+            if w0 is not None:
+                cons[1]["jac"] = lambda x: -np.sign(x - w0)
+
         return bounds, cons
 
-    def _solve(self, n: int, obj: Callable, bounds: so.Bounds, cons: List) -> np.ndarray:
+    def _solve(
+        self,
+        n: int,
+        obj: Callable,
+        bounds: so.Bounds,
+        cons: List,
+        jac: Optional[Callable] = None,
+        hessp: Optional[Callable] = None,
+        x0: Optional[np.ndarray] = None,
+    ) -> np.ndarray:
         """solve optimization
 
         Args:
@@ -246,9 +423,13 @@ class PortfolioOptimizer(BaseOptimizer):
             obj (callable): optimization objective
             bounds (Bounds): bounds of parameters
             cons (list): optimization constraints
+            jac (callable): gradient of the objective (only used by the `structured` solver)
+            hessp (callable): Hessian-vector product of the objective if it is quadratic (only used by the
+                `structured` solver)
+            x0 (np.ndarray): initial weights, default to the equal weights
         """
         # add l2 regularization
-        wrapped_obj = obj
+        wrapped_obj, wrapped_jac, wrapped_hessp = obj, jac, hessp
         if self.alpha > 0:
 
             def opt_obj(x):
@@ -256,10 +437,145 @@ class PortfolioOptimizer(BaseOptimizer):
 
             wrapped_obj = opt_obj
 
+            if jac is not None:
+
+                def opt_jac(x):
+                    return jac(x) + 2 * self.alpha * x
+
+                wrapped_jac = opt_jac
+
+            if hessp is not None:
+
+                def opt_hessp(x, p):
+                    return hessp(x, p) + 2 * self.alpha * p
+
+                wrapped_hessp = opt_hessp
+
         # solve
-        x0 = np.ones(n) / n  # init results
-        sol = so.minimize(wrapped_obj, x0, bounds=bounds, constraints=cons, tol=self.tol)
+        if x0 is None:
+            x0 = np.ones(n) / n  # init results
+        if self.solver == self.SOLVER_SLSQP:
+            sol = so.minimize(wrapped_obj, x0, bounds=bounds, constraints=cons, tol=self.tol)
+        elif len(cons) > 1 or wrapped_hessp is None:
+            # the turnover constraint can't be handled by the projection and the projected gradient is only used for
+            # the quadratic objectives
+            sol = so.minimize(wrapped_obj, x0, jac=wrapped_jac, bounds=bounds, constraints=cons, tol=self.tol)
+        else:
+            sol = self._solve_projected_gradient(wrapped_obj, wrapped_jac, wrapped_hessp, x0)
         if not sol.success:
             warnings.warn(f"optimization not success ({sol.status})")
 
         return sol.x
+
+    def _solve_projected_gradient(
+        self, obj: Callable, jac: Callable, hessp: Callable, x0: np.ndarray
+    ) -> so.OptimizeResult:
+        """minimize the quadratic objective over the simplex {w: w >= 0, sum(w) == 1} by accelerated projected gradient
+
+        - The step size is 1 / L, where L is the largest eigenvalue of the Hessian estimated by the power iteration of
+          the Hessian-vector product.
+        - The momentum is restarted when the objective increases.
+        - It stops when the duality gap g' w - min_i g_i (g is the gradient at w), which bounds the distance between
+          the objective and the optimal one for the convex objectives, is less than `tol` (relative to the objective).
+        """
+        x = _project_simplex(x0)
+        v = np.random.RandomState(0).rand(len(x))
+        for _ in range(30):
+            hv = hessp(x, v)
+            L = np.linalg.norm(hv) / np.linalg.norm(v)
+            v = hv / np.linalg.norm(hv)
+        # leave some room for the error of the estimation
+        L *= 1.1
+        fx = obj(x)
+        y, t = x, 1.0
+        status = 1
+        for nit in range(1, self.max_iter + 1):
+            x_new = _project_simplex(y - jac(y) / L)
+            f_new = obj(x_new)
+            if f_new > fx and y is not x:
+                # restart the momentum
+                y, t = x, 1.0
+                continue
+            t_new = (1 + np.sqrt(1 + 4 * t**2)) / 2
+            y = x_new + (t - 1) / t_new * (x_new - x)
+            x, fx, t = x_new, f_new, t_new
+            g = jac(x)
+            if g @ x - g.min() <= self.tol * max(1.0, abs(fx)):
+                status = 0
+                break
+        return so.OptimizeResult(x=x, fun=fx, nit=nit, status=status, success=status == 0)
+
+    def _solve_risk_parity(self, S: np.ndarray, x0: Optional[np.ndarray] = None) -> np.ndarray:
+        """solve the risk parity portfolio by the equivalent convex problem
+
+            min_y 1/2 * y' S y - sum_i log(y_i) / N
+            s.t.  y > 0
+
+        The normalized solution w = y / sum(y) has equal risk contributions, i.e. the risk parity objective is 0 at w.
+        It is solved by damped Newton steps where the Newton directions are solved by the conjugate gradient with
+        Hessian-vector products.
+        """
+        n = len(S)
+        b = 1 / n
+        diag_S = S.diagonal()
+
+        def func(y):
+            return 0.5 * (y @ (S @ y)) - b * np.sum(np.log(y))
+
+        # the stocks not in the initial weights start from a small positive weight
+        y = np.ones(n) / n if x0 is None else 0.5 * x0 + 0.5 / n
+        # y' S y == 1 at the optimum
+        y /= np.sqrt(y @ (S @ y))
+        f = func(y)
+        status = 1
+        for _ in range(self.max_iter):
+            g = S @ y - b / y
+            diag_h = b / y**2
+            d = _conjugate_gradient(lambda p: S @ p + diag_h * p, -g, diag_S + diag_h)
+            # the Newton decrement
+            decrement = -(g @ d)
+            if decrement / 2 <= self.tol:
+                status = 0
+                break
+            # keep y positive and decrease the objective sufficiently
+            step = 1.0
+            if (d < 0).any():
+                step = min(step, 0.99 * np.min(-y[d < 0] / d[d < 0]))
+            while True:
+                f_new = func(y + step * d)
+                if f_new <= f - 0.25 * step * decrement or step < 1e-12:
+                    break
+                step /= 2
+            y, f = y + step * d, f_new
+        if status != 0:
+            warnings.warn(f"optimization not success ({status})")
+        return y / y.sum()
+
+
+def _conjugate_gradient(matvec: Callable, b: np.ndarray, diag: np.ndarray, tol: float = 1e-10) -> np.ndarray:
+    """solve `A x = b` for the symmetric positive definite `A` given by `matvec` with the Jacobi preconditioner"""
+    x = np.zeros_like(b)
+    r = b.copy()
+    z = r / diag
+    p = z.copy()
+    rz = r @ z
+    b_norm = np.linalg.norm(b)
+    for _ in range(len(b)):
+        if np.linalg.norm(r) <= tol * b_norm:
+            break
+        Ap = matvec(p)
+        step = rz / (p @ Ap)
+        x += step * p
+        r -= step * Ap
+        z = r / diag
+        rz, rz_old = r @ z, rz
+        p = z + rz / rz_old * p
+    return x
+
+
+def _project_simplex(v: np.ndarray) -> np.ndarray:
+    """Euclidean projection onto the simplex {w: w >= 0, sum(w) == 1}"""
+    u = np.sort(v)[::-1]
+    css = np.cumsum(u) - 1
+    rho = np.flatnonzero(u - css / np.arange(1, len(v) + 1) > 0)[-1]
+    return np.maximum(v - css[rho] / (rho + 1), 0)
@@ -12,7 +12,7 @@ from qlib.utils import lazy_sort_index
 from ...utils.resam import resam_ts_data, ts_data_last
 from ...data.data import D
 from ...strategy.base import BaseStrategy
-from ...backtest.decision import BaseTradeDecision, Order, TradeDecisionWO, TradeRange
+from ...backtest.decision import BaseTradeDecision, Order, OrderBatch, TradeDecisionWO, TradeRange
 from ...backtest.exchange import Exchange, OrderHelper
 from ...backtest.utils import CommonInfrastructure, LevelInfrastructure
 from qlib.utils.file import get_io_object
@@ -39,6 +39,8 @@ class TWAPStrategy(BaseStrategy):
             self.trade_amount_remain = {}
             for order in outer_trade_decision.get_decision():
                 self.trade_amount_remain[order.stock_id] = order.amount
+            # the states of `generate_fused_trade_decision`. They are created at the first fused step
+            self._fused_state = None
 
     def generate_trade_decision(self, execute_result=None):
         # NOTE:  corner cases!!!
@@ -121,6 +123,88 @@ class TWAPStrategy(BaseStrategy):
                 order_list.append(_order)
         return TradeDecisionWO(order_list=order_list, strategy=self)
 
+    def support_fused_loop(self):
+        # the fused version is only the same as `generate_trade_decision` of this class
+        if type(self).generate_trade_decision is not TWAPStrategy.generate_trade_decision:
+            return False
+        # the remaining amounts are maintained by stock id
+        stock_ids = [order.stock_id for order in self.outer_trade_decision.get_decision()]
+        return len(set(stock_ids)) == len(stock_ids)
+
+    def _init_fused_state(self):
+        orders = self.outer_trade_decision.get_decision()
+        n = len(orders)
+        self._fused_state = {
+            "orders": orders,
+            "stock_id": np.array([order.stock_id for order in orders], dtype=object),
+            "amount": np.array([order.amount for order in orders], dtype=np.float64),
+            "direction": np.array([order.direction for order in orders], dtype=np.int8),
+            "remain": np.array([self.trade_amount_remain[order.stock_id] for order in orders], dtype=np.float64),
+            "pos": {order.stock_id: i for i, order in enumerate(orders)},
+            # the trade units are queried when the stock is tradable for the first time
+            "unit": np.full(n, np.nan),
+            "unit_none": np.zeros(n, dtype=bool),
+            "unit_ready": np.zeros(n, dtype=bool),
+        }
+
+    def generate_fused_trade_decision(self, execute_result=None):
+        """
+        The vectorized version of `generate_trade_decision`.
+        The amounts of all the orders are calculated by array operations and the decision is made of an `OrderBatch`.
+        """
+        if len(self.outer_trade_decision.get_decision()) == 0:
+            return TradeDecisionWO(order_list=[], strategy=self)
+
+        trade_step = self.trade_calendar.get_trade_step()
+        start_idx, end_idx = get_start_end_idx(self.trade_calendar, self.outer_trade_decision)
+        trade_len = end_idx - start_idx + 1
+        if trade_step < start_idx or trade_step > end_idx:
+            return TradeDecisionWO(order_list=[], strategy=self)
+        rel_trade_step = trade_step - start_idx
+
+        if self._fused_state is None:
+            self._init_fused_state()
+        state = self._fused_state
+        remain = state["remain"]
+        if execute_result is not None:
+            for order, _, _, _ in execute_result:
+                # `trade_amount_remain` is kept the same as the one of `generate_trade_decision`
+                self.trade_amount_remain[order.stock_id] -= order.deal_amount
+                remain[state["pos"][order.stock_id]] -= order.deal_amount
+
+        trade_start_time, trade_end_time = self.trade_calendar.get_step_time(trade_step)
+        tradable = ~self.trade_exchange.suspended_mask(state["stock_id"], trade_start_time, trade_end_time)
+        for i in np.flatnonzero(tradable & ~state["unit_ready"]):
+            order = state["orders"][i]
+            _amount_trade_unit = self.trade_exchange.get_amount_of_trade_unit(
+                stock_id=order.stock_id, start_time=order.start_time, end_time=order.end_time
+            )
+            if _amount_trade_unit is None:
+                state["unit_none"][i] = True
+            else:
+                state["unit"][i] = _amount_trade_unit
+            state["unit_ready"][i] = True
+
+        # please refer to `generate_trade_decision` for the details
+        amount = state["amount"]
+        amount_delta = amount / trade_len * (rel_trade_step + 1) - (amount - remain)
+        if rel_trade_step == trade_len - 1:
+            amount_delta_target = remain.copy()
+        else:
+            unit = state["unit"]
+            amount_delta_target = np.where(
+                state["unit_none"], amount_delta, np.minimum(np.round(amount_delta / unit) * unit, remain)
+            )
+        selected = tradable & (amount_delta_target > 1e-5)
+        order_batch = OrderBatch(
+            state["stock_id"][selected],
+            amount_delta_target[selected],
+            state["direction"][selected],
+            trade_start_time,
+            trade_end_time,
+        )
+        return TradeDecisionWO(order_list=order_batch, strategy=self)
+
 
 class SBBStrategyBase(BaseStrategy):
     """
@@ -6,14 +6,14 @@ import warnings
 import numpy as np
 import pandas as pd
 
-from typing import Dict, List, Text, Tuple, Union
+from typing import Callable, Dict, List, Optional, Text, Tuple, Union
 from abc import ABC
 
 from qlib.data import D
 from qlib.data.dataset import Dataset
 from qlib.model.base import BaseModel
 from qlib.strategy.base import BaseStrategy
-from qlib.backtest.position import Position
+from qlib.backtest.position import BasePosition, Position
 from qlib.backtest.signal import Signal, create_signal_from
 from qlib.backtest.decision import Order, OrderDir, TradeDecisionWO
 from qlib.log import get_module_logger
@@ -72,6 +72,165 @@ class BaseSignalStrategy(BaseStrategy, ABC):
         return self.risk_degree
 
 
+def _score_key(score: np.ndarray) -> np.ndarray:
+    """the sorting key of descending scores with NaN at the end (like `pd.Series.sort_values(ascending=False)`)"""
+    return np.where(np.isnan(score), np.inf, -score)
+
+
+def _top_n(key: np.ndarray, n: int) -> np.ndarray:
+    """the positions of the `n` smallest keys sorted by the keys. The ties are sorted by the positions."""
+    n = min(n, len(key))
+    if n <= 0:
+        return np.zeros(0, dtype=np.int64)
+    if n < len(key):
+        # the keys less than the n-th smallest one and the leading ones equal to it
+        kth = key[np.argpartition(key, n - 1)[n - 1]]
+        less = np.flatnonzero(key < kth)
+        pos = np.concatenate([less, np.flatnonzero(key == kth)[: n - len(less)]])
+    else:
+        pos = np.arange(n)
+    return pos[np.lexsort((pos, key[pos]))]
+
+
+def _get_first_n(key: np.ndarray, n: int, tradable: Optional[Callable] = None) -> np.ndarray:
+    """
+    the positions of the first `n` elements sorted by `key`, i.e. `sorted_list[:n]`.
+
+    If `tradable` (a function mapping the positions to a boolean mask) is given, the first `n` tradable elements are
+    returned. The candidates are checked block by block, so the rest of them are skipped once `n` stocks are found.
+    """
+    if tradable is None:
+        # NOTE: the semantic of slicing is kept (e.g. `n` is negative)
+        return _top_n(key, len(range(len(key))[:n]))
+    # NOTE: the first tradable element is returned even if `n` <= 0, like the original loop which checks `n` after
+    # appending the element
+    n = max(n, 1)
+    res, m = [], 0
+    while sum(len(r) for r in res) < n and m < len(key):
+        need = n - sum(len(r) for r in res)
+        top = _top_n(key, m + need)
+        block = top[m:]
+        m = len(top)
+        res.append(block[tradable(block)])
+    return np.concatenate(res) if len(res) > 0 else np.zeros(0, dtype=np.int64)
+
+
+def topk_dropout_select(
+    score: np.ndarray,
+    held: np.ndarray,
+    topk: int,
+    n_drop: int,
+    method_buy: str = "top",
+    method_sell: str = "bottom",
+    tradable: Optional[Callable[[np.ndarray], np.ndarray]] = None,
+    stock_ids: Optional[np.ndarray] = None,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    The stock selection of `TopkDropoutStrategy` over the integer ids of stocks.
+
+    The stocks are only ranked partially (by `np.argpartition`) and the sets are represented by boolean masks.
+
+    Parameters
+    ----------
+    score : np.ndarray
+        the scores of all the stocks (NaN for missing). The id of a stock is its position.
+    held : np.ndarray
+        the ids of the stocks in current position
+    topk : int
+        the number of stocks in the portfolio
+    n_drop : int
+        the number of stocks to be replaced
+    method_buy : str
+        top/random
+    method_sell : str
+        bottom/random
+    tradable : Optional[Callable[[np.ndarray], np.ndarray]]
+        the function returning the tradable mask of the given ids. Only the tradable stocks are selected if it is given
+    stock_ids : Optional[np.ndarray]
+        the names of the stocks. It breaks the ties of the scores of the held and the new stocks like `pd.Index.union`
+
+    Returns
+    -------
+    Tuple[np.ndarray, np.ndarray]
+        the ids of the stocks to sell (in the order of the last position sorted by score) and the ids to buy
+    """
+    key = _score_key(score)
+    # last position (sorted by score)
+    last = held[np.argsort(key[held], kind="stable")]
+    is_held = np.zeros(len(score), dtype=bool)
+    is_held[held] = True
+    # The new stocks today want to buy **at most**
+    n = n_drop + topk - len(last)
+    if method_buy == "top":
+        candi = np.flatnonzero(~is_held)
+        today = candi[_get_first_n(key[candi], n, None if tradable is None else lambda pos: tradable(candi[pos]))]
+    elif method_buy == "random":
+        topk_candi = _get_first_n(key, topk, tradable)
+        candi = topk_candi[~is_held[topk_candi]]
+        try:
+            today = np.random.choice(candi, n, replace=False)
+        except ValueError:
+            today = candi
+    else:
+        raise NotImplementedError(f"This type of input is not supported")
+    # combine(new stocks + last stocks),  we will drop stocks from this list
+    # In case of dropping higher score stock and buying lower score stock.
+    comb = np.concatenate([last, today])
+    if len(last) > 0 and len(today) > 0:
+        # the ties are sorted by the names like `pd.Index.union`. Otherwise, `comb` has been sorted
+        comb = comb[np.lexsort((comb if stock_ids is None else stock_ids[comb].astype(str), key[comb]))]
+
+    # Get the stock list we really want to sell (After filtering the case that we sell high and buy low)
+    if method_sell == "bottom":
+        if tradable is None:
+            drop = comb[-n_drop:]
+        else:
+            rev = comb[::-1]
+            drop = rev[_get_first_n(np.arange(len(rev)), n_drop, lambda pos: tradable(rev[pos]))]
+        sell = last[np.isin(last, drop)]
+    elif method_sell == "random":
+        candi = last if tradable is None else last[tradable(last)]
+        try:
+            sell = np.random.choice(candi, n_drop, replace=False) if len(last) else np.zeros(0, dtype=np.int64)
+        except ValueError:  # No enough candidates
+            sell = candi
+    else:
+        raise NotImplementedError(f"This type of input is not supported")
+
+    # Get the stock list we really want to buy
+    buy = today[: len(sell) + topk - len(last)]
+    return sell, buy
+
+
+class _SellingPosition(BasePosition):
+    """
+    The position to simulate the cash of selling the stocks of `position` without copying it.
+    Each stock can be sold only once.
+    """
+
+    def __init__(self, position: BasePosition) -> None:
+        super().__init__()
+        self._position = position
+        self._settle_type = position._settle_type
+        self._cash = position.get_cash()
+
+    def check_stock(self, stock_id: str) -> bool:
+        return self._position.check_stock(stock_id)
+
+    def get_stock_amount(self, code: str) -> float:
+        return self._position.get_stock_amount(code)
+
+    def get_cash(self, include_settle: bool = False) -> float:
+        return self._cash
+
+    def update_order(self, order: Order, trade_val: float, cost: float, trade_price: float) -> None:
+        if order.direction != Order.SELL:
+            raise NotImplementedError("only selling is supported")
+        # the cash of selling is not available before settlement
+        if self._settle_type == self.ST_NO:
+            self._cash += trade_val - cost
+
+
 class TopkDropoutStrategy(BaseSignalStrategy):
     # TODO:
     # 1. Supporting leverage the get_range_limit result from the decision
@@ -147,143 +306,103 @@ class TopkDropoutStrategy(BaseSignalStrategy):
             pred_score = pred_score.iloc[:, 0]
         if pred_score is None:
             return TradeDecisionWO([], self)
+        trade_exchange = self.trade_exchange
+        # the stocks are represented by the integer ids, i.e. the positions in `stock_ids`
+        stock_ids = pred_score.index.values
+        score = pred_score.values.astype(np.float64)
+        # the current position is only read, so it is not copied
+        current_stock_list = self.trade_position.get_stock_list()
+        held = pred_score.index.get_indexer(current_stock_list)
+        missing = held < 0
+        if missing.any():
+            # the held stocks without score
+            held[missing] = len(stock_ids) + np.arange(missing.sum())
+            stock_ids = np.concatenate([stock_ids, np.array(current_stock_list, dtype=object)[missing]])
+            score = np.concatenate([score, np.full(missing.sum(), np.nan)])
+
         if self.only_tradable:
             # If The strategy only consider tradable stock when make decision
-            # It needs following actions to filter stocks
-            def get_first_n(li, n, reverse=False):
-                cur_n = 0
-                res = []
-                for si in reversed(li) if reverse else li:
-                    if self.trade_exchange.is_stock_tradable(
-                        stock_id=si, start_time=trade_start_time, end_time=trade_end_time
-                    ):
-                        res.append(si)
-                        cur_n += 1
-                        if cur_n >= n:
-                            break
-                return res[::-1] if reverse else res
-
-            def get_last_n(li, n):
-                return get_first_n(li, n, reverse=True)
-
-            def filter_stock(li):
-                return [
-                    si
-                    for si in li
-                    if self.trade_exchange.is_stock_tradable(
-                        stock_id=si, start_time=trade_start_time, end_time=trade_end_time
-                    )
-                ]
+            # The tradable state of the candidates are checked lazily
+            def is_tradable(ids):
+                return trade_exchange.tradable_mask(
+                    stock_ids[ids], start_time=trade_start_time, end_time=trade_end_time
+                )
 
         else:
             # Otherwise, the stock will make decision without the stock tradable info
-            def get_first_n(li, n):
-                return list(li)[:n]
-
-            def get_last_n(li, n):
-                return list(li)[-n:]
-
-            def filter_stock(li):
-                return li
+            is_tradable = None
+
+        sell, buy = topk_dropout_select(
+            score,
+            held,
+            self.topk,
+            self.n_drop,
+            method_buy=self.method_buy,
+            method_sell=self.method_sell,
+            tradable=is_tradable,
+            stock_ids=stock_ids,
+        )
 
-        current_temp: Position = copy.deepcopy(self.trade_position)
         # generate order list for this adjust date
         sell_order_list = []
         buy_order_list = []
-        # load score
-        cash = current_temp.get_cash()
-        current_stock_list = current_temp.get_stock_list()
-        # last position (sorted by score)
-        last = pred_score.reindex(current_stock_list).sort_values(ascending=False).index
-        # The new stocks today want to buy **at most**
-        if self.method_buy == "top":
-            today = get_first_n(
-                pred_score[~pred_score.index.isin(last)].sort_values(ascending=False).index,
-                self.n_drop + self.topk - len(last),
-            )
-        elif self.method_buy == "random":
-            topk_candi = get_first_n(pred_score.sort_values(ascending=False).index, self.topk)
-            candi = list(filter(lambda x: x not in last, topk_candi))
-            n = self.n_drop + self.topk - len(last)
-            try:
-                today = np.random.choice(candi, n, replace=False)
-            except ValueError:
-                today = candi
-        else:
-            raise NotImplementedError(f"This type of input is not supported")
-        # combine(new stocks + last stocks),  we will drop stocks from this list
-        # In case of dropping higher score stock and buying lower score stock.
-        comb = pred_score.reindex(last.union(pd.Index(today))).sort_values(ascending=False).index
-
-        # Get the stock list we really want to sell (After filtering the case that we sell high and buy low)
-        if self.method_sell == "bottom":
-            sell = last[last.isin(get_last_n(comb, self.n_drop))]
-        elif self.method_sell == "random":
-            candi = filter_stock(last)
-            try:
-                sell = pd.Index(np.random.choice(candi, self.n_drop, replace=False) if len(last) else [])
-            except ValueError:  # No enough candidates
-                sell = candi
-        else:
-            raise NotImplementedError(f"This type of input is not supported")
-
-        # Get the stock list we really want to buy
-        buy = today[: len(sell) + self.topk - len(last)]
-        for code in current_stock_list:
-            if not self.trade_exchange.is_stock_tradable(
+        sell_set = set(sell.tolist())
+        sell_candi = [code for code, i in zip(current_stock_list, held) if i in sell_set]
+        sell_tradable = trade_exchange.tradable_mask(
+            sell_candi,
+            start_time=trade_start_time,
+            end_time=trade_end_time,
+            direction=None if self.forbid_all_trade_at_limit else OrderDir.SELL,
+        )
+        time_per_step = self.trade_calendar.get_freq()
+        for code, tradable in zip(sell_candi, sell_tradable):
+            if not tradable:
+                continue
+            # check hold limit
+            if self.trade_position.get_stock_count(code, bar=time_per_step) < self.hold_thresh:
+                continue
+            # sell order
+            sell_amount = self.trade_position.get_stock_amount(code=code)
+            # sell_amount = self.trade_exchange.round_amount_by_trade_unit(sell_amount, factor)
+            sell_order = Order(
                 stock_id=code,
+                amount=sell_amount,
                 start_time=trade_start_time,
                 end_time=trade_end_time,
-                direction=None if self.forbid_all_trade_at_limit else OrderDir.SELL,
-            ):
-                continue
-            if code in sell:
-                # check hold limit
-                time_per_step = self.trade_calendar.get_freq()
-                if current_temp.get_stock_count(code, bar=time_per_step) < self.hold_thresh:
-                    continue
-                # sell order
-                sell_amount = current_temp.get_stock_amount(code=code)
-                # sell_amount = self.trade_exchange.round_amount_by_trade_unit(sell_amount, factor)
-                sell_order = Order(
-                    stock_id=code,
-                    amount=sell_amount,
-                    start_time=trade_start_time,
-                    end_time=trade_end_time,
-                    direction=Order.SELL,  # 0 for sell, 1 for buy
-                )
-                # is order executable
-                if self.trade_exchange.check_order(sell_order):
-                    sell_order_list.append(sell_order)
-                    trade_val, trade_cost, trade_price = self.trade_exchange.deal_order(
-                        sell_order, position=current_temp
-                    )
-                    # update cash
-                    cash += trade_val - trade_cost
+                direction=Order.SELL,  # 0 for sell, 1 for buy
+            )
+            # the order is executable because the stock is tradable in the direction of selling
+            sell_order_list.append(sell_order)
+        # update cash
+        cash = self.trade_position.get_cash()
+        for trade_val, trade_cost, _ in trade_exchange.deal_orders(
+            sell_order_list, position=_SellingPosition(self.trade_position)
+        ):
+            cash += trade_val - trade_cost
         # buy new stock
-        # note the current has been changed
-        # current_stock_list = current_temp.get_stock_list()
+        buy = stock_ids[buy].tolist()
         value = cash * self.risk_degree / len(buy) if len(buy) > 0 else 0
 
         # open_cost should be considered in the real trading environment, while the backtest in evaluate.py does not
         # consider it as the aim of demo is to accomplish same strategy as evaluate.py, so comment out this line
         # value = value / (1+self.trade_exchange.open_cost) # set open_cost limit
-        for code in buy:
+        buy_tradable = trade_exchange.tradable_mask(
+            buy,
+            start_time=trade_start_time,
+            end_time=trade_end_time,
+            direction=None if self.forbid_all_trade_at_limit else OrderDir.BUY,
+        )
+        for code, tradable in zip(buy, buy_tradable):
             # check is stock suspended
-            if not self.trade_exchange.is_stock_tradable(
-                stock_id=code,
-                start_time=trade_start_time,
-                end_time=trade_end_time,
-                direction=None if self.forbid_all_trade_at_limit else OrderDir.BUY,
-            ):
+            if not tradable:
                 continue
             # buy order
-            buy_price = self.trade_exchange.get_deal_price(
+            buy_price = trade_exchange.get_deal_price(
                 stock_id=code, start_time=trade_start_time, end_time=trade_end_time, direction=OrderDir.BUY
             )
             buy_amount = value / buy_price
-            factor = self.trade_exchange.get_factor(stock_id=code, start_time=trade_start_time, end_time=trade_end_time)
-            buy_amount = self.trade_exchange.round_amount_by_trade_unit(buy_amount, factor)
+            factor = trade_exchange.get_factor(stock_id=code, start_time=trade_start_time, end_time=trade_end_time)
+            buy_amount = trade_exchange.round_amount_by_trade_unit(buy_amount, factor)
             buy_order = Order(
                 stock_id=code,
                 amount=buy_amount,
@@ -393,6 +512,10 @@ class EnhancedIndexingStrategy(WeightStrategyBase):
     The risk model data can be obtained from risk data provider. You can also use
     `qlib.model.riskmodel.structured.StructuredCovEstimator` to prepare these data.
 
+    `riskmodel_root` can also be a `qlib.model.riskmodel.RiskDataStore` (e.g. converted by
+    `RiskDataStore.from_riskmodel_root`), which keeps the risk data of all the dates in memory-mapped files and is
+    much faster to load than the files of each date.
+
     Args:
         riskmodel_path (str): risk model path
         name_mapping (dict): alternative file names
@@ -432,11 +555,21 @@ class EnhancedIndexingStrategy(WeightStrategyBase):
         self.verbose = verbose
 
         self._riskdata_cache = {}
+        # NOTE: the risk models (requiring sklearn) are not imported unless the strategy is used
+        from qlib.model.riskmodel import RiskDataStore  # pylint: disable=C0415
+
+        self._riskdata_store = RiskDataStore(riskmodel_root) if RiskDataStore.is_store(riskmodel_root) else None
 
     def get_risk_data(self, date):
         if date in self._riskdata_cache:
             return self._riskdata_cache[date]
 
+        if self._riskdata_store is not None:
+            outs = self._riskdata_store.read(date)
+            if outs is not None:
+                self._riskdata_cache[date] = outs
+            return outs
+
         root = self.riskmodel_root + "/" + date.strftime("%Y%m%d")
         if not os.path.exists(root):
             return None
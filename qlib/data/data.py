@@ -591,7 +591,7 @@ class DatasetProvider(abc.ABC):
             data = pd.DataFrame(
                 index=pd.MultiIndex.from_arrays([[], []], names=("instrument", "datetime")),
                 columns=column_names,
-                dtype=np.float32,
+                dtype=C.get("expression_dtype", np.float32),
             )
 
         return data
@@ -866,10 +866,9 @@ class LocalExpressionProvider(ExpressionProvider):
             raise
         # Ensure that each column type is consistent
         # FIXME:
-        # 1) The stock data is currently float. If there is other types of data, this part needs to be re-implemented.
-        # 2) The precision should be configurable
+        # The stock data is currently float. If there is other types of data, this part needs to be re-implemented.
         try:
-            series = series.astype(np.float32)
+            series = series.astype(C.get("expression_dtype", np.float32))
         except ValueError:
             pass
         except TypeError:
@@ -9,7 +9,7 @@ import pandas as pd
 import numpy as np
 import bisect
 from ...utils import lazy_sort_index
-from .utils import get_level_index
+from .utils import get_level_index, cast_float_dtype
 
 
 class Dataset(Serializable):
@@ -177,10 +177,12 @@ class DatasetH(Dataset):
         slc : please refer to the docs of `prepare`
                 NOTE: it may not be an instance of slice. It may be a segment of `segments` from `def prepare`
         """
+        dtype = kwargs.pop("dtype", None)
         if hasattr(self, "fetch_kwargs"):
-            return self.handler.fetch(slc, **kwargs, **self.fetch_kwargs)
+            data = self.handler.fetch(slc, **kwargs, **self.fetch_kwargs)
         else:
-            return self.handler.fetch(slc, **kwargs)
+            data = self.handler.fetch(slc, **kwargs)
+        return cast_float_dtype(data, dtype)
 
     def prepare(
         self,
@@ -217,6 +219,9 @@ class DatasetH(Dataset):
                 flt_col : str
                     It only exists in TSDatasetH, can be used to add a column of data(True or False) to filter data.
                     This parameter is only supported when it is an instance of TSDatasetH.
+                dtype :
+                    The dtype of the float columns of the prepared data. The dtype of the handler's data will be kept
+                    if it is None. Please refer to `DataHandlerLP.dtype` for storing the data with lower precision.
 
         Returns
         -------
@@ -673,7 +678,7 @@ class TSDatasetH(DatasetH):
     def setup_data(self, **kwargs):
         super().setup_data(**kwargs)
         # make sure the calendar is updated to latest when loading data from new config
-        cal = self.handler.fetch(col_set=self.handler.CS_RAW).index.get_level_values("datetime").unique()
+        cal = self.handler.get_datetime_index()
         self.cal = sorted(cal)
 
     @staticmethod
@@ -0,0 +1,349 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License.
+"""
+Disk cache for the data of data handlers.
+
+Motivation:
+
+- Rolling retraining re-creates the handler with a time range which only moves forward by a small step. Loading raw
+  features and fitting/processing the data again from scratch is a waste of time.
+
+The cache is content-addressed. There are two tiers of entries
+
+- raw data: keyed by the data loader config, the instruments, the start time of the handler and the version of the
+  data (`provider_uri`, `region` and the stamps of the calendar and instrument files, please refer to `data_version`).
+- processed data: keyed by the raw key and the processors config (e.g. `fit_start_time`, `fit_end_time`).
+  It stores the fitted processors and the processed `_infer` / `_learn` data.
+
+The end time is not a part of the key. When the requested range ends later than the cached one, only the new tail
+(plus a small overlap to refresh the labels looking forward) is loaded and processed, then the entry is extended.
+
+NOTE: processing the tail separately assumes that the processors work row-wise or cross-sectionally (i.e. the result
+of one datetime only relies on the data of that datetime and the fitted parameters). All the processors in
+`qlib.data.dataset.processor` satisfy this assumption.
+"""
+from __future__ import annotations
+
+import functools
+import hashlib
+import os
+import pickle
+import types
+import tempfile
+from pathlib import Path
+from typing import TYPE_CHECKING, List, Optional, Union
+
+import numpy as np
+import pandas as pd
+
+from ...config import C
+from ...log import get_module_logger
+from ...utils import hash_args, time_to_slc_point
+from ...utils.exceptions import QlibException
+from .utils import get_level_index
+
+if TYPE_CHECKING:
+    from .handler import DataHandlerLP
+
+
+class UncacheableError(QlibException):
+    """Error type for the objects which can't be a part of the cache key"""
+
+
+def _hash_data(obj: Union[np.ndarray, pd.DataFrame, pd.Series, pd.Index]) -> str:
+    """hash the content of the data (including the index, columns and dtypes of pandas objects)"""
+    md5 = hashlib.md5(type(obj).__name__.encode())
+    try:
+        if isinstance(obj, np.ndarray):
+            md5.update(f"{obj.dtype.str}{obj.shape}".encode())
+            if obj.dtype == object:
+                obj = pd.Series(obj.ravel())
+            else:
+                md5.update(np.ascontiguousarray(obj).tobytes())
+                return md5.hexdigest()
+        if isinstance(obj, pd.DataFrame):
+            md5.update(_hash_data(obj.columns).encode())
+            md5.update(str(obj.dtypes.tolist()).encode())
+        elif isinstance(obj, (pd.Series, pd.Index)):
+            md5.update(f"{obj.dtype}{obj.name}".encode())
+        md5.update(pd.util.hash_pandas_object(obj).values.tobytes())
+    except TypeError as e:
+        # e.g. the cells are lists
+        raise UncacheableError(f"The content of {type(obj)} can't be hashed: {e}") from e
+    return md5.hexdigest()
+
+
+def stable_state(obj, depth: int = 0):
+    """
+    Convert an object (e.g. a data loader or a processor) into a json-friendly structure for hashing.
+
+    - Data (np.ndarray and pandas objects, e.g. the DataFrame of `StaticDataLoader`) are represented by the hash of
+      their content.
+    - Private attributes are skipped unless they are in `include_attr` (e.g. `StaticDataLoader._config`).
+    - Objects are represented by their class and attributes.
+
+    `UncacheableError` will be raised if the object can't be represented stably (e.g. functions).
+    """
+    if obj is None or isinstance(obj, (bool, int, float, str)):
+        return obj
+    if isinstance(obj, (pd.Timestamp, np.datetime64, Path)):
+        return str(obj)
+    if isinstance(obj, type):
+        return f"{obj.__module__}.{obj.__qualname__}"
+    if isinstance(obj, (np.ndarray, pd.DataFrame, pd.Series, pd.Index)):
+        return {"__data__": _hash_data(obj)}
+    if isinstance(obj, (types.FunctionType, types.MethodType, types.BuiltinFunctionType, functools.partial)):
+        raise UncacheableError(f"The function {obj} can't be a part of the cache key")
+    if depth > 8:
+        raise UncacheableError(f"The object {type(obj)} is nested too deeply to be a part of the cache key")
+    if isinstance(obj, (list, tuple)):
+        return [stable_state(v, depth + 1) for v in obj]
+    if isinstance(obj, dict):
+        return {str(k): stable_state(v, depth + 1) for k, v in obj.items()}
+    if hasattr(obj, "__dict__"):
+        # follow the convention of `Serializable`: the attributes starting with `_` are data instead of config
+        include = getattr(obj, "include_attr", [])
+        res = stable_state({k: v for k, v in vars(obj).items() if not k.startswith("_") or k in include}, depth + 1)
+        res["__class__"] = f"{type(obj).__module__}.{type(obj).__qualname__}"
+        return res
+    return str(obj)
+
+
+class DiskHandlerCache:
+    """
+    Disk cache for the raw data, fitted processors and processed data of DataHandlerLP.
+
+    .. code-block:: python
+
+        handler = Alpha158(..., cache={"class": "DiskHandlerCache", "kwargs": {"cache_dir": "~/.qlib/handler_cache"}})
+        # or simply
+        handler = Alpha158(..., cache="~/.qlib/handler_cache")
+    """
+
+    RAW_DIR = "raw"
+    PROC_DIR = "processed"
+
+    def __init__(self, cache_dir: Union[str, Path], overlap: int = 10, cache_processed: bool = True):
+        """
+        Parameters
+        ----------
+        cache_dir : Union[str, Path]
+            the directory to save the cache.
+        overlap : int
+            The number of the last cached periods to be reloaded when extending the tail.
+            The labels at the end of the cached data may be NaN because the future data was not available when caching.
+            It should be larger than the horizon of the label.
+        cache_processed : bool
+            Whether to cache the fitted processors and processed data. Otherwise only the raw data are cached.
+        """
+        self.cache_dir = Path(cache_dir).expanduser().resolve()
+        self.overlap = overlap
+        self.cache_processed = cache_processed
+
+    @staticmethod
+    def data_version() -> list:
+        """
+        The version of the data provided by qlib. So switching the data or re-dumping it will not hit the old entries.
+
+        It includes `provider_uri`, `region`, and the modification time, size and last line (i.e. the end of the
+        calendars) of the calendar and instrument files.
+        """
+        version: List = [str(C.get("provider_uri")), C.get("region")]
+        if not C.registered or not isinstance(C.dpm.provider_uri, dict):
+            return version
+        for freq in sorted(C.dpm.provider_uri):
+            data_uri = C.dpm.get_data_uri(freq)
+            for path in sorted(data_uri.joinpath("calendars").glob("*.txt")) + sorted(
+                data_uri.joinpath("instruments").glob("*.txt")
+            ):
+                stat = path.stat()
+                version.append([str(path), stat.st_mtime_ns, stat.st_size, DiskHandlerCache._last_line(path)])
+        return version
+
+    @staticmethod
+    def _last_line(path: Path) -> str:
+        with path.open("rb") as f:
+            f.seek(max(f.seek(0, os.SEEK_END) - 256, 0))
+            lines = f.read().strip().splitlines()
+        return lines[-1].decode(errors="replace") if lines else ""
+
+    def raw_key(self, handler: DataHandlerLP) -> Optional[str]:
+        """the key of the raw data. None will be returned if the data loader or instruments can't be hashed"""
+        try:
+            return hash_args(
+                stable_state(handler.data_loader),
+                stable_state(handler.instruments),
+                str(time_to_slc_point(handler.start_time)),
+                str(C.get("expression_dtype")),
+                self.data_version(),
+            )
+        except UncacheableError as e:
+            get_module_logger(self.__class__.__name__).warning(f"The data of the handler will not be cached: {e}")
+            return None
+
+    def proc_key(self, handler: DataHandlerLP) -> Optional[str]:
+        """the key of the processed data. None will be returned if the raw data or the processors can't be hashed"""
+        raw_key = self.raw_key(handler)
+        if raw_key is None:
+            return None
+        try:
+            return hash_args(
+                raw_key,
+                stable_state(handler.shared_processors),
+                stable_state(handler.infer_processors),
+                stable_state(handler.learn_processors),
+                handler.process_type,
+                stable_state(getattr(handler, "dtype", None)),
+            )
+        except UncacheableError as e:
+            get_module_logger(self.__class__.__name__).warning(f"The processed data will not be cached: {e}")
+            return None
+
+    def _path(self, sub_dir: str, key: str) -> Path:
+        return self.cache_dir.joinpath(sub_dir, f"{key}.pkl")
+
+    @staticmethod
+    def _read(path: Path) -> Optional[dict]:
+        if not path.exists():
+            return None
+        with path.open("rb") as f:
+            return pickle.load(f)
+
+    @staticmethod
+    def _write(path: Path, entry: dict):
+        # write to a temporary file first. So the concurrent readers (e.g. parallel rolling tasks) never get broken files
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                pickle.dump(entry, f, protocol=C.dump_protocol_version)
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    @staticmethod
+    def _covered(entry: dict, end_time) -> bool:
+        """Is the requested `end_time` covered by the entry"""
+        cached_end = entry["end_time"]
+        return end_time is not None and cached_end is not None and end_time <= cached_end
+
+    @staticmethod
+    def _dt_values(df: pd.DataFrame) -> pd.Index:
+        return df.index.get_level_values(get_level_index(df, "datetime"))
+
+    def _tail_start(self, df: pd.DataFrame) -> Optional[pd.Timestamp]:
+        """The start time of the tail to be reloaded. None indicates reloading everything"""
+        dts = self._dt_values(df).unique().sort_values()
+        if len(dts) <= self.overlap:
+            return None
+        return dts[-self.overlap] if self.overlap > 0 else dts[-1] + pd.Timedelta(1, unit="ns")
+
+    def _head(self, df: pd.DataFrame, tail_start: pd.Timestamp) -> pd.DataFrame:
+        return df[self._dt_values(df) < tail_start]
+
+    def _slice_end(self, df: pd.DataFrame, end_time) -> pd.DataFrame:
+        if end_time is None:
+            return df
+        return df[self._dt_values(df) <= end_time]
+
+    def load_raw(self, handler: DataHandlerLP) -> pd.DataFrame:
+        """
+        Load the raw data of the handler. Only the part which is not cached will be loaded by the data loader.
+        """
+        key = self.raw_key(handler)
+        if key is None:
+            return handler.data_loader.load(handler.instruments, handler.start_time, handler.end_time)
+        path = self._path(self.RAW_DIR, key)
+        end_time = time_to_slc_point(handler.end_time)
+        entry = self._read(path)
+        if entry is not None and self._covered(entry, end_time):
+            get_module_logger(self.__class__.__name__).info(f"Raw data cache hit: {path}")
+            return self._slice_end(entry["data"], end_time)
+
+        tail_start = None if entry is None else self._tail_start(entry["data"])
+        if tail_start is None:
+            df = handler.data_loader.load(handler.instruments, handler.start_time, handler.end_time)
+        else:
+            get_module_logger(self.__class__.__name__).info(
+                f"Raw data cache hit: {path}; loading the tail from {tail_start}"
+            )
+            tail = handler.data_loader.load(handler.instruments, tail_start, handler.end_time)
+            df = pd.concat([self._head(entry["data"], tail_start), tail], axis=0)
+        self._write(path, {"end_time": end_time, "data": df})
+        return df
+
+    def load_processed(self, handler: DataHandlerLP, key: Optional[str]) -> bool:
+        """
+        Restore the fitted processors and processed data into `handler`.
+        `handler._data` is expected to be the full raw data (e.g. the result of `load_raw`).
+
+        Parameters
+        ----------
+        handler : DataHandlerLP
+            the handler to be restored.
+        key : Optional[str]
+            the key of the processed data. It should be calculated by `proc_key` before fitting the processors.
+            None indicates that the processed data can't be cached.
+
+        Returns
+        -------
+        bool:
+            if the processed data is restored successfully.
+        """
+        if not self.cache_processed or key is None:
+            return False
+        path = self._path(self.PROC_DIR, key)
+        entry = self._read(path)
+        if (
+            entry is None
+            or entry["end_time"] is not None
+            and handler.end_time is not None
+            and (time_to_slc_point(handler.end_time) < entry["end_time"])
+        ):
+            # NOTE: the processors may be fitted on the data out of the requested range. So it can't be reused.
+            return False
+        get_module_logger(self.__class__.__name__).info(f"Processed data cache hit: {path}")
+        for pname in "shared_processors", "infer_processors", "learn_processors":
+            setattr(handler, pname, entry[pname])
+
+        end_time = time_to_slc_point(handler.end_time)
+        if self._covered(entry, end_time):
+            handler._infer, handler._learn = entry["infer"], entry["learn"]
+            if handler.drop_raw:
+                del handler._data
+            return True
+
+        tail_start = self._tail_start(entry["infer"])
+        if tail_start is None:
+            handler.process_data()
+        else:
+            # only process the tail with the fitted processors
+            raw_df = handler._data
+            handler._data = raw_df[self._dt_values(raw_df) >= tail_start]
+            handler.process_data()
+            handler._infer = pd.concat([self._head(entry["infer"], tail_start), handler._infer], axis=0)
+            handler._learn = pd.concat([self._head(entry["learn"], tail_start), handler._learn], axis=0)
+            if not handler.drop_raw:
+                handler._data = raw_df
+        self.dump_processed(handler, key)
+        return True
+
+    def dump_processed(self, handler: DataHandlerLP, key: Optional[str]):
+        """Save the fitted processors and processed data of `handler`"""
+        if not self.cache_processed or key is None:
+            return
+        if not isinstance(handler._infer, pd.DataFrame) or not isinstance(handler._learn, pd.DataFrame):
+            get_module_logger(self.__class__.__name__).warning(
+                "Only the processed data in pd.DataFrame format can be cached."
+            )
+            return
+        entry = {
+            "end_time": time_to_slc_point(handler.end_time),
+            "infer": handler._infer,
+            "learn": handler._learn,
+        }
+        for pname in "shared_processors", "infer_processors", "learn_processors":
+            entry[pname] = getattr(handler, pname)
+        self._write(self._path(self.PROC_DIR, key), entry)
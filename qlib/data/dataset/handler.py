@@ -3,21 +3,28 @@
 
 # coding=utf-8
 from abc import abstractmethod
+import shutil
+import tempfile
 import warnings
+import weakref
+from pathlib import Path
 from typing import Callable, Union, Tuple, List, Iterator, Optional
 
+import numpy as np
 import pandas as pd
 
 from qlib.typehint import Literal
 from ...log import get_module_logger, TimeInspector
-from ...utils import init_instance_by_config
+from ...utils import init_instance_by_config, time_to_slc_point
 from ...utils.serial import Serializable
-from .utils import fetch_df_by_index, fetch_df_by_col
+from .utils import fetch_df_by_index, fetch_df_by_col, get_level_index, RowOffsetIndex, cast_float_dtype
 from ...utils import lazy_sort_index
 from .loader import DataLoader
+from .cache import DiskHandlerCache
 
 from . import processor as processor_module
 from . import loader as data_loader_module
+from . import cache as cache_module
 
 
 DATA_KEY_TYPE = Literal["raw", "infer", "learn"]
@@ -99,10 +106,15 @@ class DataHandler(DataHandlerABC):
 
     Tips for improving the performance of datahandler
     - Fetching data with `col_set=CS_RAW` will return the raw data and may avoid pandas from copying the data when calling `loc`
+    - If the data is sorted by <datetime, instrument>, fetching a datetime range will be a contiguous `iloc` slice
+      based on the precomputed row offsets (please refer to `RowOffsetIndex`)
     """
 
     _data: pd.DataFrame  # underlying data.
 
+    # the cached row offsets refer to the dataframes by weak references. They are only valid in the current process
+    exclude_attr = ["_row_index_cache"]
+
     def __init__(
         self,
         instruments=None,
@@ -305,8 +317,10 @@ class DataHandler(DataHandlerABC):
             if proc_func is not None:
                 # FIXME: fetching by time first will be more friendly to `proc_func`
                 # Copy in case of `proc_func` changing the data inplace....
-                data_df = proc_func(fetch_df_by_index(data_df, selector, level, fetch_orig=self.fetch_orig).copy())
+                data_df = proc_func(self._fetch_df_by_index(data_df, selector, level).copy())
                 data_df = fetch_df_by_col(data_df, col_set)
+            elif (fast_df := self._fast_fetch_df_by_index(data_df, selector, level)) is not None:
+                data_df = fetch_df_by_col(fast_df, col_set)
             else:
                 # Fetch column  first will be more friendly to SepDataFrame
                 data_df = fetch_df_by_col(data_df, col_set)
@@ -326,6 +340,56 @@ class DataHandler(DataHandlerABC):
                 data_df = data_df.reset_index(level=level, drop=True)
         return data_df
 
+    def _get_row_index(self, df: pd.DataFrame) -> Optional[RowOffsetIndex]:
+        """get the cached row offsets of `df`. None will be returned if `df` is not sorted by a 2-level index"""
+        cache = getattr(self, "_row_index_cache", None)
+        if cache is None:
+            cache = self._row_index_cache = {}
+        key = id(df)
+        df_ref, index, row_index = cache.get(key, (None, None, None))
+        if df_ref is None or df_ref() is not df or index is not df.index:
+            # the entry is removed when `df` is released. So the id can't be reused by a new dataframe with stale
+            # offsets. Checking the index object detects the index replaced in place.
+            row_index = RowOffsetIndex(df.index) if RowOffsetIndex.is_applicable(df) else None
+            cache[key] = weakref.ref(df, lambda _, key=key: cache.pop(key, None)), df.index, row_index
+        return row_index
+
+    def _fast_fetch_df_by_index(
+        self, df: pd.DataFrame, selector: Union[pd.Timestamp, slice, str, list, pd.Index], level: Union[str, int]
+    ) -> Optional[pd.DataFrame]:
+        """
+        Fetch the rows by the precomputed row offsets instead of slicing the MultiIndex by `.loc`
+
+        - a range of the first level (e.g. datetime) will be a contiguous `iloc` slice
+        - labels of the second level (e.g. instrument) will be taken by integer positions
+
+        None is returned if the fast path is not applicable.
+        """
+        if level is None or isinstance(selector, pd.MultiIndex):
+            return None
+        if isinstance(selector, slice) and selector == slice(None, None) and self.fetch_orig:
+            return df
+        row_index = self._get_row_index(df)
+        if row_index is None:
+            return None
+        level_idx = get_level_index(df, level)
+        if level_idx == 0:
+            rows = row_index.get_level0_slice(selector)
+        else:
+            rows = row_index.get_level1_rows(selector)
+        if rows is None:
+            return None
+        df = df.iloc[rows]
+        return df if self.fetch_orig else df.copy()
+
+    def _fetch_df_by_index(
+        self, df: pd.DataFrame, selector: Union[pd.Timestamp, slice, str, list, pd.Index], level: Union[str, int]
+    ) -> pd.DataFrame:
+        fast_df = self._fast_fetch_df_by_index(df, selector, level)
+        if fast_df is not None:
+            return fast_df
+        return fetch_df_by_index(df, selector, level, fetch_orig=self.fetch_orig)
+
     def get_cols(self, col_set=DataHandlerABC.CS_ALL) -> list:
         """
         get the column names
@@ -344,6 +408,26 @@ class DataHandler(DataHandlerABC):
         df = fetch_df_by_col(df, col_set)
         return df.columns.to_list()
 
+    @staticmethod
+    def _get_datetime_index(data_storage) -> pd.Index:
+        from .storage import BaseHandlerStorage  # pylint: disable=C0415
+
+        if isinstance(data_storage, BaseHandlerStorage):
+            return data_storage.get_datetime_index()
+        return data_storage.index.get_level_values(get_level_index(data_storage, "datetime")).unique()
+
+    def get_datetime_index(self, data_key: DATA_KEY_TYPE = DataHandlerABC.DK_I) -> pd.Index:
+        """
+        get the unique datetimes of the data without assembling the data of all columns
+
+        Parameters
+        ----------
+        data_key : DATA_KEY_TYPE
+            the data to fetch:  DK_*.
+        """
+        _ = data_key  # DataHandler has only one dataframe
+        return self._get_datetime_index(self._data)
+
     def get_range_selector(self, cur_date: Union[pd.Timestamp, str], periods: int) -> slice:
         """
         get range selector by number of periods
@@ -407,6 +491,7 @@ class DataHandlerLP(DataHandler):
     - To reduce the memory cost
 
         - `drop_raw=True`: this will modify the data inplace on raw data;
+        - `dtype`: store the processed data with lower precision (e.g. `dtype={"feature": "float16"}`);
 
     - Please note processed data like `self._infer` or `self._learn` are concepts different from `segments` in Qlib's `Dataset` like "train" and "test"
 
@@ -422,6 +507,9 @@ class DataHandlerLP(DataHandler):
     # map data_key to attribute name
     ATTR_MAP = {DataHandler.DK_R: "_data", DataHandler.DK_I: "_infer", DataHandler.DK_L: "_learn"}
 
+    # the temporary chunks are owned by the handler which creates them, not the dumped copies
+    exclude_attr = DataHandler.exclude_attr + ["_tmp_chunk_dir_finalizer"]
+
     # process type
     PTYPE_I = "independent"
     # - self._infer will be processed by shared_processors + infer_processors
@@ -445,6 +533,10 @@ class DataHandlerLP(DataHandler):
         shared_processors: List = [],
         process_type=PTYPE_A,
         drop_raw=False,
+        cache: Union[str, Path, dict, DiskHandlerCache, None] = None,
+        chunk_freq: Optional[str] = None,
+        chunk_dir: Union[str, Path, None] = None,
+        dtype: Union[str, dict, None] = None,
         **kwargs,
     ):
         """
@@ -488,6 +580,37 @@ class DataHandlerLP(DataHandler):
               - (e.g. self._infer processed by learn_processors )
         drop_raw: bool
             Whether to drop the raw data
+        cache: Union[str, Path, dict, DiskHandlerCache, None]
+            The disk cache of the raw data, fitted processors and processed data.
+
+            - None: disable the cache
+            - str or Path: the directory of `DiskHandlerCache`
+            - dict or DiskHandlerCache: the config or instance of the cache
+
+            Please refer to `qlib.data.dataset.cache` for more details.
+        chunk_freq: Optional[str]
+            Enable the chunked (out-of-core) mode if it is not None. It is a pandas offset alias (e.g. "QS", "MS")
+            to split [start_time, end_time] into time chunks.
+
+            - The processors are fitted on the data in their fitting range (e.g. [`fit_start_time`, `fit_end_time`]).
+              So only the data in the fitting range has to fit in the memory.
+            - Then the data is loaded and processed chunk by chunk and the processed chunks are saved on disk.
+            - `self._data`, `self._infer` and `self._learn` will be `DiskChunkedStorage` and the data will be assembled
+              lazily when fetching.
+        chunk_dir: Union[str, Path, None]
+            The directory to save the chunks in the chunked mode. A temporary directory will be used if it is None.
+            The temporary directory is removed when the handler is garbage collected or `close` is called. So the
+            handler can't be dumped with its chunked data (e.g. `dump_all=True`) unless `chunk_dir` is given.
+        dtype: Union[str, dict, None]
+            The dtype of the float columns of the processed data (i.e. `self._infer` and `self._learn`).
+            The precision of the raw data is controlled by `C["expression_dtype"]`.
+
+            - None: keep the dtype produced by the loader and processors
+            - str: e.g. "float32", "float16"
+            - dict: map the column group to dtype. e.g. `{"feature": "float16", "label": "float32"}`
+
+            The processors will never run with precision lower than float32 (e.g. the columns upcasted to float64 by
+            some processors are casted back to float32). The data is converted to float16 after all processors.
         """
 
         # Setup preprocessor
@@ -506,6 +629,16 @@ class DataHandlerLP(DataHandler):
 
         self.process_type = process_type
         self.drop_raw = drop_raw
+        if isinstance(cache, (str, Path)):
+            cache = DiskHandlerCache(cache_dir=cache)
+        elif isinstance(cache, dict):
+            cache = init_instance_by_config(cache, cache_module, accept_types=DiskHandlerCache)
+        self.cache = cache
+        if chunk_freq is not None and cache is not None:
+            raise ValueError("`cache` is not supported in the chunked mode")
+        self.chunk_freq = chunk_freq
+        self.chunk_dir = chunk_dir
+        self.dtype = dtype
         super().__init__(instruments, start_time, end_time, data_loader, **kwargs)
 
     def get_all_processors(self):
@@ -529,7 +662,11 @@ class DataHandlerLP(DataHandler):
 
     @staticmethod
     def _run_proc_l(
-        df: pd.DataFrame, proc_l: List[processor_module.Processor], with_fit: bool, check_for_infer: bool
+        df: pd.DataFrame,
+        proc_l: List[processor_module.Processor],
+        with_fit: bool,
+        check_for_infer: bool,
+        dtype: Union[str, dict, None] = None,
     ) -> pd.DataFrame:
         for proc in proc_l:
             if check_for_infer and not proc.is_for_infer():
@@ -538,6 +675,8 @@ class DataHandlerLP(DataHandler):
                 if with_fit:
                     proc.fit(df)
                 df = proc(df)
+            # avoid the processors (e.g. CSRankNorm) doubling the memory by upcasting the data to float64
+            df = cast_float_dtype(df, dtype, at_least=np.float32)
         return df
 
     @staticmethod
@@ -575,13 +714,16 @@ class DataHandlerLP(DataHandler):
         with_fit : bool
             The input of the `fit` will be the output of the previous processor
         """
+        dtype = getattr(self, "dtype", None)  # handlers pickled by older versions have no dtype
         # shared data processors
         # 1) assign
         _shared_df = self._data
         if not self._is_proc_readonly(self.shared_processors):  # avoid modifying the original data
             _shared_df = _shared_df.copy()
         # 2) process
-        _shared_df = self._run_proc_l(_shared_df, self.shared_processors, with_fit=with_fit, check_for_infer=True)
+        _shared_df = self._run_proc_l(
+            _shared_df, self.shared_processors, with_fit=with_fit, check_for_infer=True, dtype=dtype
+        )
 
         # data for inference
         # 1) assign
@@ -589,7 +731,9 @@ class DataHandlerLP(DataHandler):
         if not self._is_proc_readonly(self.infer_processors):  # avoid modifying the original data
             _infer_df = _infer_df.copy()
         # 2) process
-        _infer_df = self._run_proc_l(_infer_df, self.infer_processors, with_fit=with_fit, check_for_infer=True)
+        _infer_df = self._run_proc_l(
+            _infer_df, self.infer_processors, with_fit=with_fit, check_for_infer=True, dtype=dtype
+        )
 
         self._infer = _infer_df
 
@@ -605,9 +749,14 @@ class DataHandlerLP(DataHandler):
         if not self._is_proc_readonly(self.learn_processors):  # avoid modifying the original  data
             _learn_df = _learn_df.copy()
         # 2) process
-        _learn_df = self._run_proc_l(_learn_df, self.learn_processors, with_fit=with_fit, check_for_infer=False)
+        _learn_df = self._run_proc_l(
+            _learn_df, self.learn_processors, with_fit=with_fit, check_for_infer=False, dtype=dtype
+        )
 
-        self._learn = _learn_df
+        # the storage dtype is applied after all processors. So the learn processors still get the data of `_infer_df`
+        # with at least float32 precision
+        self._infer = cast_float_dtype(_infer_df, dtype)
+        self._learn = self._infer if _learn_df is _infer_df else cast_float_dtype(_learn_df, dtype)
 
         if self.drop_raw:
             del self._data
@@ -647,8 +796,24 @@ class DataHandlerLP(DataHandler):
                 the processed data will be saved on disk, and handler will load the cached data from the disk directly
                 when we call `init` next time
         """
-        # init raw data
-        super().setup_data(**kwargs)
+        if getattr(self, "chunk_freq", None) is not None:
+            with TimeInspector.logt("fit & process data by chunks"):
+                self._setup_data_by_chunk(init_type)
+            return
+
+        cache = getattr(self, "cache", None)  # handlers pickled by older versions have no cache
+        if cache is None:
+            # init raw data
+            super().setup_data(**kwargs)
+        else:
+            with TimeInspector.logt("Loading data"):
+                self._data = lazy_sort_index(cache.load_raw(self))
+            if init_type != DataHandlerLP.IT_LS:
+                # the key must be calculated before fitting the processors
+                proc_key = cache.proc_key(self)
+                with TimeInspector.logt("Loading processed data from cache"):
+                    if cache.load_processed(self, proc_key):
+                        return
 
         with TimeInspector.logt("fit & process data"):
             if init_type == DataHandlerLP.IT_FIT_IND:
@@ -661,7 +826,108 @@ class DataHandlerLP(DataHandler):
             else:
                 raise NotImplementedError(f"This type of input is not supported")
 
-        # TODO: Be able to cache handler data. Save the memory for data processing
+        if cache is not None and init_type != DataHandlerLP.IT_LS:
+            cache.dump_processed(self, proc_key)
+
+    def _get_fit_range(self) -> Tuple[Optional[pd.Timestamp], Optional[pd.Timestamp]]:
+        """
+        Get the time range of the data which is required to fit the processors.
+        If no processor has fitting range, the range of the first chunk is returned.
+        """
+        start_l, end_l = [], []
+        for proc in self.get_all_processors():
+            if hasattr(proc, "fit_start_time") and hasattr(proc, "fit_end_time"):
+                start_l.append(time_to_slc_point(proc.fit_start_time))
+                end_l.append(time_to_slc_point(proc.fit_end_time))
+        if len(start_l) == 0:
+            return self._get_chunk_ranges()[0]
+        start = None if None in start_l else min(start_l)
+        end = None if None in end_l else max(end_l)
+        # the fitting data is limited by the range of the handler
+        data_start, data_end = time_to_slc_point(self.start_time), time_to_slc_point(self.end_time)
+        if data_start is not None:
+            start = data_start if start is None else max(start, data_start)
+        if data_end is not None:
+            end = data_end if end is None else min(end, data_end)
+        return start, end
+
+    def _get_chunk_ranges(self) -> List[Tuple[pd.Timestamp, Optional[pd.Timestamp]]]:
+        """split [start_time, end_time] into chunks by `chunk_freq`"""
+        start, end = time_to_slc_point(self.start_time), time_to_slc_point(self.end_time)
+        if start is None:
+            raise ValueError("`start_time` is required in the chunked mode")
+        # None indicates loading the latest data; today is only used to generate the boundaries
+        bounds = pd.date_range(start, pd.Timestamp.today() if end is None else end, freq=self.chunk_freq)
+        bounds = [start] + [b for b in bounds if b > start]
+        ranges = [(s, e - pd.Timedelta(1, unit="ns")) for s, e in zip(bounds[:-1], bounds[1:])]
+        ranges.append((bounds[-1], end))
+        return ranges
+
+    def _make_tmp_chunk_dir(self) -> Path:
+        """create a temporary directory for the chunks. It is removed when the handler is garbage collected"""
+        self.close()
+        chunk_dir = Path(tempfile.mkdtemp(prefix="qlib_chunk_"))
+        self._tmp_chunk_dir_finalizer = weakref.finalize(self, shutil.rmtree, str(chunk_dir), ignore_errors=True)
+        return chunk_dir
+
+    def __getstate__(self) -> dict:
+        from .storage import DiskChunkedStorage  # pylint: disable=C0415
+
+        state = super().__getstate__()
+        if self.chunk_freq is not None and self.chunk_dir is None:
+            if any(isinstance(v, DiskChunkedStorage) for v in state.values()):
+                raise ValueError(
+                    "The chunks are saved in a temporary directory which is removed with the handler. "
+                    "Please set `chunk_dir` to dump the chunked data."
+                )
+        return state
+
+    def close(self):
+        """remove the temporary directory of the chunks (if any). The chunked data can't be fetched after closing"""
+        finalizer = getattr(self, "_tmp_chunk_dir_finalizer", None)
+        if finalizer is not None:
+            finalizer()
+            self._tmp_chunk_dir_finalizer = None
+
+    def _setup_data_by_chunk(self, init_type: str):
+        from .storage import DiskChunkedStorage  # pylint: disable=C0415
+
+        if init_type != DataHandlerLP.IT_LS:
+            fit_start, fit_end = self._get_fit_range()
+            with TimeInspector.logt("Loading data for fitting"):
+                self._data = lazy_sort_index(self.data_loader.load(self.instruments, fit_start, fit_end))
+            if init_type == DataHandlerLP.IT_FIT_IND:
+                self.fit()
+            elif init_type == DataHandlerLP.IT_FIT_SEQ:
+                self.fit_process_data()
+            else:
+                raise NotImplementedError(f"This type of input is not supported")
+            self._data = self._infer = self._learn = None  # release the memory
+
+        if self.chunk_dir is None:
+            chunk_dir = self._make_tmp_chunk_dir()
+        else:
+            chunk_dir = Path(self.chunk_dir).expanduser()
+        storages = {key: DiskChunkedStorage(chunk_dir, prefix=key) for key in self.ATTR_MAP}
+        for start, end in self._get_chunk_ranges():
+            with TimeInspector.logt(f"Loading & processing chunk [{start}, {end}]"):
+                self._data = lazy_sort_index(self.data_loader.load(self.instruments, start, end))
+                if self._data.empty:
+                    continue
+                raw_df = self._data
+                self.process_data()
+            # only one chunk is kept in memory
+            for key, df in ((self.DK_R, raw_df), (self.DK_I, self._infer), (self.DK_L, self._learn)):
+                if not isinstance(df, pd.DataFrame):
+                    raise TypeError(f"Only pd.DataFrame is supported in the chunked mode, not {type(df)}")
+                if key != self.DK_R or not self.drop_raw:
+                    storages[key].append(df)
+            self._data = self._infer = self._learn = raw_df = None
+
+        for key, attr in self.ATTR_MAP.items():
+            setattr(self, attr, storages[key])
+        if self.drop_raw:
+            del self._data
 
     def _get_df_by_key(self, data_key: DATA_KEY_TYPE = DataHandlerABC.DK_I) -> pd.DataFrame:
         if data_key == self.DK_R and self.drop_raw:
@@ -730,6 +996,9 @@ class DataHandlerLP(DataHandler):
         df = fetch_df_by_col(df, col_set)
         return df.columns.to_list()
 
+    def get_datetime_index(self, data_key: DATA_KEY_TYPE = DataHandlerABC.DK_I) -> pd.Index:
+        return self._get_datetime_index(self._get_df_by_key(data_key))
+
     @classmethod
     def cast(cls, handler: "DataHandlerLP") -> "DataHandlerLP":
         """
@@ -199,6 +199,56 @@ class QlibDataLoader(DLWParser):
                     self.inst_processors
                 ), f"freq(={self.freq}), inst_processors(={self.inst_processors}) cannot be None/empty"
 
+    def _get_group_freq(self, gp_name: str = None) -> str:
+        return self.freq[gp_name] if isinstance(self.freq, dict) else self.freq
+
+    def _get_group_inst_processors(self, gp_name: str = None) -> list:
+        if isinstance(self.inst_processors, list):
+            return self.inst_processors
+        return self.inst_processors.get(gp_name, [])
+
+    def load(self, instruments=None, start_time=None, end_time=None) -> pd.DataFrame:
+        if not self.is_group:
+            return super().load(instruments, start_time, end_time)
+
+        # The groups sharing the same `freq` and `inst_processors` are loaded by a single call of `D.features`.
+        # So the raw `$` features and the sub-expressions shared by the groups (e.g. feature and label) are read and
+        # calculated only once, and the groups are aligned naturally without joining.
+        buckets = []  # [(freq, inst_processors, [group name, ...]), ...]
+        for grp in self.fields:
+            freq, inst_processors = self._get_group_freq(grp), self._get_group_inst_processors(grp)
+            for b_freq, b_inst_processors, b_grps in buckets:
+                if b_freq == freq and b_inst_processors == inst_processors:
+                    b_grps.append(grp)
+                    break
+            else:
+                buckets.append((freq, inst_processors, [grp]))
+
+        df_l = []
+        for _, _, grps in buckets:
+            exprs = list(dict.fromkeys(expr for grp in grps for expr in self.fields[grp][0]))
+            df = self.load_group_df(instruments, exprs, exprs, start_time, end_time, grps[0])
+            expr_loc = {expr: i for i, expr in enumerate(exprs)}
+            col_pos, col_names = [], []
+            for grp in grps:
+                g_exprs, g_names = self.fields[grp]
+                col_pos.extend(expr_loc[expr] for expr in g_exprs)
+                col_names.extend((grp, name) for name in g_names)
+            if col_pos != list(range(len(exprs))):
+                # some expressions are shared by the groups
+                df = df.iloc[:, col_pos]
+            df.columns = pd.MultiIndex.from_tuples(col_names)
+            df_l.append(df)
+
+        if len(df_l) == 1:
+            df = df_l[0]
+        else:
+            df = pd.concat(df_l, axis=1)
+        if len(buckets) > 1:
+            # keep the order of the groups in the config
+            df = df.loc[:, list(self.fields)]
+        return df
+
     def load_group_df(
         self,
         instruments,
@@ -216,10 +266,8 @@ class QlibDataLoader(DLWParser):
         elif self.filter_pipe is not None:
             warnings.warn("`filter_pipe` is not None, but it will not be used with `instruments` as list")
 
-        freq = self.freq[gp_name] if isinstance(self.freq, dict) else self.freq
-        inst_processors = (
-            self.inst_processors if isinstance(self.inst_processors, list) else self.inst_processors.get(gp_name, [])
-        )
+        freq = self._get_group_freq(gp_name)
+        inst_processors = self._get_group_inst_processors(gp_name)
         df = D.features(instruments, exprs, start_time, end_time, freq=freq, inst_processors=inst_processors)
         df.columns = names
         if self.swap_level:
@@ -327,7 +375,7 @@ class NestedDataLoader(DataLoader):
         self.join = join
 
     def load(self, instruments=None, start_time=None, end_time=None) -> pd.DataFrame:
-        df_full = None
+        df_l = []
         for dl in self.data_loader_l:
             try:
                 df_current = dl.load(instruments, start_time, end_time)
@@ -336,14 +384,24 @@ class NestedDataLoader(DataLoader):
                     "If the value of `instruments` cannot be processed, it will set instruments to None to get all the data."
                 )
                 df_current = dl.load(instruments=None, start_time=start_time, end_time=end_time)
-            if df_full is None:
-                df_full = df_current
-            else:
-                current_columns = df_current.columns.tolist()
-                full_columns = df_full.columns.tolist()
-                columns_to_drop = [col for col in current_columns if col in full_columns]
-                df_full.drop(columns=columns_to_drop, inplace=True)
-                df_full = pd.merge(df_full, df_current, left_index=True, right_index=True, how=self.join)
+            df_l.append(df_current)
+
+        # the duplicated columns of the latter loaders will overwrite the former ones
+        seen_columns = set()
+        for i in range(len(df_l) - 1, -1, -1):
+            columns = df_l[i].columns
+            dup_mask = columns.isin(list(seen_columns))
+            if dup_mask.any():
+                df_l[i] = df_l[i].loc[:, ~dup_mask]
+            seen_columns.update(columns)
+
+        # Align the data by the index instead of merging them one by one
+        if self.join in ("left", "right"):
+            index = df_l[0].index if self.join == "left" else df_l[-1].index
+            df_l = [df if df.index.equals(index) else df.reindex(index) for df in df_l]
+            df_full = pd.concat(df_l, axis=1)
+        else:
+            df_full = pd.concat(df_l, axis=1, join=self.join)
         return df_full.sort_index(axis=1)
 
 
@@ -1,10 +1,12 @@
 from abc import abstractmethod
+from pathlib import Path
 import pandas as pd
 import numpy as np
 
 from .handler import DataHandler
 from typing import Union, List
 from qlib.log import get_module_logger
+from qlib.utils import time_to_slc_point
 
 from .utils import get_level_index, fetch_df_by_index, fetch_df_by_col
 
@@ -50,6 +52,11 @@ class BaseHandlerStorage:
         """
         raise NotImplementedError("fetch is method not implemented!")
 
+    def get_datetime_index(self) -> pd.Index:
+        """get the unique datetimes of the data in the storage"""
+        df = self.fetch(col_set=DataHandler.CS_RAW)
+        return df.index.get_level_values(get_level_index(df, "datetime")).unique()
+
 
 class NaiveDFStorage(BaseHandlerStorage):
     """Naive data storage for datahandler
@@ -189,3 +196,92 @@ class HashingStockStorage(BaseHandlerStorage):
             return fetch_stock_df_list[0]
         else:
             return pd.concat(fetch_stock_df_list, sort=False, copy=~fetch_orig)
+
+
+class DiskChunkedStorage(BaseHandlerStorage):
+    """Data storage for datahandler which keeps the data in time chunks on disk
+    - It is designed for the data larger than RAM. Each chunk is a pd.DataFrame saved in a separate file.
+    - Only the chunks overlapping with the queried datetime range will be loaded by the `fetch` method.
+      So the data will be assembled lazily and only the queried part has to fit in the memory.
+    """
+
+    def __init__(self, chunk_dir: Union[str, Path], prefix: str = "chunk"):
+        """
+        Parameters
+        ----------
+        chunk_dir : Union[str, Path]
+            the directory to save the chunks
+        prefix : str
+            the prefix of the file names of the chunks
+        """
+        self.chunk_dir = Path(chunk_dir)
+        self.prefix = prefix
+        self.chunk_paths = []
+        self.chunk_datetimes = []  # the sorted unique datetimes of each chunk
+        self.template = None  # an empty DataFrame with the same columns and index names as the chunks
+
+    def append(self, df: pd.DataFrame):
+        """dump `df` as a new chunk. The chunks should be appended in chronological order"""
+        if df.empty:
+            return
+        if self.template is None:
+            self.template = df.iloc[:0]
+        self.chunk_dir.mkdir(parents=True, exist_ok=True)
+        path = self.chunk_dir.joinpath(f"{self.prefix}_{len(self.chunk_paths):05d}.pkl")
+        df.to_pickle(path)
+        self.chunk_paths.append(path)
+        self.chunk_datetimes.append(df.index.get_level_values(get_level_index(df, "datetime")).unique().sort_values())
+
+    def get_datetime_index(self) -> pd.Index:
+        if len(self.chunk_datetimes) == 0:
+            return pd.DatetimeIndex([], name="datetime")
+        return self.chunk_datetimes[0].append(self.chunk_datetimes[1:]).unique()
+
+    def head(self, n: int = 5) -> pd.DataFrame:
+        if len(self.chunk_paths) == 0:
+            return pd.DataFrame()
+        return pd.read_pickle(self.chunk_paths[0]).head(n)
+
+    def _select_chunks(self, selector, level) -> List[int]:
+        """select the chunks which may contain the data of `selector`"""
+        chunk_ids = list(range(len(self.chunk_paths)))
+        if (
+            len(chunk_ids) == 0
+            or level is None
+            or level not in ("datetime", get_level_index(self.template, "datetime"))
+        ):
+            return chunk_ids
+        if isinstance(selector, slice):
+            start, end = time_to_slc_point(selector.start), time_to_slc_point(selector.stop)
+        elif isinstance(selector, pd.Timestamp):
+            start = end = selector
+        elif isinstance(selector, str):
+            # partial string indexing like "2020-01" may select a range
+            period = pd.Period(selector)
+            start, end = period.start_time, period.end_time
+        else:
+            return chunk_ids
+        return [
+            i
+            for i in chunk_ids
+            if (start is None or self.chunk_datetimes[i][-1] >= start)
+            and (end is None or self.chunk_datetimes[i][0] <= end)
+        ]
+
+    def fetch(
+        self,
+        selector: Union[pd.Timestamp, slice, str, pd.Index] = slice(None, None),
+        level: Union[str, int] = "datetime",
+        col_set: Union[str, List[str]] = DataHandler.CS_ALL,
+        fetch_orig: bool = True,
+    ) -> pd.DataFrame:
+        df_list = []
+        for i in self._select_chunks(selector, level):
+            df = fetch_df_by_col(pd.read_pickle(self.chunk_paths[i]), col_set)
+            df_list.append(fetch_df_by_index(df, selector, level, fetch_orig=fetch_orig))
+        if len(df_list) == 0:
+            return pd.DataFrame() if self.template is None else fetch_df_by_col(self.template, col_set)
+        elif len(df_list) == 1:
+            return df_list[0]
+        else:
+            return pd.concat(df_list, sort=False)
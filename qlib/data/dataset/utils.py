@@ -1,8 +1,9 @@
 # Copyright (c) Microsoft Corporation.
 # Licensed under the MIT License.
 from __future__ import annotations
+import numpy as np
 import pandas as pd
-from typing import Union, List, TYPE_CHECKING
+from typing import Union, List, Optional, TYPE_CHECKING
 from qlib.utils import init_instance_by_config
 
 if TYPE_CHECKING:
@@ -78,6 +79,89 @@ def fetch_df_by_index(
         return df.loc[pd.IndexSlice[idx_slc],]  # noqa: E231
 
 
+class RowOffsetIndex:
+    """
+    Precomputed row offsets of a DataFrame with a sorted 2-level MultiIndex (e.g. <datetime, instrument>).
+
+    Motivation:
+    - Slicing a large MultiIndex by `.loc` is slow. But the rows are sorted by the first level.
+      So the rows of a range of the first level (e.g. a datetime range) are contiguous and can be fetched by `iloc`.
+    - The rows of the second level (e.g. an instrument) are scattered. They are grouped once (like
+      `HashingStockStorage`) and fetched by integer positions afterwards.
+
+    The methods return None if the selector is not supported and the caller should fall back to `.loc`.
+    """
+
+    def __init__(self, index: pd.MultiIndex):
+        self.n_rows = len(index)
+        self.names = list(index.names)
+        codes = index.codes[0]
+        starts = np.concatenate([[0], np.flatnonzero(np.diff(codes)) + 1]) if len(codes) > 0 else np.array([], int)
+        # the unique values of the first level and the offsets of their first rows
+        self.values = index.levels[0][codes[starts]]
+        self.offsets = np.append(starts, len(codes))
+        self.is_datetime = isinstance(self.values, pd.DatetimeIndex)
+        self._levels1 = index.levels[1]
+        self._codes1 = index.codes[1]
+        self._rows1 = None  # rows grouped by the second level, it is created lazily
+
+    @staticmethod
+    def is_applicable(df: pd.DataFrame) -> bool:
+        idx = df.index
+        return (
+            isinstance(idx, pd.MultiIndex)
+            and idx.nlevels == 2
+            and idx.levels[0].is_monotonic_increasing
+            and idx.is_monotonic_increasing
+        )
+
+    def _point(self, point, end: bool):
+        if point is None:
+            return None
+        if self.is_datetime:
+            if isinstance(point, str):
+                # partial string indexing, e.g. "2020-01" selects the whole month
+                period = pd.Period(point)
+                return period.end_time if end else period.start_time
+            return pd.Timestamp(point)
+        return point
+
+    def get_level0_slice(self, selector) -> Optional[slice]:
+        """get the row slice of `selector` on the first level"""
+        try:
+            if isinstance(selector, slice):
+                if selector.step is not None:
+                    return None
+                start, end = self._point(selector.start, False), self._point(selector.stop, True)
+            elif isinstance(selector, (str, pd.Timestamp)):
+                start, end = self._point(selector, False), self._point(selector, True)
+            else:
+                return None
+            i = 0 if start is None else self.values.searchsorted(start, side="left")
+            j = len(self.values) if end is None else self.values.searchsorted(end, side="right")
+        except (ValueError, TypeError):
+            return None
+        return slice(self.offsets[i], self.offsets[max(i, j)])
+
+    def get_level1_rows(self, selector) -> Optional[np.ndarray]:
+        """get the row positions of `selector` (a label or list of labels) on the second level"""
+        if isinstance(selector, str):
+            selector = [selector]
+        elif not isinstance(selector, (list, pd.Index, np.ndarray)):
+            return None
+        if self._rows1 is None:
+            order = np.argsort(self._codes1, kind="stable")
+            bounds = np.searchsorted(self._codes1[order], np.arange(len(self._levels1) + 1))
+            self._rows1 = order, bounds
+        order, bounds = self._rows1
+        codes = self._levels1.get_indexer(selector)
+        if len(codes) == 0 or (codes < 0).any() or len(np.unique(codes)) < len(codes):
+            # leave the missing or duplicated labels to pandas
+            return None
+        # the same order as `.loc`: grouped by the labels in the order of `selector`
+        return np.concatenate([order[bounds[c] : bounds[c + 1]] for c in codes])
+
+
 def fetch_df_by_col(df: pd.DataFrame, col_set: Union[str, List[str]]) -> pd.DataFrame:
     from .handler import DataHandler  # pylint: disable=C0415
 
@@ -89,6 +173,49 @@ def fetch_df_by_col(df: pd.DataFrame, col_set: Union[str, List[str]]) -> pd.Data
         return df.loc(axis=1)[col_set]
 
 
+def cast_float_dtype(df: pd.DataFrame, dtype: Union[str, np.dtype, dict, None], at_least=None) -> pd.DataFrame:
+    """
+    Cast the float columns of `df` to `dtype`. Other columns (e.g. the bool or int ones) are kept unchanged.
+
+    Parameters
+    ----------
+    df : pd.DataFrame
+        data
+    dtype : Union[str, np.dtype, dict, None]
+        - str or np.dtype: the dtype of all the float columns
+        - dict: map the column group (i.e. the first level of the columns, e.g. "feature", "label") to dtype.
+          The groups not in the dict are kept unchanged.
+        - None: return `df` directly
+    at_least :
+        the dtype will be promoted to at least `at_least` (e.g. keep float32 when `dtype` is float16)
+
+    Returns
+    -------
+    pd.DataFrame:
+        `df` itself is returned if nothing is changed. Otherwise, a new DataFrame will be returned.
+    """
+    if dtype is None or not isinstance(df, pd.DataFrame):
+        return df
+    mapping = {}
+    for col, col_dtype in df.dtypes.items():
+        if not pd.api.types.is_float_dtype(col_dtype):
+            continue
+        if isinstance(dtype, dict):
+            group = col[0] if isinstance(col, tuple) else col
+            if group not in dtype:
+                continue
+            target = np.dtype(dtype[group])
+        else:
+            target = np.dtype(dtype)
+        if at_least is not None:
+            target = np.promote_types(target, at_least)
+        if target != col_dtype:
+            mapping[col] = target
+    if len(mapping) == 0:
+        return df
+    return df.astype(mapping)
+
+
 def convert_index_format(df: Union[pd.DataFrame, pd.Series], level: str = "datetime") -> Union[pd.DataFrame, pd.Series]:
     """
     Convert the format of df.MultiIndex according to the following rules:
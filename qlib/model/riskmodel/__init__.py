@@ -5,6 +5,7 @@ from .base import RiskModel
 from .poet import POETCovEstimator
 from .shrink import ShrinkCovEstimator
 from .structured import StructuredCovEstimator
+from .store import RiskDataStore
 
 
 __all__ = [
@@ -12,4 +13,5 @@ __all__ = [
     "POETCovEstimator",
     "ShrinkCovEstimator",
     "StructuredCovEstimator",
+    "RiskDataStore",
 ]
@@ -4,9 +4,11 @@
 import inspect
 import numpy as np
 import pandas as pd
-from typing import Union
+from pathlib import Path
+from typing import Any, Iterator, Optional, Tuple, Union
 
 from qlib.model.base import BaseModel
+from .store import RiskDataStore
 
 
 class RiskModel(BaseModel):
@@ -37,6 +39,9 @@ class RiskModel(BaseModel):
         self.assume_centered = assume_centered
         self.scale_return = scale_return
 
+        # the states kept across the dates of the rolling estimation
+        self._rolling_state = {}
+
     def predict(
         self,
         X: Union[pd.Series, pd.DataFrame, np.ndarray],
@@ -60,19 +65,7 @@ class RiskModel(BaseModel):
         ), "Can only return either correlation matrix or decomposed components."
 
         # transform input into 2D array
-        if not isinstance(X, (pd.Series, pd.DataFrame)):
-            columns = None
-        else:
-            if isinstance(X.index, pd.MultiIndex):
-                if isinstance(X, pd.DataFrame):
-                    X = X.iloc[:, 0].unstack(level="instrument")  # always use the first column
-                else:
-                    X = X.unstack(level="instrument")
-            else:
-                # X is 2D DataFrame
-                pass
-            columns = X.columns  # will be used to restore dataframe
-            X = X.values
+        X, _, columns = self._to_2d_array(X)
 
         # calculate pct_change
         if is_price:
@@ -97,18 +90,92 @@ class RiskModel(BaseModel):
         # estimate covariance
         S = self._predict(X)
 
-        # return correlation if needed
-        if return_corr:
-            vola = np.sqrt(np.diag(S))
-            corr = S / np.outer(vola, vola)
-            if columns is None:
-                return corr
-            return pd.DataFrame(corr, index=columns, columns=columns)
+        return self._format_cov(S, columns, return_corr)
 
-        # return covariance
-        if columns is None:
-            return S
-        return pd.DataFrame(S, index=columns, columns=columns)
+    def predict_rolling(
+        self,
+        X: Union[pd.Series, pd.DataFrame, np.ndarray],
+        window: int,
+        min_periods: Optional[int] = None,
+        step: int = 1,
+        return_corr: bool = False,
+        is_price: bool = True,
+        return_decomposed_components=False,
+    ) -> Iterator[Tuple[Any, Union[pd.DataFrame, np.ndarray, tuple]]]:
+        """estimate the covariance on each date with the observations of a rolling window in one pass
+
+        The estimation of a date is the same as calling `predict` with the latest `window` observations (returns) up
+        to the date. Instead of re-estimating from the whole window on each date, the sufficient statistics (sums and
+        cross-products) of the window are updated incrementally as the window slides, so the sample covariance of a
+        date costs O(N^2) rather than O(window * N^2). The risk models reuse the sample covariance in
+        `_predict_rolling` when they can, and fall back to `_predict` on the window otherwise.
+
+        Args:
+            X (pd.Series, pd.DataFrame or np.ndarray): same as `predict`, the observations of all the dates.
+            window (int): the number of observations used to estimate the covariance of a date.
+            min_periods (int): the minimum number of observations to estimate the covariance, default to `window`.
+            step (int): estimate the covariance every `step` dates.
+            return_corr (bool): whether return the correlation matrix.
+            is_price (bool): whether `X` contains price (if not assume stock returns).
+            return_decomposed_components (bool): whether return decomposed components of the covariance matrix.
+
+        Yields:
+            tuple: the date (or the row number for np.ndarray) and the estimation of the date like `predict`.
+        """
+        assert (
+            not return_corr or not return_decomposed_components
+        ), "Can only return either correlation matrix or decomposed components."
+
+        X, index, columns = self._get_returns(X, is_price)
+        for t, S in self._iter_rolling(X, window, min_periods, step, return_decomposed_components):
+            date = t if index is None else index[t]
+            if return_decomposed_components:
+                yield date, S
+            else:
+                yield date, self._format_cov(S, columns, return_corr)
+
+    def dump_rolling(
+        self,
+        X: Union[pd.Series, pd.DataFrame],
+        path: Union[str, Path],
+        window: int,
+        min_periods: Optional[int] = None,
+        step: int = 1,
+        is_price: bool = True,
+        dtype: np.dtype = np.float32,
+    ) -> RiskDataStore:
+        """estimate the decomposed covariance on each date by `predict_rolling` and persist it into a `RiskDataStore`
+
+        The store can be used as the `riskmodel_root` of `EnhancedIndexingStrategy`. The universe of a date consists
+        of the instruments with observations on the date, and their specific risk is the square root of `var_u`.
+
+        Args:
+            X (pd.Series or pd.DataFrame): the observations of all the dates, with instruments as columns.
+            path (str): the directory of the store.
+            window, min_periods, step, is_price: see `predict_rolling`.
+            dtype (np.dtype): the dtype of the risk data.
+
+        Returns:
+            RiskDataStore: the store (opened for writing).
+        """
+        X, index, columns = self._get_returns(X, is_price)
+        assert index is not None, "the dates and instruments are required by the store"
+        store = None
+        for t, (F, cov_b, var_u) in self._iter_rolling(X, window, min_periods, step, True):
+            if store is None:
+                dates = index[self._get_rolling_start(len(X), window, min_periods) :: step]
+                store = RiskDataStore.create(path, dates, columns, F.shape[1], dtype=dtype)
+            valid = ~np.isnan(X[t])
+            store.write(
+                index[t],
+                pd.DataFrame(F[valid], index=columns[valid]),
+                cov_b,
+                pd.Series(np.sqrt(var_u[valid]), index=columns[valid]),
+            )
+        if store is None:
+            raise ValueError("there are not enough observations to estimate the risk data")
+        store.flush()
+        return store
 
     def _predict(self, X: np.ndarray) -> np.ndarray:
         """covariance estimation implementation
@@ -130,6 +197,95 @@ class RiskModel(BaseModel):
             N = M.T.dot(M)  # each pair has distinct number of samples
         return xTx / N
 
+    def _predict_rolling(
+        self, X: np.ndarray, S: np.ndarray, return_decomposed_components=False
+    ) -> Union[np.ndarray, tuple]:
+        """covariance estimation implementation of a rolling window
+
+        By default, the empirical covariance `S` is returned by the models which don't override `_predict` and the
+        other models are re-estimated by `_predict`. Child classes can override this method to reuse `S`.
+
+        Args:
+            X (np.ndarray): preprocessed data matrix of the window.
+            S (np.ndarray): empirical covariance matrix of the window, which is maintained incrementally.
+            return_decomposed_components (bool): whether return decomposed components of the covariance matrix.
+
+        Returns:
+            tuple or np.ndarray: decomposed covariance matrix or covariance matrix.
+        """
+        if type(self)._predict is RiskModel._predict:
+            return S
+        if return_decomposed_components:
+            return self._predict(X, return_decomposed_components=True)  # pylint: disable=E1123
+        return self._predict(X)
+
+    def _iter_rolling(
+        self, X: np.ndarray, window: int, min_periods: Optional[int], step: int, return_decomposed_components: bool
+    ) -> Iterator[Tuple[int, Union[np.ndarray, tuple]]]:
+        if return_decomposed_components:
+            assert (
+                "return_decomposed_components" in inspect.getfullargspec(self._predict).args
+            ), "This risk model does not support return decomposed components of the covariance matrix "
+
+        self._rolling_state = {}
+        stats = _WindowStats(X, self.nan_option, self.assume_centered)
+        for t in range(self._get_rolling_start(len(X), window, min_periods), len(X), step):
+            stats.update(max(0, t + 1 - window), t + 1)
+            yield t, self._predict_rolling(
+                self._preprocess(X[stats.start : stats.end]),
+                stats.get_cov(),
+                return_decomposed_components=return_decomposed_components,
+            )
+
+    @staticmethod
+    def _get_rolling_start(n: int, window: int, min_periods: Optional[int]) -> int:
+        """the row of the first estimation"""
+        min_periods = window if min_periods is None else min_periods
+        assert 0 < min_periods <= window, "`min_periods` should be between (0, window]"
+        return min_periods - 1
+
+    def _get_returns(
+        self, X: Union[pd.Series, pd.DataFrame, np.ndarray], is_price: bool
+    ) -> Tuple[np.ndarray, Optional[pd.Index], Optional[pd.Index]]:
+        """get the (scaled) returns of all the dates for the rolling estimation"""
+        X, index, columns = self._to_2d_array(X)
+        X = np.asarray(X, dtype=np.float64)
+        if is_price:
+            X = X[1:] / X[:-1] - 1
+            index = None if index is None else index[1:]
+        if self.scale_return:
+            X = X * 100
+        return X, index, columns
+
+    @staticmethod
+    def _to_2d_array(
+        X: Union[pd.Series, pd.DataFrame, np.ndarray]
+    ) -> Tuple[np.ndarray, Optional[pd.Index], Optional[pd.Index]]:
+        """transform input into 2D array, and return the index (dates) and columns (instruments) if available"""
+        if not isinstance(X, (pd.Series, pd.DataFrame)):
+            return X, None, None
+        if isinstance(X.index, pd.MultiIndex):
+            if isinstance(X, pd.DataFrame):
+                X = X.iloc[:, 0].unstack(level="instrument")  # always use the first column
+            else:
+                X = X.unstack(level="instrument")
+        else:
+            # X is 2D DataFrame
+            pass
+        return X.values, X.index, X.columns  # columns will be used to restore dataframe
+
+    @staticmethod
+    def _format_cov(S: np.ndarray, columns: Optional[pd.Index], return_corr: bool) -> Union[pd.DataFrame, np.ndarray]:
+        # return correlation if needed
+        if return_corr:
+            vola = np.sqrt(np.diag(S))
+            S = S / np.outer(vola, vola)
+
+        # return covariance
+        if columns is None:
+            return S
+        return pd.DataFrame(S, index=columns, columns=columns)
+
     def _preprocess(self, X: np.ndarray) -> Union[np.ndarray, np.ma.MaskedArray]:
         """handle nan and centerize data
 
@@ -145,3 +301,73 @@ class RiskModel(BaseModel):
         if not self.assume_centered:
             X = X - np.nanmean(X, axis=0)
         return X
+
+
+class _WindowStats:
+    """the sufficient statistics of the observations `X[start:end]` in a sliding window
+
+    The statistics are updated by adding the observations entering the window and subtracting the ones leaving it,
+    and are recomputed from the window once the number of the updated observations reaches the window size to bound
+    the accumulation of the floating point errors.
+    """
+
+    def __init__(self, X: np.ndarray, nan_option: str, assume_centered: bool):
+        self.valid = ~np.isnan(X)
+        self.X = np.where(self.valid, X, 0.0)
+        self.V = self.valid.astype(np.float64)
+        self.nan_option = nan_option
+        self.assume_centered = assume_centered
+        self.start = self.end = 0
+        self._reset(0, 0)
+
+    def _reset(self, start: int, end: int):
+        X, V = self.X[start:end], self.V[start:end]
+        self.sum = X.sum(axis=0)
+        self.count = V.sum(axis=0)
+        self.xTx = X.T @ X
+        if self.nan_option == RiskModel.MASK_NAN:
+            # each pair has distinct samples
+            self.xTv = X.T @ V
+            self.vTv = V.T @ V
+        self.start, self.end = start, end
+        self._num_updated = 0
+
+    def update(self, start: int, end: int):
+        """slide the window to `X[start:end]`"""
+        rows = np.r_[self.end : end, self.start : start]
+        if self._num_updated + len(rows) >= end - start:
+            self._reset(start, end)
+            return
+        sign = np.r_[np.ones(end - self.end), -np.ones(start - self.start)]
+        X, V = self.X[rows], self.V[rows]
+        sX = X * sign[:, None]
+        self.sum += sX.sum(axis=0)
+        self.count += V.T @ sign
+        self.xTx += sX.T @ X
+        if self.nan_option == RiskModel.MASK_NAN:
+            self.xTv += sX.T @ V
+            self.vTv += (V * sign[:, None]).T @ V
+        self.start, self.end = start, end
+        self._num_updated += len(rows)
+
+    def get_cov(self) -> np.ndarray:
+        """the empirical covariance like `RiskModel._predict` on the preprocessed window"""
+        n = self.end - self.start
+        with np.errstate(divide="ignore", invalid="ignore"):
+            if self.nan_option == RiskModel.FILL_NAN:
+                mean = self.sum / n
+            else:
+                mean = self.sum / self.count
+            if self.assume_centered:
+                mean = np.zeros_like(mean)
+
+            if self.nan_option == RiskModel.MASK_NAN:
+                xTx = self.xTx - self.xTv * mean - self.xTv.T * mean[:, None] + self.vTv * np.outer(mean, mean)
+                return xTx / self.vTv
+
+            S = self.xTx / n - np.outer(mean, mean)
+            if self.nan_option == RiskModel.IGNORE_NAN:
+                missing = self.count < n
+                S[missing] = np.nan
+                S[:, missing] = np.nan
+            return S
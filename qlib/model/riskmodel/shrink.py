@@ -88,6 +88,14 @@ class ShrinkCovEstimator(RiskModel):
         # sample covariance
         S = super()._predict(X)
 
+        return self._shrink(X, S)
+
+    def _predict_rolling(self, X: np.ndarray, S: np.ndarray, return_decomposed_components=False) -> np.ndarray:
+        # reuse the sample covariance maintained by the rolling window
+        return self._shrink(X, S.copy())
+
+    def _shrink(self, X: np.ndarray, S: np.ndarray) -> np.ndarray:
+        """shrink the sample covariance `S` (inplace)"""
         # shrinking target
         F = self._get_shrink_target(X, S)
 
@@ -193,7 +201,8 @@ class ShrinkCovEstimator(RiskModel):
         t, n = X.shape
 
         y = X**2
-        phi = np.sum(y.T.dot(y) / t - S**2)
+        # NOTE: sum(y.T.dot(y)) equals the sum of the squared row sums of `y`
+        phi = np.sum(np.sum(y, axis=1) ** 2) / t - np.sum(S**2)
 
         gamma = np.linalg.norm(S - F, "fro") ** 2
 
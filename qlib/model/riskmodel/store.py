@@ -0,0 +1,232 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License.
+
+import json
+import os
+from pathlib import Path
+from typing import Iterable, List, Optional, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+from qlib.log import get_module_logger
+from qlib.utils import load_dataset
+
+
+logger = get_module_logger("RiskDataStore")
+
+
+class RiskDataStore:
+    """Binary store of the daily risk data of all the dates
+
+    Each field of the risk data is kept in one `.npy` file for all the dates, which is memory-mapped when reading.
+    So loading the risk data of a date is a slice of the files instead of reading the files of the date.
+
+    The layout of the store:
+
+    .. code-block:: text
+
+        ├── /path/to/store
+        ├──── meta.json           # the dates, instruments and factors
+        ├──── factor_exp.npy      # <date, instrument, factor>
+        ├──── factor_cov.npy      # <date, factor, factor>
+        ├──── specific_risk.npy   # <date, instrument>
+        ├──── universe.npy        # <date, instrument>, if the instrument has risk data on the date
+        ├──── blacklist.npy       # <date, instrument>
+
+    The store can be created by `create` and `write` (e.g. by the rolling risk models) or converted from the per-date
+    directories used by `EnhancedIndexingStrategy` by `from_riskmodel_root`.
+    """
+
+    META_NAME = "meta.json"
+    FIELDS = ["factor_exp", "factor_cov", "specific_risk", "universe", "blacklist"]
+
+    def __init__(self, path: Union[str, Path], mode: str = "r"):
+        """
+        Args:
+            path (str): the directory of the store
+            mode (str): the mode of memory mapping, `r` for reading and `r+` for writing
+        """
+        self.path = Path(path)
+        with (self.path / self.META_NAME).open() as f:
+            meta = json.load(f)
+        self.dates = pd.DatetimeIndex(meta["dates"])
+        self.instruments = np.array(meta["instruments"], dtype=object)
+        self.factors = meta["factors"]
+        self._date_pos = dict(zip(self.dates, range(len(self.dates))))
+        self._inst_pos = dict(zip(self.instruments, range(len(self.instruments))))
+        for field in self.FIELDS:
+            setattr(self, field, np.load(self.path / f"{field}.npy", mmap_mode=mode))
+
+    @classmethod
+    def is_store(cls, path: Union[str, Path]) -> bool:
+        return (Path(path) / cls.META_NAME).exists()
+
+    @classmethod
+    def create(
+        cls,
+        path: Union[str, Path],
+        dates: Iterable,
+        instruments: Iterable[str],
+        factors: Union[int, Iterable],
+        dtype: np.dtype = np.float64,
+    ) -> "RiskDataStore":
+        """create an empty store (i.e. no instrument has risk data on any date) for writing
+
+        Args:
+            path (str): the directory of the store
+            dates (list): all the dates
+            instruments (list): all the instruments
+            factors (int or list): the number of factors or the factor names
+            dtype (np.dtype): the dtype of the risk data
+        """
+        path = Path(path)
+        path.mkdir(parents=True, exist_ok=True)
+        dates = pd.DatetimeIndex(dates)
+        instruments = [str(inst) for inst in instruments]
+        factors = list(range(factors)) if isinstance(factors, int) else list(factors)
+        meta = {
+            "dates": [d.isoformat() for d in dates],
+            "instruments": instruments,
+            "factors": [str(f) for f in factors],
+        }
+        with (path / cls.META_NAME).open("w") as f:
+            json.dump(meta, f)
+
+        T, N, K = len(dates), len(instruments), len(factors)
+        shapes = {
+            "factor_exp": ((T, N, K), dtype),
+            "factor_cov": ((T, K, K), dtype),
+            "specific_risk": ((T, N), dtype),
+            "universe": ((T, N), bool),
+            "blacklist": ((T, N), bool),
+        }
+        for field, (shape, field_dtype) in shapes.items():
+            arr = np.lib.format.open_memmap(path / f"{field}.npy", mode="w+", dtype=field_dtype, shape=shape)
+            arr[:] = np.nan if field_dtype != bool else False
+            arr.flush()
+            del arr
+        return cls(path, mode="r+")
+
+    def __contains__(self, date) -> bool:
+        return pd.Timestamp(date) in self._date_pos
+
+    def write(
+        self,
+        date,
+        factor_exp: pd.DataFrame,
+        factor_cov: Union[pd.DataFrame, np.ndarray],
+        specific_risk: Union[pd.Series, pd.DataFrame],
+        blacklist: Optional[List[str]] = None,
+    ) -> None:
+        """write the risk data of a date
+
+        Args:
+            date (pd.Timestamp): the date
+            factor_exp (pd.DataFrame): the factor exposure indexed by the instruments of the universe
+            factor_cov (pd.DataFrame or np.ndarray): the factor covariance
+            specific_risk (pd.Series): the specific risk (volatility) indexed by instruments
+            blacklist (list): the blacklisted instruments
+        """
+        t = self._date_pos[pd.Timestamp(date)]
+        pos = np.array([self._inst_pos[inst] for inst in factor_exp.index], dtype=np.int64)
+        if isinstance(specific_risk, pd.DataFrame):
+            specific_risk = specific_risk.iloc[:, 0]
+        if not factor_exp.index.equals(specific_risk.index):
+            # NOTE: for stocks missing specific_risk, we always assume it has the highest volatility
+            specific_risk = specific_risk.reindex(factor_exp.index, fill_value=specific_risk.max())
+
+        self.universe[t] = False
+        self.universe[t, pos] = True
+        self.factor_exp[t] = np.nan
+        self.factor_exp[t, pos] = np.asarray(factor_exp, dtype=self.factor_exp.dtype)
+        self.factor_cov[t] = np.asarray(factor_cov, dtype=self.factor_cov.dtype)
+        self.specific_risk[t] = np.nan
+        self.specific_risk[t, pos] = specific_risk.values
+        self.blacklist[t] = False
+        if blacklist is not None:
+            # the blacklisted instruments without risk data are ignored
+            black_pos = [self._inst_pos[inst] for inst in blacklist if inst in self._inst_pos]
+            self.blacklist[t, black_pos] = True
+
+    def flush(self) -> None:
+        for field in self.FIELDS:
+            getattr(self, field).flush()
+
+    def read(self, date) -> Optional[Tuple[np.ndarray, np.ndarray, np.ndarray, List[str], List[str]]]:
+        """read the risk data of a date
+
+        Returns:
+            tuple: factor exposure, factor covariance, specific risk, universe and blacklist of the date (like
+                `EnhancedIndexingStrategy.get_risk_data`). None if the date is not in the store or has no data.
+        """
+        t = self._date_pos.get(pd.Timestamp(date))
+        if t is None:
+            return None
+        mask = np.asarray(self.universe[t])
+        if not mask.any():
+            return None
+        pos = np.flatnonzero(mask)
+        return (
+            np.asarray(self.factor_exp[t, pos]),
+            np.asarray(self.factor_cov[t]),
+            np.asarray(self.specific_risk[t, pos]),
+            self.instruments[pos].tolist(),
+            self.instruments[np.flatnonzero(self.blacklist[t])].tolist(),
+        )
+
+    @classmethod
+    def from_riskmodel_root(
+        cls,
+        riskmodel_root: Union[str, Path],
+        path: Union[str, Path],
+        name_mapping: dict = {},
+        dtype: np.dtype = np.float64,
+    ) -> "RiskDataStore":
+        """convert the per-date risk data directories (please refer to `EnhancedIndexingStrategy`) into a store
+
+        Args:
+            riskmodel_root (str): the root of the per-date directories named like `20210101`
+            path (str): the directory of the store
+            name_mapping (dict): alternative file names
+        """
+        names = {
+            "factor_exp": "factor_exp.pkl",
+            "factor_cov": "factor_cov.pkl",
+            "specific_risk": "specific_risk.pkl",
+            "blacklist": "blacklist.pkl",
+        }
+        names.update(name_mapping)
+
+        riskmodel_root = Path(riskmodel_root)
+        date_dirs = {}
+        for sub in riskmodel_root.iterdir():
+            try:
+                date_dirs[pd.Timestamp(sub.name)] = sub
+            except ValueError:
+                continue
+        dates = sorted(date_dirs)
+
+        # the first pass collects the instruments
+        instruments, factors = set(), None
+        for date in dates:
+            factor_exp = load_dataset(str(date_dirs[date] / names["factor_exp"]), index_col=[0])
+            instruments |= set(factor_exp.index)
+            factors = factor_exp.columns if factors is None else factors
+
+        store = cls.create(path, dates, sorted(instruments), factors if factors is not None else 0, dtype=dtype)
+        for date in dates:
+            root = date_dirs[date]
+            blacklist = None
+            if os.path.exists(root / names["blacklist"]):
+                blacklist = load_dataset(str(root / names["blacklist"])).index.tolist()
+            store.write(
+                date,
+                load_dataset(str(root / names["factor_exp"]), index_col=[0]),
+                load_dataset(str(root / names["factor_cov"]), index_col=[0]),
+                load_dataset(str(root / names["specific_risk"]), index_col=[0]),
+                blacklist,
+            )
+        store.flush()
+        logger.info(f"{len(dates)} dates of risk data are converted into {path}")
+        return store
@@ -2,7 +2,7 @@
 # Licensed under the MIT License.
 
 import numpy as np
-from typing import Union
+from typing import Tuple, Union
 from sklearn.decomposition import PCA, FactorAnalysis
 
 from qlib.model.riskmodel import RiskModel
@@ -42,6 +42,10 @@ class StructuredCovEstimator(RiskModel):
     FACTOR_MODEL_FA = "fa"
     DEFAULT_NAN_OPTION = "fill"
 
+    # the subspace iteration of the rolling estimation
+    MAX_SUBSPACE_ITER = 5
+    SUBSPACE_TOL = 1e-8
+
     def __init__(self, factor_model: str = "pca", num_factors: int = 10, **kwargs):
         """
         Args:
@@ -92,3 +96,58 @@ class StructuredCovEstimator(RiskModel):
         cov_x = F @ cov_b @ F.T + np.diag(var_u)
 
         return cov_x
+
+    def _predict_rolling(
+        self, X: np.ndarray, S: np.ndarray, return_decomposed_components=False
+    ) -> Union[np.ndarray, tuple]:
+        """rolling estimation with the PCA of the sample covariance `S`
+
+        The principal components of `S` are tracked across the dates by the subspace iteration warm started from the
+        components of the previous date, which converges in a few iterations as the window slides by a few
+        observations (the iteration stops once the residuals of the components are below `SUBSPACE_TOL` relative to
+        the largest eigenvalue). The factor analysis model is re-estimated from the window instead.
+        """
+        if self.solver is not PCA:
+            return super()._predict_rolling(X, S, return_decomposed_components)
+
+        eigval, F = self._get_principal_components(X, S)
+        n = len(X)
+        cov_b = np.diag(eigval * n / (n - 1))  # like `np.cov` of the factor returns
+        var_u = np.diag(S) - (F**2) @ eigval
+
+        if return_decomposed_components:
+            return F, cov_b, var_u
+
+        cov_x = F @ cov_b @ F.T + np.diag(var_u)
+
+        return cov_x
+
+    def _get_principal_components(self, X: np.ndarray, S: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """get the largest `num_factors` eigenvalues and eigenvectors of `S`, the sample covariance of `X`"""
+        k = min(self.num_factors, len(S))
+        V = self._rolling_state.get("eigvec")
+        if V is None or V.shape[0] != len(S):
+            eigval, V = np.linalg.eigh(S)
+            # NOTE: the extra vectors speed up the convergence of the first `k` ones in the following dates
+            p = min(2 * k + 5, len(S))
+            eigval, V = eigval[::-1][:p], V[:, ::-1][:, :p]
+        else:
+            # multiply by the window instead of `S` when there are fewer observations than variables
+            matmul = (lambda A: X.T @ (X @ A) / len(X)) if len(X) < len(S) else (lambda A: S @ A)
+            SV = matmul(V)
+            for _ in range(self.MAX_SUBSPACE_ITER):
+                Q, _ = np.linalg.qr(SV)
+                SQ = matmul(Q)
+                eigval, U = np.linalg.eigh(Q.T @ SQ)
+                eigval, U = eigval[::-1], U[:, ::-1]
+                V, SV = Q @ U, SQ @ U
+                residual = np.linalg.norm(SV[:, :k] - V[:, :k] * eigval[:k], axis=0).max()
+                if residual <= self.SUBSPACE_TOL * max(eigval[0], np.finfo(float).tiny):
+                    break
+        self._rolling_state["eigvec"] = V
+
+        eigval, F = np.clip(eigval[:k], 0, None), V[:, :k].copy()
+        # flip the signs like `sklearn` to enforce deterministic output
+        signs = np.sign(F[np.abs(F).argmax(axis=0), np.arange(k)])
+        F *= np.where(signs == 0, 1, signs)
+        return eigval, F
@@ -236,6 +236,27 @@ class BaseStrategy:
             the execution result
         """
 
+    def support_fused_loop(self) -> bool:
+        """
+        Whether the strategy can be driven by the fused inner loop of `NestedExecutor` for the current outer decision.
+        It is called after the strategy is reset by the outer decision.
+
+        The strategies supporting it must implement `generate_fused_trade_decision`.
+        """
+        return False
+
+    def generate_fused_trade_decision(self, execute_result: Optional[list] = None) -> BaseTradeDecision:
+        """
+        The vectorized version of `generate_trade_decision` used by the fused inner loop of `NestedExecutor`.
+        It must give the same decisions as `generate_trade_decision` and can't be a generator.
+
+        Parameters
+        ----------
+        execute_result : Optional[list]
+            the executed result for the last trade decision
+        """
+        raise NotImplementedError("generate_fused_trade_decision is not implemented!")
+
 
 class RLStrategy(BaseStrategy, metaclass=ABCMeta):
     """RL-based strategy"""
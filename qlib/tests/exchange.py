@@ -0,0 +1,24 @@
+#  Copyright (c) Microsoft Corporation.
+#  Licensed under the MIT License.
+import pandas as pd
+
+from qlib.backtest.exchange import Exchange
+
+
+class StaticExchange(Exchange):
+    """
+    An exchange on the given quote. So the dealing can be tested without the data.
+
+    `quote_df` is indexed by (instrument, datetime) and contains the fields used by the exchange (e.g. `$close`,
+    `$volume`, `$factor` and `$change`). The price is not adjusted.
+    """
+
+    def __init__(self, quote_df: pd.DataFrame, **kwargs):
+        self.static_quote_df = quote_df
+        kwargs.setdefault("deal_price", "close")
+        super().__init__(codes=list(quote_df.index.unique("instrument")), **kwargs)
+
+    def get_quote_from_qlib(self) -> None:
+        self.quote_df = self.static_quote_df[list(dict.fromkeys(self.all_fields))].copy()
+        self.trade_w_adj_price = False
+        self._update_limit(self.limit_threshold)
@@ -71,17 +71,19 @@ def sum_by_index(data_list: Union[SingleData], new_index: list, fill_value=0) ->
     SingleData
         the SingleData with new_index and values after sum.
     """
-    data_list = [data.to_dict() for data in data_list]
-    data_sum = {}
-    for id in new_index:
-        item_sum = 0
-        for data in data_list:
-            if id in data and not np.isnan(data[id]):
-                item_sum += data[id]
-            else:
-                item_sum += fill_value
-        data_sum[id] = item_sum
-    return SingleData(data_sum)
+    new_index = list(new_index)
+    new_index_map = dict(zip(new_index, range(len(new_index))))
+    data_sum = np.zeros(len(new_index))
+    for data in data_list:
+        # the positions of the data in the new index (-1 for the missing ones)
+        pos = np.fromiter(
+            (new_index_map.get(id, -1) for id in data.index.idx_list), dtype=np.int64, count=len(data.index)
+        )
+        valid = (pos >= 0) & ~np.isnan(data.data)
+        item = np.full(len(new_index), fill_value, dtype=np.float64)
+        item[pos[valid]] = data.data[valid]
+        data_sum += item
+    return SingleData(data_sum, new_index)
 
 
 class Index:
@@ -585,11 +587,20 @@ class SingleData(IndexData):
         if self.index == index:
             return self
         tmp_data = np.full(len(index), fill_value, dtype=np.float64)
-        for index_id, index_item in enumerate(index):
-            try:
-                tmp_data[index_id] = self.loc[index_item]
-            except KeyError:
-                pass
+        index_map = self.index.index_map
+        if isinstance(index_map, dict):
+            # the vectorized version of looking up the items one by one
+            convert = self.index._convert_type
+            items = index.idx_list if isinstance(index, Index) else index
+            pos = np.fromiter((index_map.get(convert(item), -1) for item in items), dtype=np.int64, count=len(index))
+            found = pos >= 0
+            tmp_data[found] = self.data[pos[found]]
+        else:
+            for index_id, index_item in enumerate(index):
+                try:
+                    tmp_data[index_id] = self.loc[index_item]
+                except KeyError:
+                    pass
         return SingleData(tmp_data, index)
 
     def add(self, other: SingleData, fill_value=0):
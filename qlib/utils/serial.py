@@ -70,9 +70,9 @@ class Serializable:
         -------
         list:
         """
-        if hasattr(self, f"_{attr_type}"):
-            res = getattr(self, f"_{attr_type}", [])
-        else:
+        # None indicates that the list is not configured on the object (e.g. `self._exclude` in `__init__`)
+        res = getattr(self, f"_{attr_type}", None)
+        if res is None:
             res = getattr(self.__class__, f"{attr_type}_attr", [])
         if res is None:
             return []
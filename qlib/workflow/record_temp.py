@@ -5,7 +5,6 @@ import logging
 import warnings
 import pandas as pd
 import numpy as np
-from tqdm import trange
 from pprint import pprint
 from typing import Union, List, Optional, Dict
 
@@ -14,7 +13,7 @@ from ..contrib.evaluate import risk_analysis, indicator_analysis
 
 from ..data.dataset import DatasetH
 from ..data.dataset.handler import DataHandlerLP
-from ..backtest import backtest as normal_backtest
+from ..backtest import backtest as normal_backtest, backtest_sweep
 from ..log import get_module_logger
 from ..utils import fill_placeholder, flatten_dict, class_casting, get_date_by_shift
 from ..utils.time import Freq
@@ -463,7 +462,7 @@ class PortAnaRecord(ACRecordTemp):
             ret_freq.extend(self._get_report_freq(executor_config["kwargs"]["inner_executor"]))
         return ret_freq
 
-    def _generate(self, **kwargs):
+    def _prepare_backtest(self):
         pred = self.load("pred.pkl")
 
         # replace the "<PRED>" with prediction saved before
@@ -478,11 +477,17 @@ class PortAnaRecord(ACRecordTemp):
         if self.backtest_config["end_time"] is None:
             self.backtest_config["end_time"] = get_date_by_shift(dt_values.max(), 1)
 
-        artifact_objects = {}
+    def _generate(self, **kwargs):
+        self._prepare_backtest()
         # custom strategy and get backtest
         portfolio_metric_dict, indicator_dict = normal_backtest(
             executor=self.executor_config, strategy=self.strategy_config, **self.backtest_config
         )
+        return self._generate_artifacts(portfolio_metric_dict, indicator_dict)
+
+    def _generate_artifacts(self, portfolio_metric_dict, indicator_dict):
+        """generate the artifacts and analysis results of a backtest"""
+        artifact_objects = {}
         for _freq, (report_normal, positions_normal) in portfolio_metric_dict.items():
             artifact_objects.update({f"report_normal_{_freq}.pkl": report_normal})
             artifact_objects.update({f"positions_normal_{_freq}.pkl": positions_normal})
@@ -586,7 +591,7 @@ class MultiPassPortAnaRecord(PortAnaRecord):
 
     depend_cls = SignalRecord
 
-    def __init__(self, recorder, pass_num=10, shuffle_init_score=True, **kwargs):
+    def __init__(self, recorder, pass_num=10, shuffle_init_score=True, n_jobs=1, **kwargs):
         """
         Parameters
         ----------
@@ -596,9 +601,13 @@ class MultiPassPortAnaRecord(PortAnaRecord):
             The number of backtest passes.
         shuffle_init_score : bool
             Whether to shuffle the prediction score of the first backtest date.
+        n_jobs : int
+            The number of processes to run the passes. The quote of the exchange is loaded once and shared by the
+            passes. Please refer to `qlib.backtest.backtest_sweep` for more details.
         """
         self.pass_num = pass_num
         self.shuffle_init_score = shuffle_init_score
+        self.n_jobs = n_jobs
 
         super().__init__(recorder, **kwargs)
 
@@ -630,13 +639,18 @@ class MultiPassPortAnaRecord(PortAnaRecord):
     def _generate(self, **kwargs):
         risk_analysis_df_map = {}
 
-        # Collect each frequency's analysis df as df list
-        for i in trange(self.pass_num):
+        configs = []
+        for _ in range(self.pass_num):
             if self.shuffle_init_score:
                 self.random_init()
+            self._prepare_backtest()
+            configs.append({"strategy": self.strategy_config, "executor": self.executor_config})
+        _, results = backtest_sweep(configs=configs, n_jobs=self.n_jobs, **self.backtest_config)
 
+        # Collect each frequency's analysis df as df list
+        for i, (portfolio_metric_dict, indicator_dict) in results.items():
             # Not check for cache file list
-            single_run_artifacts = super()._generate(**kwargs)
+            single_run_artifacts = self._generate_artifacts(portfolio_metric_dict, indicator_dict)
 
             for _analysis_freq in self.risk_analysis_freq:
                 risk_analysis_df_list = risk_analysis_df_map.get(_analysis_freq, [])
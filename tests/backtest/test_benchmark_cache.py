@@ -0,0 +1,116 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License.
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from qlib.backtest import benchmark_cache
+from qlib.backtest.benchmark_cache import BenchmarkCache
+from qlib.backtest.profit_attribution import get_benchmark_weight
+
+
+class TestBenchmarkCache(unittest.TestCase):
+    def setUp(self):
+        self.calendar = pd.date_range("2020-01-01", periods=100, freq="B")
+        self.returns = pd.Series(np.random.RandomState(0).randn(100) * 0.01, index=self.calendar)
+        self.tmp_dir = Path(tempfile.mkdtemp())
+        self.cache = BenchmarkCache(self.tmp_dir)
+        self.loaded = []
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def _load(self, start_time, end_time):
+        ret = self.returns.loc[start_time:end_time]
+        self.loaded.append((ret.index[0], ret.index[-1]))
+        return ret, "day"
+
+    def _get(self, start_time, end_time):
+        ret = self.cache.get_returns(("SH000300", "day"), start_time, end_time, self._load, lambda freq: self.calendar)
+        pd.testing.assert_series_equal(ret, self.returns.loc[start_time:end_time])
+
+    def test_returns(self):
+        self._get("2020-02-03", "2020-03-31")
+        self._get("2020-02-10", "2020-03-20")
+        self.assertEqual(len(self.loaded), 1)
+
+        # only the head and tail are loaded
+        self.loaded.clear()
+        self._get("2020-01-15", "2020-04-30")
+        self.assertEqual(
+            self.loaded,
+            [
+                (pd.Timestamp("2020-01-15"), pd.Timestamp("2020-02-03")),
+                (pd.Timestamp("2020-03-31"), pd.Timestamp("2020-04-30")),
+            ],
+        )
+
+        # the range out of the calendar is covered by the last date
+        self.loaded.clear()
+        self._get(None, "2030-01-01")
+        self._get("2020-01-01", "2030-01-01")
+        self._get("2020-03-02", "2020-03-02")
+        self.assertEqual(len(self.loaded), 2)
+
+    def test_weights(self):
+        path = self.tmp_dir / "weights.csv"
+        path.write_text("code,date,index,weight\n")
+        weights = pd.DataFrame({"SH600000": [0.5, 0.6]}, index=self.calendar[:2])
+        loaded = []
+
+        def _load():
+            loaded.append(path)
+            return weights
+
+        pd.testing.assert_frame_equal(self.cache.get_weights("SH000300", path, _load), weights)
+        pd.testing.assert_frame_equal(self.cache.get_weights("SH000300", path, _load), weights)
+        self.assertEqual(len(loaded), 1)
+        # the entry is refreshed when the file is modified
+        path.write_text("code,date,index,weight\nSH600000,2020-01-01,SH000300,50\n")
+        self.cache.get_weights("SH000300", path, _load)
+        self.assertEqual(len(loaded), 2)
+
+    def test_benchmark_weight(self):
+        path = self.tmp_dir / "weights.csv"
+        rng = np.random.RandomState(0)
+        df = pd.DataFrame(
+            {
+                "code": rng.choice([f"SH60000{i}" for i in range(10)], 200),
+                "date": self.calendar[:20].strftime("%Y-%m-%d")[rng.randint(0, 20, 200)],
+                "index": rng.choice(["SH000300", "SH000905"], 200),
+                "weight": rng.rand(200),
+            }
+        ).drop_duplicates(["code", "date", "index"])
+        df.to_csv(path, index=False)
+        for start_date, end_date in [(None, None), ("2020-01-08", "2020-01-20"), (None, "2020-01-03")]:
+            expected = df[df["index"] == "SH000300"].assign(date=lambda x: pd.to_datetime(x["date"]))
+            if start_date is not None:
+                expected = expected[expected.date >= start_date]
+            if end_date is not None:
+                expected = expected[expected.date <= end_date]
+            expected = expected.pivot_table(index="date", columns="code", values="weight") / 100.0
+            for cache in None, self.cache:
+                with mock.patch.object(BenchmarkCache, "default", return_value=cache):
+                    res = get_benchmark_weight("SH000300", start_date, end_date, path=path)
+                pd.testing.assert_frame_equal(res, expected, check_freq=False)
+
+    def test_default(self):
+        config = mock.MagicMock(registered=True, default_disk_cache=1, benchmark_disk_cache=False)
+        config.benchmark_cache_dir_name = "benchmark_cache"
+        config.dpm.get_data_uri.return_value = self.tmp_dir
+        with mock.patch.object(benchmark_cache, "C", config):
+            # the cache writes into the data directory. So it is disabled by default
+            self.assertIsNone(BenchmarkCache.default("day"))
+            config.benchmark_disk_cache = True
+            self.assertEqual(BenchmarkCache.default("day").cache_dir, self.tmp_dir.resolve() / "benchmark_cache")
+            config.default_disk_cache = 0
+            self.assertIsNone(BenchmarkCache.default("day"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,214 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License.
+import shutil
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+import numpy as np
+import pandas as pd
+
+import qlib
+from qlib.backtest import backtest
+from qlib.backtest.executor import NestedExecutor
+from qlib.constant import REG_CN
+from qlib.contrib.strategy.rule_strategy import TWAPStrategy
+from qlib.data import D
+from qlib.tests import TestAutoData
+from qlib.tests.exchange import StaticExchange
+
+
+class FusedLoopTest(TestAutoData):
+    START_TIME = "2020-01-01"
+    END_TIME = "2020-03-31"
+
+    def _backtest(self, fuse_inner_loop: bool, trade_type: str):
+        instruments = D.list_instruments(D.instruments("csi300"), self.START_TIME, self.END_TIME, as_list=True)[:50]
+        dates = D.calendar(start_time=self.START_TIME, end_time=self.END_TIME)
+        np.random.seed(0)
+        signal = pd.Series(
+            np.random.rand(len(dates) * len(instruments)),
+            index=pd.MultiIndex.from_product([dates, instruments], names=["datetime", "instrument"]),
+        )
+        strategy = {
+            "class": "TopkDropoutStrategy",
+            "module_path": "qlib.contrib.strategy",
+            "kwargs": {"signal": signal, "topk": 10, "n_drop": 3},
+        }
+        executor = {
+            "class": "NestedExecutor",
+            "module_path": "qlib.backtest.executor",
+            "kwargs": {
+                "time_per_step": "week",
+                "fuse_inner_loop": fuse_inner_loop,
+                "generate_portfolio_metrics": True,
+                "inner_strategy": {"class": "TWAPStrategy", "module_path": "qlib.contrib.strategy.rule_strategy"},
+                "inner_executor": {
+                    "class": "SimulatorExecutor",
+                    "module_path": "qlib.backtest.executor",
+                    "kwargs": {"time_per_step": "day", "generate_portfolio_metrics": True, "trade_type": trade_type},
+                },
+            },
+        }
+        exchange_kwargs = {
+            "freq": "day",
+            "codes": instruments,
+            "limit_threshold": 0.095,
+            "deal_price": "close",
+            "open_cost": 0.0005,
+            "close_cost": 0.0015,
+            "min_cost": 5,
+            "volume_threshold": {"all": ("current", "0.002 * $volume")},
+        }
+        return backtest(
+            self.START_TIME,
+            self.END_TIME,
+            strategy,
+            executor,
+            account=1e8,
+            exchange_kwargs=exchange_kwargs,
+        )
+
+    def test_same_as_generic_loop(self):
+        for trade_type in "serial", "parallel":
+            expected_pm, expected_ind = self._backtest(False, trade_type)
+            with mock.patch.object(
+                NestedExecutor, "_fused_inner_loop", autospec=True, side_effect=NestedExecutor._fused_inner_loop
+            ) as fused_loop:
+                pm, ind = self._backtest(True, trade_type)
+            self.assertTrue(fused_loop.called)
+            self.assertEqual(set(pm), set(expected_pm))
+            for freq in expected_pm:
+                pd.testing.assert_frame_equal(pm[freq][0], expected_pm[freq][0])
+                pd.testing.assert_frame_equal(ind[freq][0], expected_ind[freq][0])
+
+
+class _RecordTWAPStrategy(TWAPStrategy):
+    """record the remaining amounts of the orders after each outer step"""
+
+    def reset(self, outer_trade_decision=None, **kwargs):
+        super().reset(outer_trade_decision=outer_trade_decision, **kwargs)
+        if not hasattr(self, "remain_list"):
+            self.remain_list = []
+
+    def post_upper_level_exe_step(self):
+        self.remain_list.append(dict(self.trade_amount_remain))
+
+
+class StaticFusedLoopTest(unittest.TestCase):
+    """compare the fused and the generic inner loops on a static quote. So it runs without the data"""
+
+    START_TIME = "2020-01-01"
+    END_TIME = "2020-03-31"
+
+    @classmethod
+    def setUpClass(cls):
+        # only the calendar is loaded from the provider. The weekly calendar is resampled from the daily one
+        cls.provider_uri = Path(tempfile.mkdtemp())
+        calendar = pd.bdate_range(cls.START_TIME, pd.Timestamp(cls.END_TIME) + pd.Timedelta(days=30))
+        (cls.provider_uri / "calendars").mkdir()
+        (cls.provider_uri / "calendars" / "day.txt").write_text("\n".join(calendar.strftime("%Y-%m-%d")))
+        qlib.init(provider_uri=str(cls.provider_uri), region=REG_CN, expression_cache=None, dataset_cache=None)
+
+        rng = np.random.RandomState(0)
+        dates = calendar[calendar <= cls.END_TIME]
+        cls.instruments = [f"SH{600000 + i}" for i in range(20)]
+        index = pd.MultiIndex.from_product([cls.instruments, dates], names=["instrument", "datetime"])
+        close = np.exp(np.cumsum(rng.normal(0, 0.03, (len(cls.instruments), len(dates))), axis=1)) * 10
+        change = np.concatenate([np.zeros((len(cls.instruments), 1)), close[:, 1:] / close[:, :-1] - 1], axis=1)
+        # the limit-up/down and the suspended stocks
+        change[rng.rand(*change.shape) < 0.05] = 0.1
+        change[rng.rand(*change.shape) < 0.05] = -0.1
+        close[rng.rand(*close.shape) < 0.05] = np.nan
+        cls.quote_df = pd.DataFrame(
+            {
+                "$close": close.ravel(),
+                "$volume": rng.randint(1000, 20000, close.size) * 100.0,
+                "$factor": rng.choice([1.0, 2.0], len(cls.instruments)).repeat(len(dates)),
+                "$change": change.ravel(),
+            },
+            index=index,
+        )
+        cls.benchmark = pd.Series(0.0, index=dates)
+        cls.signal = pd.Series(
+            rng.rand(len(dates) * len(cls.instruments)),
+            index=pd.MultiIndex.from_product([dates, cls.instruments], names=["datetime", "instrument"]),
+        )
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.provider_uri)
+
+    def _backtest(self, fuse_inner_loop: bool, trade_type: str, pos_type: str):
+        exchange = StaticExchange(
+            self.quote_df,
+            freq="day",
+            start_time=self.START_TIME,
+            end_time=self.END_TIME,
+            limit_threshold=0.095,
+            open_cost=0.0005,
+            close_cost=0.0015,
+            min_cost=5,
+            trade_unit=100,
+            volume_threshold={"all": ("current", "$volume")},
+        )
+        inner_strategy = _RecordTWAPStrategy()
+        strategy = {
+            "class": "TopkDropoutStrategy",
+            "module_path": "qlib.contrib.strategy",
+            "kwargs": {"signal": self.signal, "topk": 5, "n_drop": 2},
+        }
+        executor = {
+            "class": "NestedExecutor",
+            "module_path": "qlib.backtest.executor",
+            "kwargs": {
+                "time_per_step": "week",
+                "fuse_inner_loop": fuse_inner_loop,
+                "generate_portfolio_metrics": True,
+                "inner_strategy": inner_strategy,
+                "inner_executor": {
+                    "class": "SimulatorExecutor",
+                    "module_path": "qlib.backtest.executor",
+                    "kwargs": {"time_per_step": "day", "generate_portfolio_metrics": True, "trade_type": trade_type},
+                },
+            },
+        }
+        portfolio_metrics, indicators = backtest(
+            self.START_TIME,
+            self.END_TIME,
+            strategy,
+            executor,
+            benchmark=self.benchmark,
+            account=1e8,
+            exchange_kwargs={"exchange": exchange},
+            pos_type=pos_type,
+        )
+        return portfolio_metrics, indicators, inner_strategy.remain_list
+
+    def test_same_as_generic_loop(self):
+        for trade_type in "serial", "parallel":
+            for pos_type in "Position", "ArrayPosition":
+                expected_pm, expected_ind, expected_remain = self._backtest(False, trade_type, pos_type)
+                with mock.patch.object(
+                    NestedExecutor, "_fused_inner_loop", autospec=True, side_effect=NestedExecutor._fused_inner_loop
+                ) as fused_loop:
+                    pm, ind, remain = self._backtest(True, trade_type, pos_type)
+                self.assertTrue(fused_loop.called)
+
+                self.assertEqual(set(pm), {"1day", "1week"})
+                self.assertEqual(set(pm), set(expected_pm))
+                for freq in expected_pm:
+                    pd.testing.assert_frame_equal(pm[freq][0], expected_pm[freq][0])
+                    pd.testing.assert_frame_equal(ind[freq][0], expected_ind[freq][0])
+                    positions, expected_positions = pm[freq][1], expected_pm[freq][1]
+                    self.assertEqual(list(positions), list(expected_positions))
+                    for t in expected_positions:
+                        self.assertEqual(positions[t].position, expected_positions[t].position, t)
+                # the orders are partially dealt because of the volume limit
+                self.assertEqual(remain, expected_remain)
+                self.assertTrue(any(v > 0 for r in expected_remain for v in r.values()))
+
+
+if __name__ == "__main__":
+    unittest.main()
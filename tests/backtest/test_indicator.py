@@ -0,0 +1,107 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License.
+import os
+import time
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from qlib.backtest.decision import Order, OrderDir
+from qlib.backtest.high_performance_ds import NumpyOrderIndicator, PandasOrderIndicator
+from qlib.backtest.report import Indicator
+
+
+class _Decision:
+    trade_range = None
+
+    def __init__(self, orders):
+        self.orders = orders
+
+    def get_decision(self):
+        return self.orders
+
+
+class _Exchange:
+    """Only the deal price is used for the base price of the orders that are not traded in a step"""
+
+    def get_deal_price(self, stock_id, start_time, end_time, direction, method=None):
+        return float(int(stock_id[2:]) % 7 + 5)
+
+
+class TestIndicator(unittest.TestCase):
+    TIME = pd.Timestamp("2020-01-02 09:30:00")
+
+    def _run(self, n_stocks, n_steps, order_indicator_cls=NumpyOrderIndicator, seed=0):
+        """aggregate the order indicators of `n_steps` inner steps trading `n_stocks` outer orders"""
+        rng = np.random.RandomState(seed)
+        stocks = [f"SH{600000 + i}" for i in range(n_stocks)]
+        outer_orders = [
+            Order(stock_id, rng.randint(1, 100) * 100.0, OrderDir(rng.randint(2)), self.TIME, self.TIME)
+            for stock_id in stocks
+        ]
+        inner_indicators, decision_list = [], []
+        atomic_time = 0.0
+        for _ in range(n_steps):
+            indicator = Indicator(order_indicator_cls)
+            trade_info = []
+            for order in outer_orders:
+                if rng.rand() < 0.3:
+                    # not traded in this step
+                    continue
+                inner_order = Order(order.stock_id, order.amount / n_steps, order.direction, self.TIME, self.TIME)
+                inner_order.deal_amount = inner_order.amount * rng.choice([0.0, 0.5, 1.0])
+                price = 10 + rng.rand()
+                trade_val = inner_order.deal_amount * price
+                trade_info.append((inner_order, trade_val, trade_val * 0.001, price))
+            start = time.time()
+            indicator.update_order_indicators(trade_info)
+            indicator.cal_trade_indicators(self.TIME, "1min")
+            atomic_time += time.time() - start
+            inner_indicators.append(indicator.get_order_indicator())
+            decision_list.append((_Decision([]), self.TIME, self.TIME))
+
+        indicator = Indicator(order_indicator_cls)
+        start = time.time()
+        indicator.agg_order_indicators(
+            inner_indicators, decision_list, _Decision(outer_orders), trade_exchange=_Exchange()
+        )
+        indicator.cal_trade_indicators(self.TIME, "day")
+        return indicator, atomic_time, time.time() - start
+
+    def test_same_as_pandas(self):
+        indicator, _, _ = self._run(50, 10)
+        expected, _, _ = self._run(50, 10, order_indicator_cls=PandasOrderIndicator)
+        order_indicator = indicator.get_order_indicator()
+        for metric, series in expected.get_order_indicator().data.items():
+            data = order_indicator.get_index_data(metric)
+            self.assertEqual(data.index.tolist(), list(series.metric.index), metric)
+            np.testing.assert_allclose(data.data, series.metric.values.astype(float), err_msg=metric)
+        for metric, value in expected.trade_indicator.items():
+            np.testing.assert_allclose(indicator.trade_indicator[metric], value, err_msg=metric)
+
+    def test_base_price(self):
+        n_steps = 5
+        indicator, _, _ = self._run(20, n_steps)
+        order_indicator = indicator.get_order_indicator()
+        base_price = order_indicator.get_index_data("base_price")
+        # the base prices of all the steps are retrieved from the exchange and aggregated by twap
+        np.testing.assert_array_equal(order_indicator.get_index_data("base_volume").data, float(n_steps))
+        expected = [_Exchange().get_deal_price(stock_id, self.TIME, self.TIME, None) for stock_id in base_price.index]
+        np.testing.assert_allclose(base_price.data, expected)
+
+        trade_price = order_indicator.get_index_data("trade_price")
+        sign = 1 - order_indicator.get_index_data("trade_dir").data * 2
+        np.testing.assert_allclose(
+            order_indicator.get_index_data("pa").data, sign * (trade_price.data / base_price.data - 1)
+        )
+
+    @unittest.skipUnless(os.environ.get("QLIB_TEST_SPEED"), "set QLIB_TEST_SPEED to run the speed test")
+    def test_speed(self):
+        _, atomic_time, agg_time = self._run(2000, 30)
+        # a loose bound. It takes about 2s in total on a single core
+        self.assertLess(atomic_time + agg_time, 20)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,137 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License.
+import copy
+import unittest
+from collections import defaultdict
+
+import numpy as np
+import pandas as pd
+
+from qlib.backtest.decision import Order, OrderBatch, OrderDir
+from qlib.backtest.position import Position
+from qlib.backtest.report import Indicator
+from qlib.config import C, REG_CN
+from qlib.tests.exchange import StaticExchange
+
+
+class TestOrderBatch(unittest.TestCase):
+    def setUp(self):
+        self.t0, self.t1 = pd.Timestamp("2020-01-02 09:30"), pd.Timestamp("2020-01-02 14:59")
+        self.orders = [
+            Order("SH600000", 100.0, OrderDir.BUY, self.t0, self.t1),
+            Order("SH600001", 200.0, OrderDir.SELL, self.t0, self.t0),
+            Order("SH600002", 300.0, OrderDir.BUY, None, None),
+        ]
+
+    def assert_orders_equal(self, orders, expected):
+        self.assertEqual(len(orders), len(expected))
+        for order, exp in zip(orders, expected):
+            for attr in "stock_id", "amount", "direction", "start_time", "end_time", "deal_amount", "factor":
+                self.assertEqual(getattr(order, attr), getattr(exp, attr), attr)
+
+    def test_round_trip(self):
+        self.orders[0].deal_amount, self.orders[0].factor = 50.0, 1.5
+        batch = OrderBatch.from_orders(self.orders)
+        self.assertEqual(len(batch), 3)
+        np.testing.assert_array_equal(batch.amount_delta, [100.0, -200.0, 300.0])
+        self.assert_orders_equal(batch.to_orders(), self.orders)
+        self.assert_orders_equal([batch[i] for i in range(3)], self.orders)
+        self.assert_orders_equal(batch[np.array([False, True, True])].to_orders(), self.orders[1:])
+
+        batch.fill_time(self.t1, self.t1)
+        self.assertEqual(list(batch.start_time), [self.t0, self.t0, self.t1])
+        self.assertEqual(list(batch.end_time), [self.t1, self.t0, self.t1])
+
+        orders = batch.to_orders()
+        orders[1].deal_amount = 20.0
+        batch.update_results(orders)
+        np.testing.assert_array_equal(batch.deal_amount_delta, [50.0, -20.0, 0.0])
+
+    def test_scalar_attributes(self):
+        batch = OrderBatch(["SH600000", "SH600001"], [1.0, 2.0], OrderDir.SELL, self.t0, self.t1)
+        self.assertTrue((batch.direction == OrderDir.SELL).all())
+        self.assertEqual(list(batch.end_time), [self.t1, self.t1])
+        with self.assertRaises(ValueError):
+            OrderBatch(["SH600000", "SH600001"], [1.0], OrderDir.SELL)
+
+    def test_order_indicators(self):
+        for o in self.orders:
+            o.deal_amount = o.amount / 2
+        trade_val, trade_cost, trade_price = np.array([10.0, 20.0, 30.0]), np.array([0.1, 0.2, 0.3]), np.ones(3)
+        ind_list, ind_batch = Indicator(), Indicator()
+        ind_list.update_order_indicators(list(zip(self.orders, trade_val, trade_cost, trade_price)))
+        ind_batch.update_order_indicators((OrderBatch.from_orders(self.orders), trade_val, trade_cost, trade_price))
+        expected = ind_list.get_order_indicator().data
+        res = ind_batch.get_order_indicator().data
+        self.assertEqual(set(res), set(expected))
+        for metric, data in expected.items():
+            self.assertEqual(list(res[metric].index), list(data.index), metric)
+            np.testing.assert_array_equal(res[metric].values, data.values, err_msg=metric)
+
+
+class TestDealOrderBatch(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        if not C.registered:
+            C.set_region(REG_CN)
+        rng = np.random.RandomState(0)
+        cls.times = pd.date_range("2020-01-02 09:30", periods=10, freq="min")
+        cls.stocks = [f"SH60000{i}" for i in range(6)]
+        index = pd.MultiIndex.from_product([cls.stocks, cls.times], names=["instrument", "datetime"])
+        quote_df = pd.DataFrame(
+            {
+                "$close": rng.rand(len(index)) * 10 + 1,
+                "$volume": rng.randint(0, 1000, len(index)).astype(float),
+                "$factor": rng.choice([0.5, 1.0], len(index)),
+                "$change": rng.randn(len(index)) * 0.05,
+            },
+            index=index,
+        )
+        # a suspended stock
+        quote_df.loc[cls.stocks[-1], "$close"] = np.nan
+        cls.exchange = StaticExchange(
+            quote_df,
+            freq="1min",
+            limit_threshold=0.095,
+            volume_threshold={"all": ("cum", "$volume"), "buy": ("current", "$volume")},
+            trade_unit=100,
+            open_cost=0.0005,
+            close_cost=0.0015,
+            min_cost=5.0,
+        )
+
+    def test_deal_orders(self):
+        rng = np.random.RandomState(1)
+        orders = []
+        for _ in range(200):
+            s, e = sorted(rng.randint(0, len(self.times), 2))
+            orders.append(
+                Order(
+                    self.stocks[rng.randint(len(self.stocks))],
+                    float(rng.randint(1, 30) * 100),
+                    OrderDir(rng.randint(2)),
+                    self.times[s],
+                    self.times[e],
+                )
+            )
+        position = Position(cash=1e5, position_dict={s: {"amount": 1000.0, "price": 5.0} for s in self.stocks[::2]})
+        position.fill_stock_value(self.times[0], "1min")
+        pos_list, pos_batch = copy.deepcopy(position), copy.deepcopy(position)
+        dealt_list, dealt_batch = defaultdict(float), defaultdict(float)
+
+        orders_list = copy.deepcopy(orders)
+        batch = OrderBatch.from_orders(copy.deepcopy(orders))
+        res_list = self.exchange.deal_orders(orders_list, position=pos_list, dealt_order_amount=dealt_list)
+        res_batch = self.exchange.deal_orders(batch, position=pos_batch, dealt_order_amount=dealt_batch)
+
+        self.assertGreater(sum(r[0] > 0 for r in res_list), 0)
+        np.testing.assert_allclose(np.array(res_batch), np.array(res_list))
+        np.testing.assert_array_equal(batch.deal_amount, [o.deal_amount for o in orders_list])
+        np.testing.assert_array_equal(batch.factor, [np.nan if o.factor is None else o.factor for o in orders_list])
+        self.assertEqual(dict(dealt_batch), dict(dealt_list))
+        self.assertAlmostEqual(pos_batch.get_cash(), pos_list.get_cash())
+        self.assertEqual(pos_batch.get_stock_amount_dict(), pos_list.get_stock_amount_dict())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,83 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License.
+import pickle
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from qlib.backtest.decision import Order, OrderDir
+from qlib.backtest.position import ArrayPosition, Position
+
+
+class TestArrayPosition(unittest.TestCase):
+    def _order(self, stock_id, direction):
+        return Order(stock_id, 0, direction, pd.Timestamp("2020-01-01"), pd.Timestamp("2020-01-01"))
+
+    def assert_same(self, pos, expected):
+        self.assertEqual(sorted(pos.get_stock_list()), sorted(expected.get_stock_list()))
+        self.assertAlmostEqual(pos.get_cash(include_settle=True), expected.get_cash(include_settle=True))
+        self.assertAlmostEqual(pos.calculate_value(), expected.calculate_value())
+        exp_dict = expected.position
+        pos_dict = pos.position
+        self.assertEqual(set(pos_dict), set(exp_dict))
+        for stock_id in expected.get_stock_list():
+            self.assertAlmostEqual(pos.get_stock_amount(stock_id), expected.get_stock_amount(stock_id))
+            self.assertAlmostEqual(pos.get_stock_price(stock_id), expected.get_stock_price(stock_id))
+            self.assertEqual(pos.get_stock_count(stock_id, "day"), expected.get_stock_count(stock_id, "day"))
+            for key, value in exp_dict[stock_id].items():
+                self.assertAlmostEqual(pos_dict[stock_id][key], value)
+
+    def test_same_as_position(self):
+        np.random.seed(0)
+        init = {"SH600000": {"amount": 100.0, "price": 10.0}, "SH600001": {"amount": 200.0, "price": 5.0}}
+        pos, expected = ArrayPosition(1e6, init), Position(1e6, init)
+        self.assert_same(pos, expected)
+
+        snapshots = []
+        stocks = [f"SH6000{i:02d}" for i in range(30)]
+        for step in range(50):
+            for _ in range(5):
+                stock_id = stocks[np.random.randint(len(stocks))]
+                price = np.random.rand() * 10 + 1
+                if expected.check_stock(stock_id) and np.random.rand() < 0.6:
+                    # sell all or a part of the stock
+                    amount = expected.get_stock_amount(stock_id) * (1.0 if np.random.rand() < 0.5 else 0.3)
+                    direction = OrderDir.SELL
+                else:
+                    amount = float(np.random.randint(1, 100) * 100)
+                    direction = OrderDir.BUY
+                for p in pos, expected:
+                    p.update_order(self._order(stock_id, direction), amount * price, amount * price * 0.001, price)
+            for stock_id in expected.get_stock_list():
+                price = np.random.rand() * 10 + 1
+                for p in pos, expected:
+                    p.update_stock_price(stock_id, price)
+            for p in pos, expected:
+                p.add_count_all("day")
+                p.update_account_value(p.calculate_value())
+                p.update_weight_all()
+            self.assert_same(pos, expected)
+            snapshots.append((pos.snapshot(), expected.snapshot()))
+
+        # the snapshots are not changed by the later updates
+        for snap, exp_snap in snapshots:
+            self.assert_same(snap, exp_snap)
+            self.assert_same(pickle.loads(pickle.dumps(snap)), exp_snap)
+
+    def test_settle(self):
+        pos = ArrayPosition(1000.0, {"SH600000": {"amount": 100.0, "price": 10.0}})
+        pos.settle_start(ArrayPosition.ST_CASH)
+        pos.update_order(self._order("SH600000", OrderDir.SELL), 500.0, 1.0, 10.0)
+        self.assertEqual(pos.get_cash(), 1000.0)
+        self.assertEqual(pos.get_cash(include_settle=True), 1499.0)
+        snap = pos.snapshot()
+        pos.settle_commit()
+        self.assertEqual(pos.get_cash(), 1499.0)
+        self.assertNotIn("cash_delay", pos.position)
+        self.assertEqual(snap.position["cash_delay"], 499.0)
+        self.assertAlmostEqual(pos.get_stock_amount("SH600000"), 50.0)
+
+
+if __name__ == "__main__":
+    unittest.main()
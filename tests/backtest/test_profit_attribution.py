@@ -0,0 +1,72 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License.
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from qlib.backtest.position import Position
+from qlib.backtest.profit_attribution import (
+    decompose_portofolio,
+    get_daily_bin_group,
+    get_stock_group,
+    get_stock_weight_df,
+)
+
+
+class TestProfitAttribution(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.RandomState(0)
+        self.dates = pd.date_range("2020-01-01", periods=20, freq="B")
+        self.stocks = [f"SH6000{i:02d}" for i in range(30)]
+        shape = (len(self.dates), len(self.stocks))
+
+        def _df(values, nan_ratio):
+            values = np.where(rng.rand(*shape) < nan_ratio, np.nan, values)
+            return pd.DataFrame(values, index=self.dates, columns=self.stocks)
+
+        self.group = _df(rng.randint(0, 4, shape).astype(float), 0.05)
+        self.ret = _df(rng.randn(*shape) * 0.02, 0.05)
+        self.weight = _df(rng.rand(*shape), 0.5)
+        self.rng = rng
+
+    def test_decompose_portofolio(self):
+        group_weight, group_ret = decompose_portofolio(self.weight, self.group, self.ret)
+        self.assertEqual(group_weight.columns.tolist(), [0.0, 1.0, 2.0, 3.0])
+        for date in self.dates:
+            for g in group_weight.columns:
+                mask = self.group.loc[date] == g
+                w = self.weight.loc[date][mask]
+                self.assertAlmostEqual(group_weight.loc[date, g], w.sum())
+                if w.sum() == 0:
+                    self.assertTrue(np.isnan(group_ret.loc[date, g]))
+                else:
+                    self.assertAlmostEqual(group_ret.loc[date, g], (w * self.ret.loc[date][mask]).sum() / w.sum())
+
+    def test_bin_group(self):
+        group_n = 5
+        stock_group = get_stock_group(self.ret, self.weight, "bins", group_n)
+        for date in self.dates:
+            values = self.ret.loc[date]
+            split_points = np.percentile(values[self.weight.loc[date].notna()].dropna(), np.linspace(0, 100, 6))
+            split_points[0], split_points[-1] = -np.inf, np.inf
+            expected = values.copy()
+            for i, (lb, up) in enumerate(zip(split_points, split_points[1:])):
+                expected[(values >= lb) & (values < up)] = group_n - i
+            pd.testing.assert_series_equal(stock_group.loc[date], expected)
+            bench_values = values[self.weight.loc[date].notna()]
+            pd.testing.assert_series_equal(get_daily_bin_group(bench_values, values, group_n), expected)
+
+    def test_stock_weight_df(self):
+        positions = {}
+        for date in self.dates:
+            held = self.rng.choice(self.stocks, 5, replace=False)
+            positions[date] = Position(1e6, {s: {"amount": 100.0, "price": self.rng.rand() + 1} for s in held})
+        stock_weight_df = get_stock_weight_df(positions)
+        for date, pos in positions.items():
+            weight = stock_weight_df.loc[date].dropna()
+            self.assertEqual(weight.to_dict(), pos.get_stock_weight_dict(only_stock=True))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,80 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License.
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from qlib.backtest.high_performance_ds import DenseQuote, NumpyQuote
+from qlib.utils.index_data import IndexData
+
+
+class TestDenseQuote(unittest.TestCase):
+    def setUp(self):
+        np.random.seed(0)
+        dates = pd.date_range("2020-01-01", periods=30, freq="B")
+        dfs = []
+        for i in range(5):
+            # the stocks are listed on different dates
+            idx = pd.MultiIndex.from_product([[f"SH60000{i}"], dates[i * 3 :]], names=["instrument", "datetime"])
+            df = pd.DataFrame(
+                {
+                    "$close": np.random.rand(len(idx)),
+                    "$volume": np.random.randint(0, 1000, len(idx)).astype(np.float32),
+                    "limit_buy": np.random.rand(len(idx)) > 0.8,
+                },
+                index=idx,
+            )
+            dfs.append(df)
+        df = pd.concat(dfs)
+        df.iloc[::4, 0] = np.nan
+        df.iloc[5:9, 1] = np.nan  # continuous NaN for ts_data_last
+        self.df = df
+        self.dates = dates
+
+    def test_same_as_numpy_quote(self):
+        dense = DenseQuote(self.df, "day")
+        numpy_quote = NumpyQuote(self.df, "day")
+        self.assertEqual(set(dense.get_all_stock()), set(numpy_quote.get_all_stock()))
+
+        ranges = [(self.dates[i], self.dates[i]) for i in range(0, 30, 7)]
+        ranges += [(self.dates[i], self.dates[j]) for i, j in [(0, 2), (0, 29), (4, 9), (7, 8), (20, 29)]]
+        ranges += [(pd.Timestamp("2019-12-01"), pd.Timestamp("2019-12-31"))]
+        for stock_id in list(dense.get_all_stock()) + ["SH000000"]:
+            for start, end in ranges:
+                for field in "$close", "$volume", "limit_buy":
+                    for method in None, "sum", "mean", "last", "all", "ts_data_last":
+                        expected = numpy_quote.get_data(stock_id, start, end, field, method)
+                        res = dense.get_data(stock_id, start, end, field, method)
+                        msg = f"{stock_id} {start} {end} {field} {method}"
+                        if expected is None:
+                            self.assertIsNone(res, msg)
+                        elif isinstance(expected, IndexData):
+                            np.testing.assert_array_equal(res.values, expected.values, err_msg=msg)
+                            self.assertEqual(list(res.index), list(expected.index), msg)
+                        else:
+                            np.testing.assert_allclose(res, expected, rtol=1e-12, err_msg=msg)
+
+    def test_get_data_batch(self):
+        dense = DenseQuote(self.df, "day")
+        numpy_quote = NumpyQuote(self.df, "day")
+        stock_ids = ["SH000000"] + list(dense.get_all_stock())[::-1]
+        for start, end in [
+            (self.dates[3], self.dates[3]),
+            (self.dates[0], self.dates[5]),
+            (self.dates[4], self.dates[20]),
+        ]:
+            for field in "$close", "$volume", "limit_buy":
+                for method in "sum", "mean", "last", "all", "ts_data_last":
+                    expected = numpy_quote.get_data_batch(stock_ids, start, end, field, method)
+                    self.assertEqual(expected.shape, (len(stock_ids),))
+                    np.testing.assert_allclose(
+                        dense.get_data_batch(stock_ids, start, end, field, method),
+                        expected,
+                        rtol=1e-12,
+                        err_msg=f"{start} {end} {field} {method}",
+                    )
+
+
+if __name__ == "__main__":
+    unittest.main()
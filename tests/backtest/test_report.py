@@ -0,0 +1,139 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License.
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from qlib.backtest.account import Account
+from qlib.backtest.high_performance_ds import RecordBuffer
+from qlib.backtest.report import PortfolioMetrics, RiskAccumulator
+from qlib.contrib.evaluate import risk_analysis
+
+
+class TestRecordBuffer(unittest.TestCase):
+    def test_same_as_dict(self):
+        np.random.seed(0)
+        times = pd.date_range("2020-01-01", periods=100, freq="B")
+        records = {}
+        buffer = RecordBuffer(capacity=3)
+        for i, t in enumerate(times):
+            values = {"float": np.random.rand(), "int": i, "none": None, "some_none": None if i % 3 else 1.0}
+            if i > 10:
+                # the column appears later
+                values["late"] = np.float64(i)
+            records[t] = values
+            buffer.record(t, values)
+        # overwrite the records of the same time
+        records[times[5]] = {**records[times[5]], "float": -1.0}
+        buffer.record(times[5], records[times[5]])
+
+        expected = pd.DataFrame.from_dict(records, orient="index")
+        pd.testing.assert_frame_equal(buffer.to_dataframe(), expected)
+        self.assertEqual(len(buffer), len(times))
+        self.assertEqual(buffer.get("float", times[5]), -1.0)
+        self.assertEqual(buffer.get("late"), 99.0)
+
+    def test_repeated_reserve(self):
+        # the inner executor of a nested backtest reserves the steps of each outer step on the same account
+        account = Account(benchmark_config={"benchmark": None})
+        buffers = [account.portfolio_metrics.metrics, account.indicator.trade_indicator_his]
+        data = [[b._data] for b in buffers]
+        times = iter(pd.date_range("2020-01-01", periods=250 * 4, freq="h"))
+        for _ in range(250):
+            account.reserve(4)
+            for b, d in zip(buffers, data):
+                if b._data is not d[-1]:
+                    d.append(b._data)
+            for _ in range(4):
+                t = next(times)
+                for b in buffers:
+                    b.record(t, {col: 1.0 for col in b.columns})
+        for b, d in zip(buffers, data):
+            self.assertEqual(len(b), 1000)
+            self.assertLess(len(d), 10)
+
+
+class TestPortfolioMetrics(unittest.TestCase):
+    def test_portfolio_metrics(self):
+        pm = PortfolioMetrics(benchmark_config=None)
+        pm.reserve(2)
+        self.assertTrue(pm.is_empty())
+        times = pd.date_range("2020-01-01", periods=5, freq="B")
+        for i, t in enumerate(times):
+            pm.update_portfolio_metrics_record(
+                trade_start_time=t,
+                account_value=100.0 + i,
+                cash=10.0,
+                return_rate=0.01 * i,
+                total_turnover=2.0 * i,
+                turnover_rate=0.02,
+                total_cost=0.1 * i,
+                cost_rate=0.001,
+                stock_value=90.0 + i,
+                bench_value=0.0,
+            )
+        self.assertEqual(pm.get_latest_date(), times[-1])
+        self.assertEqual(pm.get_latest_account_value(), 104.0)
+        self.assertEqual(pm.get_latest_total_turnover(), 8.0)
+        df = pm.generate_portfolio_metrics_dataframe()
+        self.assertEqual(df.index.name, "datetime")
+        self.assertEqual(list(df.columns), PortfolioMetrics.METRICS)
+        self.assertEqual(list(df.index), list(times))
+        np.testing.assert_array_equal(df["account"].values, 100.0 + np.arange(5))
+
+    def test_risk_analysis(self):
+        np.random.seed(0)
+        pm = PortfolioMetrics(freq="1min", benchmark_config=None)
+        times = pd.date_range("2020-01-01 09:30", periods=1000, freq="min")
+        for i, t in enumerate(times):
+            pm.update_portfolio_metrics_record(
+                trade_start_time=t,
+                account_value=100.0,
+                cash=10.0,
+                return_rate=np.random.randn() * 0.001,
+                total_turnover=0.0,
+                turnover_rate=0.0,
+                total_cost=0.0,
+                cost_rate=np.random.rand() * 1e-4,
+                stock_value=90.0,
+                bench_value=np.random.randn() * 0.001,
+            )
+        df = pm.generate_portfolio_metrics_dataframe()
+        for mode in ["sum", "product"]:
+            analysis = pm.get_risk_analysis(mode=mode)
+            expected = pd.concat(
+                {
+                    "excess_return_without_cost": risk_analysis(df["return"] - df["bench"], freq="1min", mode=mode),
+                    "excess_return_with_cost": risk_analysis(
+                        df["return"] - df["bench"] - df["cost"], freq="1min", mode=mode
+                    ),
+                }
+            )
+            self.assertTrue(analysis.index.equals(expected.index))
+            np.testing.assert_allclose(analysis["risk"].values, expected["risk"].values, rtol=1e-10)
+
+
+class TestRiskAccumulator(unittest.TestCase):
+    def test_same_as_risk_analysis(self):
+        np.random.seed(0)
+        r = pd.Series(np.random.randn(500) * 0.01 + 0.0005)
+        r[[10, 200]] = np.nan
+        accumulator = RiskAccumulator()
+        for value in r:
+            accumulator.update(value)
+        for mode in ["sum", "product"]:
+            expected = risk_analysis(r.dropna(), freq="day", mode=mode)
+            res = accumulator.get_risk_analysis(freq="day", mode=mode)
+            np.testing.assert_allclose(res["risk"].values, expected["risk"].values, rtol=1e-10)
+            expected = risk_analysis(r.dropna(), N=252, freq=None, mode=mode)
+            np.testing.assert_allclose(
+                accumulator.get_risk_analysis(N=252, mode=mode)["risk"].values, expected["risk"].values, rtol=1e-10
+            )
+
+        accumulator.reset()
+        self.assertTrue(accumulator.get_risk_analysis()["risk"].isna().all())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,44 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License.
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from qlib.backtest.signal import SignalWCache
+from qlib.utils.resam import resam_ts_data
+
+
+class TestSignalWCache(unittest.TestCase):
+    def test_same_as_resample(self):
+        np.random.seed(0)
+        dates = pd.date_range("2020-01-01", periods=30, freq="B")
+        instruments = [f"SH6000{i:02d}" for i in range(20)]
+        index = pd.MultiIndex.from_product([instruments, dates], names=["instrument", "datetime"])
+        index = index[np.random.rand(len(index)) > 0.2]
+        df = pd.DataFrame(np.random.rand(len(index), 3), index=index, columns=["score", "a", "b"])
+        df.iloc[::7, 0] = np.nan
+        df.iloc[::5, 1] = np.nan
+        ranges = [
+            (dates[3], dates[3]),
+            (dates[0], dates[10]),
+            (dates[5] + pd.Timedelta(hours=1), dates[7]),
+            (dates[25], pd.Timestamp("2030-01-01")),
+            (pd.Timestamp("2019-01-01"), pd.Timestamp("2019-05-01")),
+        ]
+        for signal in df, df["score"], df.astype({"a": np.float32}):
+            signal_cache = SignalWCache(signal)
+            expected_signal = signal.swaplevel().sort_index()
+            for start_time, end_time in ranges:
+                expected = resam_ts_data(expected_signal, start_time, end_time, method="last")
+                res = signal_cache.get_signal(start_time, end_time)
+                if expected is None:
+                    self.assertIsNone(res)
+                elif isinstance(expected, pd.Series):
+                    pd.testing.assert_series_equal(res, expected)
+                else:
+                    pd.testing.assert_frame_equal(res, expected)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,96 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License.
+import unittest
+from unittest import mock
+
+import numpy as np
+import pandas as pd
+
+from qlib.backtest import backtest, backtest_sweep, get_exchange
+from qlib.backtest.high_performance_ds import DenseQuote, NumpyQuote
+from qlib.data import D
+from qlib.tests import TestAutoData
+
+
+class SweepTest(TestAutoData):
+    START_TIME = "2020-01-01"
+    END_TIME = "2020-03-31"
+
+    def test_sweep(self):
+        instruments = D.list_instruments(D.instruments("csi300"), self.START_TIME, self.END_TIME, as_list=True)[:50]
+        dates = D.calendar(start_time=self.START_TIME, end_time=self.END_TIME)
+        np.random.seed(0)
+        signal = pd.Series(
+            np.random.rand(len(dates) * len(instruments)),
+            index=pd.MultiIndex.from_product([dates, instruments], names=["datetime", "instrument"]),
+        )
+        executor = {
+            "class": "SimulatorExecutor",
+            "module_path": "qlib.backtest.executor",
+            "kwargs": {"time_per_step": "day", "generate_portfolio_metrics": True},
+        }
+        exchange_kwargs = {
+            "freq": "day",
+            "codes": instruments,
+            "limit_threshold": 0.095,
+            "deal_price": "close",
+            "open_cost": 0.0005,
+            "close_cost": 0.0015,
+            "min_cost": 5,
+        }
+        configs = {}
+        for topk, n_drop, open_cost in (5, 1, 0.0005), (10, 3, 0.0005), (10, 3, 0.002):
+            configs[(topk, n_drop, open_cost)] = {
+                "strategy": {
+                    "class": "TopkDropoutStrategy",
+                    "module_path": "qlib.contrib.strategy",
+                    "kwargs": {"signal": signal, "topk": topk, "n_drop": n_drop},
+                },
+                "exchange_kwargs": {"open_cost": open_cost},
+            }
+
+        with self.assertRaises(ValueError):
+            backtest_sweep(
+                self.START_TIME,
+                self.END_TIME,
+                [{"exchange_kwargs": {"deal_price": "open"}}],
+                executor=executor,
+                exchange_kwargs=exchange_kwargs,
+            )
+
+        exchanges = []
+
+        def _get_exchange(**kwargs):
+            exchanges.append(get_exchange(**kwargs))
+            return exchanges[-1]
+
+        # the quote of the exchange is only changed when it is given explicitly
+        for n_jobs, quote_kwargs, quote_cls in (1, {}, NumpyQuote), (2, {"quote_cls": "DenseQuote"}, DenseQuote):
+            with mock.patch("qlib.backtest.get_exchange", side_effect=_get_exchange):
+                report_df, results = backtest_sweep(
+                    self.START_TIME,
+                    self.END_TIME,
+                    configs,
+                    executor=executor,
+                    account=1e8,
+                    exchange_kwargs={**exchange_kwargs, **quote_kwargs},
+                    n_jobs=n_jobs,
+                )
+            self.assertIsInstance(exchanges[-1].quote, quote_cls)
+            self.assertEqual(list(results), list(configs))
+            for name, config in configs.items():
+                portfolio_metric_dict, _ = backtest(
+                    self.START_TIME,
+                    self.END_TIME,
+                    config["strategy"],
+                    executor,
+                    account=1e8,
+                    exchange_kwargs={**exchange_kwargs, **config["exchange_kwargs"]},
+                )
+                expected = portfolio_metric_dict["1day"][0]
+                pd.testing.assert_frame_equal(results[name][0]["1day"][0], expected)
+                pd.testing.assert_frame_equal(report_df.loc[name], expected)
+
+
+if __name__ == "__main__":
+    unittest.main()
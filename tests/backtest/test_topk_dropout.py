@@ -0,0 +1,351 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License.
+import copy
+import unittest
+from types import SimpleNamespace
+
+import numpy as np
+import pandas as pd
+
+from qlib.backtest.decision import Order, OrderDir, TradeDecisionWO
+from qlib.backtest.position import ArrayPosition, Position
+from qlib.backtest.signal import Signal
+from qlib.backtest.utils import CommonInfrastructure, LevelInfrastructure
+from qlib.config import C, REG_CN
+from qlib.contrib.strategy.signal_strategy import TopkDropoutStrategy, _SellingPosition, topk_dropout_select
+from qlib.tests.exchange import StaticExchange
+
+
+def _select(pred_score, current_stock_list, topk, n_drop, tradable=None):
+    """the selection of `TopkDropoutStrategy` based on pandas"""
+    if tradable is not None:
+
+        def get_first_n(li, n, reverse=False):
+            li = list(li)[::-1] if reverse else list(li)
+            res = [si for si in li if tradable[si]][: max(n, 1)]
+            return res[::-1] if reverse else res
+
+    else:
+
+        def get_first_n(li, n, reverse=False):
+            return list(li)[-n:] if reverse else list(li)[:n]
+
+    last = pred_score.reindex(current_stock_list).sort_values(ascending=False).index
+    today = get_first_n(
+        pred_score[~pred_score.index.isin(last)].sort_values(ascending=False).index, n_drop + topk - len(last)
+    )
+    comb = pred_score.reindex(last.union(pd.Index(today))).sort_values(ascending=False).index
+    sell = last[last.isin(get_first_n(comb, n_drop, reverse=True))]
+    buy = today[: len(sell) + topk - len(last)]
+    return sorted(sell), sorted(buy)
+
+
+class TestTopkDropoutSelect(unittest.TestCase):
+    def test_same_as_pandas(self):
+        rng = np.random.RandomState(0)
+        for _ in range(500):
+            stock_ids = np.array([f"SH{600000 + i}" for i in rng.choice(1000, 50, replace=False)], dtype=object)
+            pred_score = pd.Series(rng.rand(len(stock_ids)), index=stock_ids)
+            pred_score[rng.rand(len(stock_ids)) < 0.2] = np.nan
+            current_stock_list = list(rng.choice(stock_ids, rng.randint(0, 15), replace=False))
+            if rng.rand() < 0.3:
+                # the held stock without score
+                current_stock_list.append("SZ000001")
+                stock_ids = np.append(stock_ids, "SZ000001")
+            topk, n_drop = rng.randint(1, 12), rng.randint(0, 5)
+            tradable = dict(zip(stock_ids, rng.rand(len(stock_ids)) < 0.7)) if rng.rand() < 0.5 else None
+
+            score = pred_score.reindex(stock_ids).values
+            held = pd.Index(stock_ids).get_indexer(current_stock_list)
+            sell, buy = topk_dropout_select(
+                score,
+                held,
+                topk,
+                n_drop,
+                tradable=None if tradable is None else lambda ids: np.array([tradable[s] for s in stock_ids[ids]]),
+                stock_ids=stock_ids,
+            )
+            expected = _select(pred_score, current_stock_list, topk, n_drop, tradable)
+            self.assertEqual((sorted(stock_ids[sell]), sorted(stock_ids[buy])), expected)
+
+    def test_lazy_tradable(self):
+        score = np.arange(1000, dtype=float)
+        checked = []
+
+        def tradable(ids):
+            checked.extend(ids)
+            return ids % 2 == 0
+
+        sell, buy = topk_dropout_select(score, np.arange(10), 10, 2, tradable=tradable)
+        np.testing.assert_array_equal(sell, [2, 0])
+        np.testing.assert_array_equal(buy, [998, 996])
+        # only the leading candidates are checked
+        self.assertLess(len(checked), 20)
+
+
+class _StaticSignal(Signal):
+    def __init__(self, score: pd.Series):
+        self.score = score
+
+    def get_signal(self, start_time, end_time):
+        return self.score
+
+
+class _StaticCalendar:
+    """the trade calendar at the last step of `times`"""
+
+    def __init__(self, times):
+        self.times = times
+
+    def get_trade_step(self):
+        return len(self.times) - 1
+
+    def get_step_time(self, trade_step=None, shift=0):
+        if trade_step is None:
+            trade_step = self.get_trade_step()
+        start_time = self.times[trade_step - shift]
+        return start_time, start_time + pd.Timedelta(days=1) - pd.Timedelta(seconds=1)
+
+    def get_freq(self):
+        return "day"
+
+
+class _DeepcopyTopkDropoutStrategy(TopkDropoutStrategy):
+    """the original implementation, which checks the stocks one by one and sells them on a copy of the position"""
+
+    def generate_trade_decision(self, execute_result=None):
+        trade_step = self.trade_calendar.get_trade_step()
+        trade_start_time, trade_end_time = self.trade_calendar.get_step_time(trade_step)
+        pred_start_time, pred_end_time = self.trade_calendar.get_step_time(trade_step, shift=1)
+        pred_score = self.signal.get_signal(start_time=pred_start_time, end_time=pred_end_time)
+        if self.only_tradable:
+
+            def get_first_n(li, n, reverse=False):
+                cur_n = 0
+                res = []
+                for si in reversed(li) if reverse else li:
+                    if self.trade_exchange.is_stock_tradable(
+                        stock_id=si, start_time=trade_start_time, end_time=trade_end_time
+                    ):
+                        res.append(si)
+                        cur_n += 1
+                        if cur_n >= n:
+                            break
+                return res[::-1] if reverse else res
+
+            def get_last_n(li, n):
+                return get_first_n(li, n, reverse=True)
+
+            def filter_stock(li):
+                return [
+                    si
+                    for si in li
+                    if self.trade_exchange.is_stock_tradable(
+                        stock_id=si, start_time=trade_start_time, end_time=trade_end_time
+                    )
+                ]
+
+        else:
+
+            def get_first_n(li, n):
+                return list(li)[:n]
+
+            def get_last_n(li, n):
+                return list(li)[-n:]
+
+            def filter_stock(li):
+                return li
+
+        current_temp = copy.deepcopy(self.trade_position)
+        sell_order_list = []
+        buy_order_list = []
+        cash = current_temp.get_cash()
+        current_stock_list = current_temp.get_stock_list()
+        last = pred_score.reindex(current_stock_list).sort_values(ascending=False).index
+        if self.method_buy == "top":
+            today = get_first_n(
+                pred_score[~pred_score.index.isin(last)].sort_values(ascending=False).index,
+                self.n_drop + self.topk - len(last),
+            )
+        else:
+            topk_candi = get_first_n(pred_score.sort_values(ascending=False).index, self.topk)
+            candi = list(filter(lambda x: x not in last, topk_candi))
+            n = self.n_drop + self.topk - len(last)
+            try:
+                today = np.random.choice(candi, n, replace=False)
+            except ValueError:
+                today = candi
+        comb = pred_score.reindex(last.union(pd.Index(today))).sort_values(ascending=False).index
+        if self.method_sell == "bottom":
+            sell = last[last.isin(get_last_n(comb, self.n_drop))]
+        else:
+            candi = filter_stock(last)
+            try:
+                sell = pd.Index(np.random.choice(candi, self.n_drop, replace=False) if len(last) else [])
+            except ValueError:
+                sell = candi
+        buy = today[: len(sell) + self.topk - len(last)]
+        for code in current_stock_list:
+            if not self.trade_exchange.is_stock_tradable(
+                stock_id=code,
+                start_time=trade_start_time,
+                end_time=trade_end_time,
+                direction=None if self.forbid_all_trade_at_limit else OrderDir.SELL,
+            ):
+                continue
+            if code in sell:
+                if current_temp.get_stock_count(code, bar=self.trade_calendar.get_freq()) < self.hold_thresh:
+                    continue
+                sell_order = Order(
+                    stock_id=code,
+                    amount=current_temp.get_stock_amount(code=code),
+                    start_time=trade_start_time,
+                    end_time=trade_end_time,
+                    direction=Order.SELL,
+                )
+                if self.trade_exchange.check_order(sell_order):
+                    sell_order_list.append(sell_order)
+                    trade_val, trade_cost, _ = self.trade_exchange.deal_order(sell_order, position=current_temp)
+                    cash += trade_val - trade_cost
+        value = cash * self.risk_degree / len(buy) if len(buy) > 0 else 0
+        for code in buy:
+            if not self.trade_exchange.is_stock_tradable(
+                stock_id=code,
+                start_time=trade_start_time,
+                end_time=trade_end_time,
+                direction=None if self.forbid_all_trade_at_limit else OrderDir.BUY,
+            ):
+                continue
+            buy_price = self.trade_exchange.get_deal_price(
+                stock_id=code, start_time=trade_start_time, end_time=trade_end_time, direction=OrderDir.BUY
+            )
+            factor = self.trade_exchange.get_factor(stock_id=code, start_time=trade_start_time, end_time=trade_end_time)
+            buy_amount = self.trade_exchange.round_amount_by_trade_unit(value / buy_price, factor)
+            buy_order_list.append(
+                Order(
+                    stock_id=code,
+                    amount=buy_amount,
+                    start_time=trade_start_time,
+                    end_time=trade_end_time,
+                    direction=Order.BUY,
+                )
+            )
+        return TradeDecisionWO(sell_order_list + buy_order_list, self)
+
+
+class TestTopkDropoutStrategy(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        if not C.registered:
+            C.set_region(REG_CN)
+        rng = np.random.RandomState(0)
+        cls.stocks = [f"SH{600000 + i}" for i in range(60)]
+        # the date of the prediction and the trading date
+        cls.times = pd.date_range("2020-01-02", periods=2)
+        index = pd.MultiIndex.from_product([cls.stocks, cls.times], names=["instrument", "datetime"])
+        quote_df = pd.DataFrame(
+            {
+                "$close": rng.rand(len(index)) * 10 + 1,
+                "$volume": rng.randint(1, 1000, len(index)) * 100.0,
+                "$factor": rng.choice([1.0, 1.5, 2.0], len(index)),
+                "$change": rng.uniform(-0.05, 0.05, len(index)),
+            },
+            index=index,
+        )
+        # the suspended, limit-up and limit-down stocks
+        state = rng.choice(4, len(index), p=[0.7, 0.1, 0.1, 0.1])
+        quote_df.loc[state == 1, "$close"] = np.nan
+        quote_df.loc[state == 2, "$change"] = 0.1
+        quote_df.loc[state == 3, "$change"] = -0.1
+        cls.exchange = StaticExchange(
+            quote_df,
+            freq="day",
+            start_time=cls.times[0],
+            end_time=cls.times[-1] + pd.Timedelta(days=1),
+            limit_threshold=0.095,
+            open_cost=0.0005,
+            close_cost=0.0015,
+            min_cost=5,
+            trade_unit=100,
+        )
+        cls.calendar = _StaticCalendar(cls.times)
+
+    def _position(self, position_cls, rng):
+        position_dict = {}
+        for code in rng.choice(self.stocks, rng.randint(0, 16), replace=False):
+            position_dict[code] = {"amount": rng.randint(1, 50) * 100.0, "price": 5.0}
+            if rng.rand() < 0.8:
+                position_dict[code]["count_day"] = rng.randint(1, 4)
+        position = position_cls(cash=rng.rand() * 1e6, position_dict=position_dict)
+        position.settle_start(rng.choice([position.ST_NO, position.ST_CASH]))
+        return position
+
+    def _decide(self, strategy_cls, position, score, seed, **kwargs):
+        strategy = strategy_cls(
+            signal=_StaticSignal(score),
+            trade_exchange=self.exchange,
+            level_infra=LevelInfrastructure(trade_calendar=self.calendar),
+            common_infra=CommonInfrastructure(trade_account=SimpleNamespace(current_position=position)),
+            **kwargs,
+        )
+        np.random.seed(seed)
+        return [(o.stock_id, o.amount, o.direction) for o in strategy.generate_trade_decision().get_decision()]
+
+    def test_same_as_deepcopy(self):
+        rng = np.random.RandomState(1)
+        n_orders = 0
+        for seed in range(300):
+            score = pd.Series(rng.rand(50), index=rng.choice(self.stocks, 50, replace=False))
+            score[rng.rand(len(score)) < 0.1] = np.nan
+            kwargs = {
+                "topk": rng.randint(1, 15),
+                "n_drop": rng.randint(0, 6),
+                "method_buy": rng.choice(["top", "random"]),
+                "method_sell": rng.choice(["bottom", "random"]),
+                "hold_thresh": rng.randint(1, 4),
+                "only_tradable": rng.rand() < 0.5,
+                "forbid_all_trade_at_limit": rng.rand() < 0.5,
+            }
+            position_cls = [Position, ArrayPosition][seed % 2]
+            position = self._position(position_cls, np.random.RandomState(seed))
+            state = copy.deepcopy(position.position)
+
+            orders = self._decide(TopkDropoutStrategy, position, score, seed, **kwargs)
+            expected = self._decide(_DeepcopyTopkDropoutStrategy, position, score, seed, **kwargs)
+            self.assertEqual(orders, expected, kwargs)
+            # the position is only read
+            self.assertEqual(position.position, state)
+            n_orders += len(orders)
+        self.assertGreater(n_orders, 0)
+
+    def test_selling_position(self):
+        t0, t1 = self.calendar.get_step_time(1)
+        for position_cls in Position, ArrayPosition:
+            for settle_type in Position.ST_NO, Position.ST_CASH:
+                position = position_cls(
+                    cash=1e4, position_dict={code: {"amount": 1000.0, "price": 5.0} for code in self.stocks[:20]}
+                )
+                position.settle_start(settle_type)
+                orders = [
+                    Order(code, 1000.0, OrderDir.SELL, t0, t1)
+                    for code, tradable in zip(self.stocks[:20], self.exchange.tradable_mask(self.stocks[:20], t0, t1))
+                    if tradable
+                ]
+                selling = _SellingPosition(position)
+                self.exchange.deal_orders(orders, position=selling)
+                expected = copy.deepcopy(position)
+                for order in orders:
+                    self.exchange.deal_order(order, position=expected)
+                self.assertAlmostEqual(selling.get_cash(), expected.get_cash())
+                if settle_type == Position.ST_CASH:
+                    # the cash of selling can't be used before settlement
+                    self.assertEqual(selling.get_cash(), 1e4)
+                else:
+                    self.assertGreater(selling.get_cash(), 1e4)
+                # the position is not changed
+                self.assertEqual(position.get_cash(), 1e4)
+                self.assertEqual(position.get_stock_amount(self.stocks[0]), 1000.0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -4,10 +4,12 @@
 import sys
 import unittest
 import qlib
+import numpy as np
+import pandas as pd
 from pathlib import Path
 
 sys.path.append(str(Path(__file__).resolve().parent))
-from qlib.data.dataset.loader import NestedDataLoader, QlibDataLoader
+from qlib.data.dataset.loader import NestedDataLoader, QlibDataLoader, StaticDataLoader
 from qlib.data.dataset.handler import DataHandlerLP
 from qlib.contrib.data.loader import Alpha158DL, Alpha360DL
 from qlib.data.dataset.processor import Fillna
@@ -85,5 +87,29 @@ class TestDataLoader(unittest.TestCase):
         """
 
 
+class TestNestedDataLoaderAlign(unittest.TestCase):
+    def test_align(self):
+        np.random.seed(0)
+        index = pd.MultiIndex.from_product(
+            [pd.date_range("2020-01-01", periods=5), ["SH600000", "SH600001", "SH600002"]],
+            names=["datetime", "instrument"],
+        )
+        df1 = pd.DataFrame(
+            np.random.randn(len(index), 2),
+            index=index,
+            columns=pd.MultiIndex.from_tuples([("feature", "a"), ("feature", "b")]),
+        )
+        df2 = pd.DataFrame(
+            np.random.randn(len(index) - 3, 2),
+            index=index[3:],
+            columns=pd.MultiIndex.from_tuples([("feature", "b"), ("label", "LABEL0")]),
+        )
+        for join in "left", "right", "inner", "outer":
+            nd = NestedDataLoader([StaticDataLoader(df1), StaticDataLoader(df2)], join=join)
+            # the result of merging the data one by one
+            expected = pd.merge(df1.drop(columns=[("feature", "b")]), df2, left_index=True, right_index=True, how=join)
+            pd.testing.assert_frame_equal(nd.load().sort_index(), expected.sort_index(axis=1).sort_index())
+
+
 if __name__ == "__main__":
     unittest.main()
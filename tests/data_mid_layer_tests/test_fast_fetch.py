@@ -0,0 +1,75 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License.
+import pickle
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from qlib.data.dataset.handler import DataHandlerLP
+from qlib.data.dataset.utils import RowOffsetIndex, fetch_df_by_col, fetch_df_by_index
+
+
+class TestFastFetch(unittest.TestCase):
+    def setUp(self):
+        np.random.seed(0)
+        dates = pd.date_range("2020-01-01", periods=50, freq="B")
+        index = pd.MultiIndex.from_product([dates, [f"SH{i:06d}" for i in range(10)]], names=["datetime", "instrument"])
+        columns = pd.MultiIndex.from_tuples([("feature", "f0"), ("feature", "f1"), ("label", "LABEL0")])
+        df = pd.DataFrame(np.random.randn(len(index), 3), index=index, columns=columns)
+        # some instruments miss some days
+        self.df = df.iloc[np.random.rand(len(df)) > 0.1]
+        self.hd = DataHandlerLP.from_df(self.df)
+
+    def test_fetch(self):
+        selectors = [
+            (slice("2020-01-10", "2020-02-05"), "datetime"),
+            (slice(None, "2020-02"), "datetime"),
+            (slice(pd.Timestamp("2020-01-04"), None), "datetime"),
+            (pd.Timestamp("2020-01-13"), "datetime"),
+            ("2020-01-14", "datetime"),
+            (slice("2021-01-01", "2021-02-01"), "datetime"),
+            ("SH000003", "instrument"),
+            (slice(None, None), "datetime"),
+        ]
+        for selector, level in selectors:
+            for col_set in DataHandlerLP.CS_ALL, DataHandlerLP.CS_RAW, "feature":
+                expected = fetch_df_by_index(fetch_df_by_col(self.df, col_set), selector, level)
+                pd.testing.assert_frame_equal(self.hd.fetch(selector, level=level, col_set=col_set), expected)
+
+        # `.loc` on the original data keeps the order of the instruments
+        insts = pd.Index(["SH000005", "SH000001"])
+        expected = self.df.loc[pd.IndexSlice[:, insts], :].droplevel(0, axis=1)
+        pd.testing.assert_frame_equal(self.hd.fetch(insts, level="instrument"), expected)
+
+        # the unsorted data will fall back to `.loc`
+        self.assertFalse(RowOffsetIndex.is_applicable(self.df.iloc[::-1]))
+
+    def test_stale_row_index(self):
+        slc = slice("2020-01-10", "2020-02-05")
+        self.hd.fetch(slc)
+        # a new dataframe with the same length but a different index (e.g. after re-setup or update)
+        df = self.df.copy()
+        df.index = df.index.set_levels(df.index.levels[0] + pd.Timedelta(days=7), level=0)
+        for _ in range(2):
+            self.hd._infer = df.copy()
+            pd.testing.assert_frame_equal(
+                self.hd.fetch(slc), fetch_df_by_index(df, slc, "datetime").droplevel(0, axis=1)
+            )
+        # the index replaced in place
+        self.hd._infer.index = self.df.index
+        pd.testing.assert_frame_equal(
+            self.hd.fetch(slc), fetch_df_by_index(df.set_axis(self.df.index), slc, "datetime").droplevel(0, axis=1)
+        )
+        # the entries of the released dataframes are removed
+        self.hd._infer = self.df
+        self.hd.fetch(slc)
+        self.assertEqual(len(self.hd._row_index_cache), 1)
+        # the cache is not dumped
+        self.hd.config(dump_all=True)
+        hd = pickle.loads(pickle.dumps(self.hd))
+        pd.testing.assert_frame_equal(hd.fetch(slc), self.hd.fetch(slc))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,137 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License.
+import os
+import shutil
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+import numpy as np
+import pandas as pd
+
+from qlib.data.dataset import cache as cache_module
+from qlib.data.dataset.cache import DiskHandlerCache
+from qlib.data.dataset.handler import DataHandlerLP
+from qlib.data.dataset.loader import DataLoader, StaticDataLoader
+
+
+class CountingDataLoader(DataLoader):
+    """Load data from a dataframe in memory and record the queried time ranges"""
+
+    def __init__(self, df: pd.DataFrame):
+        self._df = df
+        self._queries = []
+
+    def load(self, instruments=None, start_time=None, end_time=None) -> pd.DataFrame:
+        self._queries.append((start_time, end_time))
+        dt = self._df.index.get_level_values("datetime")
+        mask = np.ones(len(dt), dtype=bool)
+        if start_time is not None:
+            mask &= dt >= pd.Timestamp(start_time)
+        if end_time is not None:
+            mask &= dt <= pd.Timestamp(end_time)
+        return self._df[mask]
+
+
+class TestHandlerCache(unittest.TestCase):
+    def setUp(self):
+        self.cache_dir = tempfile.mkdtemp()
+        np.random.seed(0)
+        dates = pd.date_range("2020-01-01", periods=100, freq="B")
+        index = pd.MultiIndex.from_product([dates, [f"SH{i:06d}" for i in range(20)]], names=["datetime", "instrument"])
+        columns = pd.MultiIndex.from_tuples([("feature", "f0"), ("feature", "f1"), ("label", "LABEL0")])
+        self.df = pd.DataFrame(np.random.randn(len(index), 3), index=index, columns=columns)
+        self.df.iloc[::7, 2] = np.nan
+
+    def tearDown(self):
+        shutil.rmtree(self.cache_dir)
+
+    def get_handler(self, end_time, loader, cache=True):
+        return DataHandlerLP(
+            start_time=self.df.index[0][0],
+            end_time=end_time,
+            data_loader=loader,
+            infer_processors=[
+                {"class": "ZScoreNorm", "kwargs": {"fit_start_time": "2020-01-01", "fit_end_time": "2020-02-28"}},
+                {"class": "Fillna", "kwargs": {"fields_group": "feature"}},
+            ],
+            learn_processors=[{"class": "DropnaLabel"}, {"class": "CSRankNorm", "kwargs": {"fields_group": "label"}}],
+            cache=self.cache_dir if cache else None,
+        )
+
+    def test_tail_extension(self):
+        dates = self.df.index.get_level_values("datetime").unique()
+        loader = CountingDataLoader(self.df)
+        self.get_handler(dates[59], loader)
+
+        # the processed data of the longer range is extended by the tail only
+        hd = self.get_handler(dates[-1], loader)
+        self.assertEqual(len(loader._queries), 2)
+        self.assertEqual(pd.Timestamp(loader._queries[-1][0]), dates[60 - 10])
+
+        expected = self.get_handler(dates[-1], CountingDataLoader(self.df), cache=False)
+        for key in DataHandlerLP.DK_R, DataHandlerLP.DK_I, DataHandlerLP.DK_L:
+            pd.testing.assert_frame_equal(hd.fetch(data_key=key), expected.fetch(data_key=key))
+
+        # fully covered
+        hd = self.get_handler(dates[-1], loader)
+        self.assertEqual(len(loader._queries), 2)
+        pd.testing.assert_frame_equal(
+            hd.fetch(data_key=DataHandlerLP.DK_L), expected.fetch(data_key=DataHandlerLP.DK_L)
+        )
+
+        # the processors are refitted if the processed data can't be reused
+        hd = self.get_handler(dates[30], loader)
+        self.assertEqual(len(loader._queries), 2)
+        expected = self.get_handler(dates[30], CountingDataLoader(self.df), cache=False)
+        pd.testing.assert_frame_equal(
+            hd.fetch(data_key=DataHandlerLP.DK_I), expected.fetch(data_key=DataHandlerLP.DK_I)
+        )
+
+    def test_key(self):
+        cache = DiskHandlerCache(self.cache_dir)
+        handlers = [
+            DataHandlerLP(data_loader=StaticDataLoader(df), cache=cache)
+            for df in [self.df, self.df.copy(), self.df * 2, self.df.iloc[:-1]]
+        ]
+        keys = [cache.raw_key(hd) for hd in handlers]
+        # the data of the loaders are a part of the key
+        self.assertEqual(keys[0], keys[1])
+        self.assertEqual(len(set(keys)), 3)
+        np.testing.assert_array_equal(handlers[2].fetch().values, (self.df * 2).values)
+
+        # the loaders with functions are not cached
+        loader = CountingDataLoader(self.df)
+        loader.filter = lambda df: df
+        hd = DataHandlerLP(data_loader=loader, cache=cache)
+        self.assertIsNone(cache.raw_key(hd))
+        self.assertIsNone(cache.proc_key(hd))
+        np.testing.assert_array_equal(hd.fetch().values, self.df.values)
+        self.assertEqual(len(os.listdir(Path(self.cache_dir, DiskHandlerCache.RAW_DIR))), 3)
+
+    def test_data_version(self):
+        data_dir = Path(self.cache_dir, "data")
+        for sub, name, content in ("calendars", "day.txt", "2020-01-02\n"), ("instruments", "all.txt", "SH600000\n"):
+            data_dir.joinpath(sub).mkdir(parents=True)
+            data_dir.joinpath(sub, name).write_text(content)
+        config = mock.MagicMock(registered=True)
+        config.get.side_effect = {"provider_uri": {"day": str(data_dir)}, "region": "cn"}.get
+        config.dpm.provider_uri = {"day": str(data_dir)}
+        config.dpm.get_data_uri.return_value = data_dir
+        with mock.patch.object(cache_module, "C", config):
+            version = DiskHandlerCache.data_version()
+            self.assertEqual(version[-2][-1], "2020-01-02")
+            # the data are updated
+            with data_dir.joinpath("calendars", "day.txt").open("a") as f:
+                f.write("2020-01-03\n")
+            new_version = DiskHandlerCache.data_version()
+            self.assertNotEqual(new_version, version)
+            self.assertEqual(new_version[-2][-1], "2020-01-03")
+            # another region
+            config.get.side_effect = {"provider_uri": {"day": str(data_dir)}, "region": "us"}.get
+            self.assertNotEqual(DiskHandlerCache.data_version(), new_version)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,102 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License.
+import gc
+import pickle
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from qlib.data.dataset import DatasetH, TSDatasetH
+from qlib.data.dataset.handler import DataHandlerLP
+from qlib.data.dataset.loader import StaticDataLoader
+from qlib.data.dataset.storage import DiskChunkedStorage
+
+
+class TestChunkedHandler(unittest.TestCase):
+    def setUp(self):
+        self.chunk_dir = tempfile.mkdtemp()
+        np.random.seed(0)
+        dates = pd.date_range("2020-01-01", periods=120, freq="B")
+        index = pd.MultiIndex.from_product([dates, [f"SH{i:06d}" for i in range(10)]], names=["datetime", "instrument"])
+        columns = pd.MultiIndex.from_tuples([("feature", "f0"), ("feature", "f1"), ("label", "LABEL0")])
+        self.df = pd.DataFrame(np.random.randn(len(index), 3), index=index, columns=columns)
+        self.df.iloc[::7, 2] = np.nan
+
+    def tearDown(self):
+        shutil.rmtree(self.chunk_dir)
+
+    def get_handler(self, **kwargs):
+        return DataHandlerLP(
+            start_time="2020-01-01",
+            end_time="2020-06-30",
+            data_loader=StaticDataLoader(self.df),
+            infer_processors=[
+                {"class": "ZScoreNorm", "kwargs": {"fit_start_time": "2020-01-01", "fit_end_time": "2020-02-28"}},
+                {"class": "Fillna", "kwargs": {"fields_group": "feature"}},
+            ],
+            learn_processors=[{"class": "DropnaLabel"}, {"class": "CSRankNorm", "kwargs": {"fields_group": "label"}}],
+            **kwargs,
+        )
+
+    def test_chunked_handler(self):
+        hd = self.get_handler(chunk_freq="MS", chunk_dir=self.chunk_dir)
+        self.assertIsInstance(hd._infer, DiskChunkedStorage)
+        self.assertEqual(len(hd._infer.chunk_paths), 6)
+        expected = self.get_handler()
+
+        for key in DataHandlerLP.DK_R, DataHandlerLP.DK_I, DataHandlerLP.DK_L:
+            pd.testing.assert_frame_equal(hd.fetch(data_key=key), expected.fetch(data_key=key))
+            slc = slice("2020-02-15", "2020-03-31")
+            pd.testing.assert_frame_equal(hd.fetch(slc, data_key=key), expected.fetch(slc, data_key=key))
+        self.assertEqual(hd.get_cols(), expected.get_cols())
+
+        segments = {"train": ("2020-01-01", "2020-03-31"), "test": ("2020-04-01", "2020-06-30")}
+        ds = DatasetH(hd, segments)
+        pd.testing.assert_frame_equal(
+            ds.prepare("test", data_key=DataHandlerLP.DK_L),
+            DatasetH(expected, segments).prepare("test", data_key=DataHandlerLP.DK_L),
+        )
+        tsds = TSDatasetH(handler=hd, segments=segments, step_len=5).prepare("test")
+        expected_tsds = TSDatasetH(handler=expected, segments=segments, step_len=5).prepare("test")
+        self.assertEqual(len(tsds), len(expected_tsds))
+        np.testing.assert_array_equal(tsds[len(tsds) - 1], expected_tsds[len(expected_tsds) - 1])
+
+    def test_tmp_chunk_dir(self):
+        hd = self.get_handler(chunk_freq="MS")
+        chunk_dir = hd._infer.chunk_dir
+        self.assertTrue(chunk_dir.exists())
+        # re-setup creates a new directory and removes the old one
+        hd.setup_data()
+        self.assertFalse(chunk_dir.exists())
+        chunk_dir = hd._infer.chunk_dir
+        del hd
+        gc.collect()
+        self.assertFalse(chunk_dir.exists())
+
+        hd = self.get_handler(chunk_freq="MS")
+        chunk_dir = hd._infer.chunk_dir
+        hd.close()
+        self.assertFalse(chunk_dir.exists())
+
+    def test_dump(self):
+        # the chunks in the temporary directory are removed with the handler. So they can't be dumped
+        hd = self.get_handler(chunk_freq="MS")
+        hd.config(dump_all=True)
+        with self.assertRaises(ValueError):
+            pickle.dumps(hd)
+
+        # the chunks in `chunk_dir` outlive the handler
+        hd = self.get_handler(chunk_freq="MS", chunk_dir=self.chunk_dir)
+        hd.config(dump_all=True)
+        expected = hd.fetch(data_key=DataHandlerLP.DK_L)
+        data = pickle.dumps(hd)
+        del hd
+        gc.collect()
+        pd.testing.assert_frame_equal(pickle.loads(data).fetch(data_key=DataHandlerLP.DK_L), expected)
+
+
+if __name__ == "__main__":
+    unittest.main()
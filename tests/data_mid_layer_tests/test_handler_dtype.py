@@ -0,0 +1,84 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License.
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from qlib.data.dataset import DatasetH, TSDatasetH
+from qlib.data.dataset.handler import DataHandlerLP
+from qlib.data.dataset.loader import StaticDataLoader
+from qlib.data.dataset.utils import cast_float_dtype
+
+
+class TestHandlerDtype(unittest.TestCase):
+    def setUp(self):
+        np.random.seed(0)
+        dates = pd.date_range("2020-01-01", periods=60, freq="B")
+        index = pd.MultiIndex.from_product([dates, [f"SH{i:06d}" for i in range(10)]], names=["datetime", "instrument"])
+        columns = pd.MultiIndex.from_tuples([("feature", "f0"), ("feature", "f1"), ("label", "LABEL0")])
+        self.df = pd.DataFrame(np.random.randn(len(index), 3).astype(np.float32), index=index, columns=columns)
+        self.segments = {"train": ("2020-01-01", "2020-02-28"), "test": ("2020-03-01", "2020-03-31")}
+
+    def get_handler(self, **kwargs):
+        return DataHandlerLP(
+            start_time="2020-01-01",
+            end_time="2020-03-31",
+            data_loader=StaticDataLoader(self.df),
+            infer_processors=[
+                {"class": "ZScoreNorm", "kwargs": {"fit_start_time": "2020-01-01", "fit_end_time": "2020-02-28"}},
+                {"class": "Fillna", "kwargs": {"fields_group": "feature"}},
+            ],
+            # CSRankNorm will upcast the label to float64
+            learn_processors=[{"class": "DropnaLabel"}, {"class": "CSRankNorm", "kwargs": {"fields_group": "label"}}],
+            **kwargs,
+        )
+
+    def test_cast_float_dtype(self):
+        df = self.df.copy()
+        df[("feature", "flag")] = True
+        self.assertIs(cast_float_dtype(df, None), df)
+        self.assertIs(cast_float_dtype(df, "float32"), df)
+        res = cast_float_dtype(df, {"feature": "float16"})
+        self.assertEqual(res[("feature", "f0")].dtype, np.float16)
+        self.assertEqual(res[("label", "LABEL0")].dtype, np.float32)
+        self.assertEqual(res[("feature", "flag")].dtype, bool)
+        self.assertEqual(cast_float_dtype(df, "float16", at_least=np.float32)[("feature", "f0")].dtype, np.float32)
+
+    def test_handler_dtype(self):
+        default = self.get_handler()
+        self.assertEqual(default._learn[("label", "LABEL0")].dtype, np.float64)
+
+        hd = self.get_handler(dtype="float32")
+        for key in DataHandlerLP.DK_I, DataHandlerLP.DK_L:
+            self.assertTrue((hd.fetch(data_key=key).dtypes == np.float32).all())
+            pd.testing.assert_frame_equal(
+                hd.fetch(data_key=key), default.fetch(data_key=key).astype(np.float32), check_exact=False
+            )
+
+        hd16 = self.get_handler(dtype={"feature": "float16", "label": "float32"})
+        learn = hd16.fetch(col_set=DataHandlerLP.CS_RAW, data_key=DataHandlerLP.DK_L)
+        self.assertEqual(learn[("feature", "f0")].dtype, np.float16)
+        self.assertEqual(learn[("label", "LABEL0")].dtype, np.float32)
+        np.testing.assert_allclose(
+            learn["feature"].values.astype(np.float32),
+            hd.fetch(col_set="feature", data_key=DataHandlerLP.DK_L).values,
+            atol=1e-2,
+        )
+        # the raw data is not affected
+        self.assertTrue((hd16.fetch(data_key=DataHandlerLP.DK_R).dtypes == np.float32).all())
+
+    def test_dataset_dtype(self):
+        hd = self.get_handler(dtype={"feature": "float16"})
+        df = DatasetH(hd, self.segments).prepare("train", col_set=["feature", "label"], data_key=DataHandlerLP.DK_L)
+        self.assertEqual(df[("feature", "f0")].dtype, np.float16)
+        df = DatasetH(hd, self.segments).prepare("train", data_key=DataHandlerLP.DK_L, dtype="float32")
+        self.assertTrue((df.dtypes == np.float32).all())
+
+        tsds = TSDatasetH(handler=self.get_handler(dtype="float16"), segments=self.segments, step_len=5)
+        self.assertEqual(tsds.prepare("test").data_arr.dtype, np.float16)
+        self.assertEqual(tsds.prepare("test", dtype=np.float32).data_arr.dtype, np.float32)
+
+
+if __name__ == "__main__":
+    unittest.main()
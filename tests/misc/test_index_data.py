@@ -112,6 +112,25 @@ class IndexDataTest(unittest.TestCase):
         with self.assertRaises(TypeError):
             sd = idd.SingleData([1, 2, 3], index=timeindex)
 
+    def test_reindex_and_sum(self):
+        sd = idd.SingleData([1, 2, np.nan], index=["foo", "bar", "f"])
+        new_sd = sd.reindex(idd.Index(["f", "g", "bar"]), fill_value=0)
+        np.testing.assert_array_equal(new_sd.data, [np.nan, 0, 2])
+        self.assertEqual(new_sd.index.tolist(), ["f", "g", "bar"])
+
+        # reindex by the time with another precision
+        sd = idd.SingleData([1, 2], index=[np.datetime64("2024-06-20T00:00:00"), np.datetime64("2024-06-21T00:00:00")])
+        new_sd = sd.reindex(idd.Index(pd.to_datetime(["2024-06-21", "2024-06-22"])))
+        np.testing.assert_array_equal(new_sd.data, [2, np.nan])
+
+        sd_sum = idd.sum_by_index(
+            [idd.SingleData([1, np.nan], index=["foo", "bar"]), idd.SingleData([3, 4], index=["bar", "g"])],
+            ["bar", "foo", "g"],
+            fill_value=0.5,
+        )
+        self.assertEqual(sd_sum.index.tolist(), ["bar", "foo", "g"])
+        np.testing.assert_array_equal(sd_sum.data, [3.5, 1.5, 4.5])
+
     def test_ops(self):
         sd1 = idd.SingleData([1, 2, 3, 4], index=["foo", "bar", "f", "g"])
         sd2 = idd.SingleData([1, 2, 3, 4], index=["foo", "bar", "f", "g"])
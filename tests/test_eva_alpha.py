@@ -0,0 +1,133 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License.
+
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from qlib.contrib.eva.alpha import (
+    calc_all_ic,
+    calc_ic,
+    calc_long_short_prec,
+    calc_long_short_return,
+    calc_quantile_analysis,
+)
+
+
+class AlphaTestBase(unittest.TestCase):
+    """the predictions and labels shared by the tests"""
+
+    def setUp(self):
+        np.random.seed(0)
+        index = pd.MultiIndex.from_product(
+            [pd.date_range("2020-01-01", periods=20), [f"SH6000{i:02d}" for i in range(50)]],
+            names=["datetime", "instrument"],
+        )
+        self.label = pd.Series(np.random.randn(len(index)), index=index)
+        self.label[np.random.rand(len(index)) < 0.1] = np.nan
+        self.label.loc["2020-01-03"] = 1.0  # no variance
+        pred = pd.DataFrame(
+            {
+                "score": self.label.values * 0.1 + np.random.randn(len(index)),
+                "rounded": np.round(np.random.randn(len(index)), 1),  # with ties
+            },
+            index=index,
+        )
+        pred.loc["2020-01-05", "score"] = np.nan
+        self.pred = pred.sample(frac=1, random_state=0)  # unsorted
+
+
+class TestCalcIC(AlphaTestBase):
+    @staticmethod
+    def _groupby_ic(pred, label):
+        df = pd.DataFrame({"pred": pred, "label": label})
+        ic = df.groupby("datetime").apply(lambda df: df["pred"].corr(df["label"]))
+        ric = df.groupby("datetime").apply(lambda df: df["pred"].corr(df["label"], method="spearman"))
+        return ic, ric
+
+    def test_calc_ic(self):
+        ic_df, ric_df = calc_ic(self.pred, self.label)
+        for col in self.pred.columns:
+            expected_ic, expected_ric = self._groupby_ic(self.pred[col], self.label)
+            ic, ric = calc_ic(self.pred[col], self.label)
+            self.assertTrue(ic.index.equals(expected_ic.index))
+            np.testing.assert_allclose(ic.values, expected_ic.values, atol=1e-12)
+            np.testing.assert_allclose(ric.values, expected_ric.values, atol=1e-12)
+            np.testing.assert_allclose(ic_df[col].values, ic.values)
+            np.testing.assert_allclose(ric_df[col].values, ric.values)
+        self.assertTrue(np.isnan(ic_df.loc["2020-01-03"]).all())
+        self.assertTrue(np.isnan(ic_df.loc["2020-01-05", "score"]))
+
+        ic, ric = calc_ic(self.pred["score"], self.label, dropna=True)
+        self.assertEqual(len(ic), 18)
+
+    def test_calc_all_ic(self):
+        pred_dict = {"score": self.pred["score"], "rounded": self.pred["rounded"].iloc[:100]}
+        res = calc_all_ic(pred_dict, self.label, dropna=True)
+        for k, pred in pred_dict.items():
+            expected_ic, expected_ric = self._groupby_ic(pred, self.label)
+            np.testing.assert_allclose(res[k]["ic"].values, expected_ic.dropna().values, atol=1e-12)
+            np.testing.assert_allclose(res[k]["ric"].values, expected_ric.dropna().values, atol=1e-12)
+
+    def test_empty(self):
+        pred, label = self.pred.iloc[:0], self.label.iloc[:0]
+        ic, ric = calc_ic(pred["score"], label)
+        self.assertTrue(isinstance(ic, pd.Series) and ic.empty and ric.empty)
+        ic_df, ric_df = calc_ic(pred, label, dropna=True)
+        self.assertTrue(ic_df.empty and ric_df.empty)
+        self.assertEqual(ic_df.columns.tolist(), pred.columns.tolist())
+        res = calc_all_ic({"score": pred["score"]}, label)
+        self.assertTrue(res["score"]["ic"].empty and res["score"]["ric"].empty)
+
+
+class TestQuantileAnalysis(AlphaTestBase):
+    def test_long_short(self):
+        pred = self.pred["rounded"]
+        df = pd.DataFrame({"pred": pred, "label": self.label})
+        group = df.groupby(level="datetime")
+        N = lambda x: int(len(x) * 0.2)
+        # the ties are selected by the order and the NaN predictions are selected after the others
+        long = group.apply(lambda x: x.nlargest(N(x), columns="pred").label)
+        short = group.apply(lambda x: x.nsmallest(N(x), columns="pred").label)
+
+        long_pre, short_pre = calc_long_short_prec(pred, self.label)
+        np.testing.assert_allclose(
+            long_pre.values, (long > 0).groupby("datetime").sum() / long.groupby("datetime").count()
+        )
+        np.testing.assert_allclose(
+            short_pre.values, (short < 0).groupby("datetime").sum() / short.groupby("datetime").count()
+        )
+        long_short_r, avg_r = calc_long_short_return(pred, self.label)
+        np.testing.assert_allclose(
+            long_short_r.values, (long.groupby("datetime").mean() - short.groupby("datetime").mean()).values / 2
+        )
+        np.testing.assert_allclose(avg_r.values, group["label"].mean().values)
+
+    def test_groups(self):
+        res = calc_quantile_analysis(self.pred, self.label, n_groups=5)
+        self.assertEqual(
+            res["group_r"].columns.tolist(), [(c, f"Group{i}") for c in self.pred.columns for i in range(1, 6)]
+        )
+        for col in self.pred.columns:
+            df = pd.DataFrame({"pred": self.pred[col], "label": self.label}).dropna(subset=["pred"])
+            df = df.sort_values("pred", ascending=False, kind="stable")
+            for i in range(5):
+                expected = df.groupby(level="datetime")["label"].apply(
+                    lambda x: x[len(x) // 5 * i : len(x) // 5 * (i + 1)].mean()  # pylint: disable=W0640
+                )
+                group_r = res["group_r"][(col, f"Group{i + 1}")]
+                # the dates are aligned among the signals
+                self.assertTrue(group_r.drop(expected.index).isna().all())
+                np.testing.assert_allclose(group_r.loc[expected.index].values, expected.values)
+
+    def test_empty(self):
+        pred, label = self.pred.iloc[:0], self.label.iloc[:0]
+        for p in pred["score"], pred:
+            res = calc_quantile_analysis(p, label, n_groups=5)
+            self.assertEqual(list(res), ["long_pre", "short_pre", "long_short_r", "avg_r", "group_r"])
+            self.assertTrue(all(v.empty for v in res.values()))
+
+
+if __name__ == "__main__":
+    unittest.main()
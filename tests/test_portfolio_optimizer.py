@@ -0,0 +1,79 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License.
+
+import unittest
+import numpy as np
+import pandas as pd
+
+from qlib.contrib.strategy.optimizer import PortfolioOptimizer, StructuredCovariance
+from qlib.model.riskmodel import StructuredCovEstimator
+
+
+class TestPortfolioOptimizer(unittest.TestCase):
+    NUM_VARIABLE = 50
+    NUM_OBSERVATION = 200
+
+    def setUp(self):
+        np.random.seed(0)
+        X = np.random.randn(self.NUM_OBSERVATION, self.NUM_VARIABLE) * 0.02
+        X += np.random.randn(self.NUM_OBSERVATION, 1) * 0.01  # the market factor
+        estimator = StructuredCovEstimator(num_factors=5)
+        # NOTE: X is scaled inplace by `predict`
+        self.components = estimator.predict(X.copy(), is_price=False, return_decomposed_components=True)
+        self.S = estimator.predict(X.copy(), is_price=False)
+        self.r = np.random.randn(self.NUM_VARIABLE)
+
+    def test_structured_covariance(self):
+        S = StructuredCovariance(*self.components)
+        x = np.random.rand(self.NUM_VARIABLE)
+        np.testing.assert_allclose(S.to_dense(), self.S)
+        np.testing.assert_allclose(S @ x, self.S @ x)
+        np.testing.assert_allclose(x @ S @ x, x @ self.S @ x)
+        np.testing.assert_allclose(S.diagonal(), np.diag(self.S))
+
+    def test_structured_solver(self):
+        for method in ["gmv", "mvo", "rp", "inv"]:
+            for alpha in [0, 0.01]:
+                kwargs = {"method": method, "lamb": 1, "alpha": alpha, "scale_return": False}
+                optimizer = PortfolioOptimizer(**kwargs)
+                structured_optimizer = PortfolioOptimizer(solver="structured", **kwargs)
+                r = self.r if method == "mvo" else None
+                w = optimizer(self.S, r)
+                structured_w = structured_optimizer(self.components, r)
+                self.assertIsNotNone(structured_optimizer.solve_time)
+                self.assertAlmostEqual(structured_w.sum(), 1)
+                self.assertGreaterEqual(structured_w.min(), 0)
+
+                if method == "inv":
+                    np.testing.assert_allclose(structured_w, w)
+                    continue
+                # the solution is not worse than the one of the scipy solver
+                if method == "mvo":
+                    obj = optimizer._get_objective_mvo(self.S, r)
+                else:
+                    obj = getattr(optimizer, f"_get_objective_{method}")(self.S)
+                self.assertLessEqual(
+                    obj(structured_w) + alpha * structured_w @ structured_w, obj(w) + alpha * w @ w + 1e-8
+                )
+
+    def test_warm_start(self):
+        index = pd.Index([f"SH6000{i:02d}" for i in range(self.NUM_VARIABLE)])
+        F, cov_b, var_u = self.components
+        optimizer = PortfolioOptimizer("gmv", solver="structured", warm_start=True)
+        w = optimizer((pd.DataFrame(F, index=index), cov_b, var_u))
+        self.assertTrue(w.index.equals(index))
+
+        # the stocks are changed on the next day
+        index = index[5:].append(pd.Index(["SH600100"]))
+        F = np.concatenate([F[5:], F[:1]])
+        var_u = np.concatenate([var_u[5:], var_u[:1]])
+        x0 = optimizer._get_init_weights(len(index), index)
+        self.assertEqual(x0[-1], 0)
+        self.assertAlmostEqual(x0.sum(), 1)
+        w = optimizer((pd.DataFrame(F, index=index), cov_b, var_u))
+        expected = PortfolioOptimizer("gmv", solver="structured")((F, cov_b, var_u))
+        np.testing.assert_allclose(w.values, expected, atol=1e-6)
+
+
+if __name__ == "__main__":
+    unittest.main()
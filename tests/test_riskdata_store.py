@@ -0,0 +1,105 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License.
+
+import shutil
+import tempfile
+import unittest
+from pathlib import Path
+
+import cvxpy as cp
+import numpy as np
+import pandas as pd
+
+from qlib.contrib.strategy.optimizer import EnhancedIndexingOptimizer
+from qlib.model.riskmodel import RiskDataStore
+
+
+class TestRiskDataStore(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = Path(tempfile.mkdtemp())
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_from_riskmodel_root(self):
+        np.random.seed(0)
+        riskmodel_root = self.tmp_dir / "riskdata"
+        instruments = [f"SH6000{i:02d}" for i in range(20)]
+        expected = {}
+        for date in pd.date_range("2020-01-01", periods=5, freq="B"):
+            root = riskmodel_root / date.strftime("%Y%m%d")
+            root.mkdir(parents=True)
+            universe = sorted(np.random.choice(instruments, 15, replace=False).tolist())
+            factor_exp = pd.DataFrame(np.random.randn(15, 3), index=universe)
+            factor_cov = pd.DataFrame(np.cov(np.random.randn(3, 50)))
+            # the specific risk of a stock is missing
+            specific_risk = pd.Series(np.random.rand(14), index=universe[1:])
+            factor_exp.to_pickle(root / "factor_exp.pkl")
+            factor_cov.to_pickle(root / "factor_cov.pkl")
+            specific_risk.to_pickle(root / "specific_risk.pkl")
+            blacklist = [universe[0], "SH600100"]
+            pd.DataFrame(index=blacklist).to_pickle(root / "blacklist.pkl")
+            expected[date] = (
+                factor_exp.values,
+                factor_cov.values,
+                specific_risk.reindex(universe, fill_value=specific_risk.max()).values,
+                universe,
+                [universe[0]],
+            )
+
+        RiskDataStore.from_riskmodel_root(riskmodel_root, self.tmp_dir / "store")
+        self.assertTrue(RiskDataStore.is_store(self.tmp_dir / "store"))
+        store = RiskDataStore(self.tmp_dir / "store")
+        for date, exp in expected.items():
+            outs = store.read(date)
+            for res, exp_res in zip(outs, exp):
+                np.testing.assert_array_equal(res, exp_res)
+        self.assertIsNone(store.read("2019-01-01"))
+
+    def test_write(self):
+        dates = pd.date_range("2020-01-01", periods=3)
+        store = RiskDataStore.create(self.tmp_dir / "store", dates, ["SH600000", "SH600001"], 2, dtype=np.float32)
+        factor_exp = pd.DataFrame([[1.0, 2.0]], index=["SH600001"])
+        store.write(dates[1], factor_exp, np.eye(2), pd.Series([0.5], index=["SH600001"]))
+        store.flush()
+
+        store = RiskDataStore(self.tmp_dir / "store")
+        self.assertEqual(store.factor_exp.dtype, np.float32)
+        self.assertIsNone(store.read(dates[0]))
+        factor_exp, factor_cov, specific_risk, universe, blacklist = store.read(dates[1])
+        np.testing.assert_array_equal(factor_exp, [[1.0, 2.0]])
+        np.testing.assert_array_equal(factor_cov, np.eye(2))
+        np.testing.assert_array_equal(specific_risk, [0.5])
+        self.assertEqual(universe, ["SH600001"])
+        self.assertEqual(blacklist, [])
+
+
+class TestEnhancedIndexingOptimizer(unittest.TestCase):
+    @unittest.skipIf(cp.CLARABEL not in cp.installed_solvers(), "CLARABEL is not installed")
+    def test_parametrize(self):
+        np.random.seed(0)
+        K = 5
+        kwargs = {"lamb": 1, "delta": 0.2, "b_dev": 0.01, "f_dev": [0.1] * K, "solver_kwargs": {"solver": cp.CLARABEL}}
+        optimizer = EnhancedIndexingOptimizer(**kwargs)
+        parametrized_optimizer = EnhancedIndexingOptimizer(parametrize=True, **kwargs)
+        for N in [100, 90, 105, 120]:
+            F = np.random.randn(N, K) * 0.3
+            cov_b = np.cov(np.random.randn(K, 100)) * 1e-4
+            var_u = np.random.rand(N) * 1e-4
+            wb = np.random.rand(N)
+            wb /= wb.sum()
+            w0 = np.clip(wb + np.random.randn(N) * 0.001, 0, None)
+            w0 /= w0.sum()
+            r = np.random.randn(N)
+            mfh = np.random.rand(N) < 0.05
+            mfs = np.random.rand(N) < 0.05
+            w = optimizer(r, F, cov_b, var_u, w0, wb, mfh, mfs)
+            parametrized_w = parametrized_optimizer(r, F, cov_b, var_u, w0, wb, mfh, mfs)
+            self.assertEqual(len(parametrized_w), N)
+            np.testing.assert_allclose(parametrized_w, w, atol=1e-6)
+        # the problem is only rebuilt when the universe is larger than the capacity
+        self.assertEqual(parametrized_optimizer._capacity, 120 + 12)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,99 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License.
+
+import shutil
+import tempfile
+import unittest
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from qlib.model.riskmodel import (
+    POETCovEstimator,
+    RiskDataStore,
+    RiskModel,
+    ShrinkCovEstimator,
+    StructuredCovEstimator,
+)
+
+
+class TestRollingRiskModel(unittest.TestCase):
+    NUM_VARIABLE = 30
+    NUM_OBSERVATION = 120
+    WINDOW = 40
+
+    def setUp(self):
+        np.random.seed(0)
+        T, N = self.NUM_OBSERVATION, self.NUM_VARIABLE
+        # 3 factors
+        ret = np.random.randn(T, N) * 0.01 + np.random.randn(T, 3) * [0.03, 0.02, 0.01] @ np.random.randn(3, N)
+        price = np.cumprod(1 + ret, axis=0)
+        self.price = pd.DataFrame(
+            price, index=pd.date_range("2020-01-01", periods=T), columns=[f"SH6000{i:02d}" for i in range(N)]
+        )
+        self.price.iloc[50:60, 3] = np.nan  # suspended
+        self.price.iloc[:20, 5] = np.nan  # listed later
+        self.tmp_dir = Path(tempfile.mkdtemp())
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def _check_rolling(self, model, step=1, rtol=1e-10, **kwargs):
+        dates = []
+        for date, est in model.predict_rolling(self.price, self.WINDOW, step=step, **kwargs):
+            t = self.price.index.get_loc(date)
+            # NOTE: `window` observations of returns come from `window + 1` prices
+            expected = model.predict(self.price.iloc[t - self.WINDOW : t + 1], **kwargs)
+            if isinstance(est, tuple):
+                F, cov_b, var_u = est
+                est = F @ cov_b @ F.T + np.diag(var_u)
+                F, cov_b, var_u = expected
+                expected = F @ cov_b @ F.T + np.diag(var_u)
+            np.testing.assert_allclose(np.asarray(est), np.asarray(expected), rtol=rtol, atol=rtol, err_msg=str(date))
+            dates.append(date)
+        self.assertEqual(dates, self.price.index[self.WINDOW :: step].tolist())
+
+    def test_rolling_same_as_predict(self):
+        for nan_option in ["ignore", "mask", "fill"]:
+            self._check_rolling(RiskModel(nan_option=nan_option))
+            self._check_rolling(RiskModel(nan_option=nan_option, assume_centered=True), step=7)
+        self._check_rolling(RiskModel(nan_option="fill"), return_corr=True)
+        for target in ["const_var", "const_corr", "single_factor"]:
+            self._check_rolling(ShrinkCovEstimator(alpha="lw", target=target, nan_option="fill"), step=3)
+        # re-estimated from the window
+        self._check_rolling(POETCovEstimator(num_factors=3, nan_option="fill"), step=5)
+        self._check_rolling(StructuredCovEstimator(factor_model="fa", num_factors=3), step=20)
+
+    def test_rolling_structured(self):
+        model = StructuredCovEstimator(num_factors=3)
+        self._check_rolling(model, rtol=1e-6)
+        self._check_rolling(model, rtol=1e-6, return_decomposed_components=True)
+
+    def test_min_periods(self):
+        model = RiskModel(nan_option="fill")
+        outs = list(model.predict_rolling(self.price.values, self.WINDOW, min_periods=10))
+        self.assertEqual(outs[0][0], 9)
+        np.testing.assert_allclose(outs[0][1], model.predict(self.price.values[:11]))
+        self.assertEqual(len(outs), self.NUM_OBSERVATION - 10)
+
+    def test_dump_rolling(self):
+        model = StructuredCovEstimator(num_factors=3)
+        store = model.dump_rolling(self.price, self.tmp_dir / "store", self.WINDOW, step=5, dtype=np.float64)
+        self.assertTrue(RiskDataStore.is_store(self.tmp_dir / "store"))
+        store = RiskDataStore(self.tmp_dir / "store")
+        outs = model.predict_rolling(self.price, self.WINDOW, step=5, return_decomposed_components=True)
+        # the instruments with returns on the date
+        has_return = self.price.notna() & self.price.shift(1).notna()
+        for date, (F, cov_b, var_u) in outs:
+            factor_exp, factor_cov, specific_risk, universe, blacklist = store.read(date)
+            valid = has_return.loc[date].values
+            self.assertEqual(universe, self.price.columns[valid].tolist())
+            np.testing.assert_allclose(factor_exp, F[valid])
+            np.testing.assert_allclose(factor_cov, cov_b)
+            np.testing.assert_allclose(specific_risk, np.sqrt(var_u[valid]))
+            self.assertEqual(blacklist, [])
+
+
+if __name__ == "__main__":
+    unittest.main()